@@ -3,6 +3,9 @@ from datetime import date
 
 
 class CalculatorForm(forms.Form):
+    # Найбільший термін (міс.), як і OfferGridForm.MAX_SROK: довші календарі не потрапляють у кеш розрахунків
+    MAX_SROK = 360
+
     start_date = forms.DateField(
         label="Дата видачі",
         input_formats=["%Y-%m-%d"],
@@ -12,7 +15,8 @@ class CalculatorForm(forms.Form):
     srok = forms.IntegerField(
         label="Срок (міс.)",
         initial=12,
-        widget=forms.NumberInput(attrs={"class": "form-control"}))
+        max_value=MAX_SROK,
+        widget=forms.NumberInput(attrs={"class": "form-control", "max": MAX_SROK}))
 
 
     day_of_pay = forms.IntegerField(
@@ -51,7 +55,7 @@ class CalculatorForm(forms.Form):
 
         start_date = cleaned_data.get('start_date')
         srok = cleaned_data.get('srok')
-        day_of_pay = int(cleaned_data.get('day_of_pay'))
+        day_of_pay = cleaned_data.get('day_of_pay')
         percent = cleaned_data.get('percent')
         credit_sum = cleaned_data.get('credit_sum')
 
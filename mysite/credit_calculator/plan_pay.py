@@ -1,5 +1,17 @@
+from array import array
 from datetime import datetime, date
 import calendar
+import math
+from functools import lru_cache
+
+# Способи підбору планового платежу
+METHOD_NEWTON = 'newton'        # аналітична оцінка + кроки Ньютона (за замовчуванням)
+METHOD_BISECTION = 'bisection'  # еталонний метод поділу навпіл
+
+# Скільки різних календарів платежів тримати в кеші
+PAYMENT_CALENDAR_CACHE_SIZE = 1024
+# Календарі довших термінів рахуються без кешу, щоб кеш не заповнювали величезні календарі
+PAYMENT_CALENDAR_CACHE_MAX_MONTHS = 360
 
 
 def to_cents(x: float) -> int:
@@ -11,28 +23,174 @@ def from_cents(x: int) -> float:
     return x / 100.0
 
 
-def rozrahunok_payment(credit_sum, daily_rate, months, start_date, pay_day, pay):
-    """Повертає фінальний залишок (тіло + борг по відсотках) у копійках."""
+# Грошові колонки графіка (зберігаються в копійках)
+GRAFIK_MONEY_FIELDS = (
+    "payment", "summa_percent", "pog_dolg_by_percents", "pog_summa_percent",
+    "dolg_percent", "pog_credit", "ostatok", "total_dolg",
+)
+
+
+class Grafik:
+    """
+    Компактний графік платежів: паралельні колонки array('q') — цілі копійки та ординали дат.
+    Рядки (GrafikRow) форматуються лише при зверненні, тож шаблони працюють як зі словниками.
+    """
+    __slots__ = ("date_ordinals", "delta_days") + GRAFIK_MONEY_FIELDS
+
+    def __init__(self):
+        for name in self.__slots__:
+            setattr(self, name, array('q'))
+
+    @classmethod
+    def from_columns(cls, date_ordinals, delta_days, columns):
+        """Графік з готових колонок (послідовності цілих, гроші — в копійках)."""
+        grafik = cls()
+        grafik.date_ordinals.extend(date_ordinals)
+        grafik.delta_days.extend(delta_days)
+        for name in GRAFIK_MONEY_FIELDS:
+            getattr(grafik, name).extend(columns[name])
+        return grafik
+
+    def __len__(self):
+        return len(self.date_ordinals)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [GrafikRow(self, i) for i in range(*index.indices(len(self)))]
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError("grafik index out of range")
+        return GrafikRow(self, index)
+
+    def __iter__(self):
+        for i in range(len(self)):
+            yield GrafikRow(self, i)
+
+    def __eq__(self, other):
+        if not isinstance(other, Grafik):
+            return NotImplemented
+        return all(getattr(self, name) == getattr(other, name) for name in self.__slots__)
+
+    def to_list(self):
+        """Графік у старому форматі: список словників з гривнями та датою "дд.мм.рррр"."""
+        return [row.as_dict() for row in self]
+
+    def to_json(self):
+        """Графік для JSON: дата у форматі ISO, гроші в гривнях."""
+        rows = []
+        for row in self:
+            item = {"number": row["number"], "date_pay": row.date_pay.isoformat(), "delta_days": row["delta_days"]}
+            item.update((name, row[name]) for name in GRAFIK_MONEY_FIELDS)
+            rows.append(item)
+        return rows
+
+
+class GrafikRow:
+    """Один рядок Grafik з доступом як до словника: row["payment"] (грн), row["date_of_pay"] (рядок)."""
+    __slots__ = ("grafik", "index")
+
+    KEYS = ("number", "date_of_pay", "delta_days") + GRAFIK_MONEY_FIELDS
+
+    def __init__(self, grafik, index):
+        self.grafik = grafik
+        self.index = index
+
+    @property
+    def date_pay(self):
+        return date.fromordinal(self.grafik.date_ordinals[self.index])
+
+    def cents(self, key):
+        """Значення грошової колонки в копійках."""
+        return getattr(self.grafik, key)[self.index]
+
+    def __getitem__(self, key):
+        if key in GRAFIK_MONEY_FIELDS:
+            return from_cents(getattr(self.grafik, key)[self.index])
+        if key == "number":
+            return self.index + 1
+        if key == "date_of_pay":
+            return self.date_pay.strftime("%d.%m.%Y")
+        if key == "date_pay":
+            return self.date_pay
+        if key == "delta_days":
+            return self.grafik.delta_days[self.index]
+        raise KeyError(key)
+
+    def keys(self):
+        return self.KEYS
+
+    def as_dict(self):
+        return {key: self[key] for key in self.KEYS}
+
+
+def next_pay_date(current_date, pay_day):
+    """Дата наступного платежу: наступний місяць, день оплати обрізається до кінця місяця."""
+    year, month = current_date.year, current_date.month
+    month += 1
+    if month > 12:
+        month = 1
+        year += 1
+    last_day = calendar.monthrange(year, month)[1]
+    return date(year, month, min(pay_day, last_day))
+
+
+class PaymentCalendar:
+    """Дати платежів і кількість днів у кожному періоді — рахуються один раз."""
+    __slots__ = ('start_date', 'pay_day', 'dates', 'delta_days')
+
+    def __init__(self, start_date, months, pay_day):
+        self.start_date = start_date
+        self.pay_day = pay_day
+
+        dates = []
+        delta_days = []
+        current_date = start_date
+        for m in range(months):
+            date_pay = next_pay_date(current_date, pay_day)
+            dates.append(date_pay)
+            delta_days.append((date_pay - current_date).days)
+            current_date = date_pay
+
+        self.dates = tuple(dates)
+        self.delta_days = tuple(delta_days)
+
+    def __len__(self):
+        return len(self.dates)
+
+
+@lru_cache(maxsize=PAYMENT_CALENDAR_CACHE_SIZE)
+def _cached_payment_calendar(start_date, months, pay_day):
+    return PaymentCalendar(start_date, months, pay_day)
+
+
+def get_payment_calendar(start_date, months, pay_day):
+    """Календар платежів з LRU-кешу (ключ — дата видачі, кількість місяців, день оплати)."""
     if isinstance(start_date, str):
-        # Використовуємо strptime
         start_date = datetime.strptime(start_date, "%Y-%m-%d").date()
-    current_date = start_date
+    if months > PAYMENT_CALENDAR_CACHE_MAX_MONTHS:
+        return PaymentCalendar(start_date, months, pay_day)
+    return _cached_payment_calendar(start_date, months, pay_day)
 
-    ostatok = to_cents(credit_sum)
-    dolg_by_percents = 0
 
-    for m in range(1, months + 1):
-        # Дата наступного платежу
-        year, month = current_date.year, current_date.month
-        month += 1
-        if month > 12:
-            month = 1
-            year += 1
-        last_day = calendar.monthrange(year, month)[1]
-        date_pay = date(year, month, min(pay_day, last_day))
+def payment_calendar_cache_info():
+    """Статистика кешу календарів: hits, misses, maxsize, currsize."""
+    return _cached_payment_calendar.cache_info()
 
+
+def rozrahunok_payment(credit_sum, daily_rate, months, start_date, pay_day, pay):
+    """Повертає фінальний залишок (тіло + борг по відсотках) у копійках."""
+    pay_calendar = get_payment_calendar(start_date, months, pay_day)
+    return final_balance(to_cents(credit_sum), daily_rate, pay_calendar.delta_days, pay)
+
+
+def final_balance(sum_cents, daily_rate, delta_days, pay):
+    """Фінальний залишок у копійках для заданої послідовності кількості днів у періодах."""
+    ostatok = sum_cents
+    dolg_by_percents = 0
+
+    for days in delta_days:
         # Нараховані відсотки
-        days = (date_pay - current_date).days
         percents = to_cents(from_cents(ostatok) * daily_rate * days)
 
         ost_payment = pay
@@ -55,20 +213,35 @@ def rozrahunok_payment(credit_sum, daily_rate, months, start_date, pay_day, pay)
         # 3. Погашення тіла
         ostatok -= ost_payment
 
-        current_date = date_pay
-
     return ostatok + dolg_by_percents
 
 
-def rozrahunok_plan_pay(credit_sum, daily_percent, months, start_date, pay_day, tol=1, max_iter=200):
+def annuity_estimate(credit_sum, daily_rate, months, start_date, pay_day):
     """
-    Підбирає платіж так, щоб фінальний баланс був <= 0.
+    Аналітична оцінка ануїтетного платежу (в копійках) з реальною кількістю днів у періодах.
+    Повертає (оцінка, нахил), де нахил — на скільки копійок зменшується фінальний баланс
+    при збільшенні платежу на 1 копійку.
     """
-
-    if isinstance(start_date, str):
-        start_date = datetime.strptime(start_date, "%Y-%m-%d").date()
-
-
+    delta_days = get_payment_calendar(start_date, months, pay_day).delta_days
+    *_, (estimate, slope) = annuity_estimates(to_cents(credit_sum), daily_rate, delta_days)
+    return estimate, slope
+
+
+def annuity_estimates(sum_cents, daily_rate, delta_days):
+    """Ануїтетні оцінки (оцінка, нахил) для кожного терміну 1..len(delta_days) за один прохід."""
+    # Без округлень: B_k = B_(k-1) * g_k - pay, де g_k = 1 + ставка * дні_k,
+    # отже B_n = S * (g_1 * ... * g_n) - pay * A_n, де A_k = A_(k-1) * g_k + 1
+    growth = 1.0
+    annuity_factor = 0.0
+    for days in delta_days:
+        g = 1 + daily_rate * days
+        growth *= g
+        annuity_factor = annuity_factor * g + 1
+        yield sum_cents * growth / annuity_factor, annuity_factor
+
+
+def pidbir_plan_pay_bisection(credit_sum, daily_percent, months, start_date, pay_day, tol=1, max_iter=200):
+    """Еталонний підбір платежу (в копійках) поділом навпіл по діапазону [0, 2 * сума]."""
     low, high = 0, to_cents(credit_sum) * 2
     pay = (low + high) // 2
 
@@ -91,23 +264,128 @@ def rozrahunok_plan_pay(credit_sum, daily_percent, months, start_date, pay_day,
     if final_ostatok > 0:
         pay += 1
 
-    # Фінальний графік
-    grafik = []
-    current_date = start_date
+    return pay
+
+
+def pidbir_plan_pay_newton(credit_sum, daily_percent, months, start_date, pay_day, max_iter=20):
+    """
+    Швидкий підбір платежу (в копійках): старт з ануїтетної оцінки, далі кроки Ньютона
+    по точній симуляції. Повертає мінімальний платіж, при якому фінальний баланс <= 0
+    (у межовому випадку — той самий платіж, що й pidbir_plan_pay_bisection, див. newton_pay).
+    """
+    estimate, slope = annuity_estimate(credit_sum, daily_percent, months, start_date, pay_day)
+    delta_days = get_payment_calendar(start_date, months, pay_day).delta_days
+
+    pay = newton_pay(to_cents(credit_sum), daily_percent, delta_days, estimate, slope, max_iter)
+    if pay is None:
+        # Не зійшлось (нетипові параметри) — повертаємось до еталонного методу
+        return pidbir_plan_pay_bisection(credit_sum, daily_percent, months, start_date, pay_day)
+
+    return pay
+
+
+def newton_pay(sum_cents, daily_rate, delta_days, estimate, slope, max_iter=20):
+    """
+    Кроки Ньютона (далі — січних) від ануїтетної оцінки; None, якщо за max_iter кроків не зійшлось
+    або платіж має рахуватись еталонним методом (див. кінець функції).
+    Кроки не виходять за межі вже відомого інтервалу [low, high], тож коливань навколо кореня немає.
+    """
+    pay = max(math.ceil(estimate), 1)
+    final_ostatok = final_balance(sum_cents, daily_rate, delta_days, pay)
+    # low — найбільший відомий платіж з балансом > 0, high — найменший з балансом <= 0
+    low, high, high_final_ostatok = 0, None, None
+
+    for _ in range(max_iter):
+        if final_ostatok > 0:
+            low = max(low, pay)
+        elif high is None or pay < high:
+            high, high_final_ostatok = pay, final_ostatok
+        if high is not None and high - low <= 1:
+            pay, final_ostatok = high, high_final_ostatok
+            break
+
+        # Округлення до копійок робить залежність майже лінійною з нахилом -slope
+        step = final_ostatok / slope
+        if abs(step) < 1:
+            break
+        new_pay = max(pay + (math.ceil(step) if step > 0 else math.floor(step)), low + 1)
+        if high is not None:
+            new_pay = min(new_pay, high - 1)
+
+        new_final_ostatok = final_balance(sum_cents, daily_rate, delta_days, new_pay)
+        if new_final_ostatok != final_ostatok:
+            # Уточнюємо нахил по двох останніх точках (метод січних)
+            slope = (final_ostatok - new_final_ostatok) / (new_pay - pay)
+        pay, final_ostatok = new_pay, new_final_ostatok
+    else:
+        return None
+
+    # Доводимо до копійки: фінальний баланс <= 0, а при платежі на 1 коп. меншому — > 0
+    while final_ostatok > 0:
+        pay += 1
+        final_ostatok = final_balance(sum_cents, daily_rate, delta_days, pay)
+    while pay > 1:
+        lower_final_ostatok = final_balance(sum_cents, daily_rate, delta_days, pay - 1)
+        if lower_final_ostatok > 0:
+            break
+        pay, final_ostatok = pay - 1, lower_final_ostatok
+
+    # Поділ навпіл приймає будь-який платіж із |баланс| <= 1 коп., тож якщо мінімальний
+    # платіж дає рівно 0, а наступний -1, еталон може повернути на копійку більше.
+    # Такий випадок (майже лише для 1-місячних кредитів) віддаємо еталонному методу.
+    if final_ostatok == 0 and final_balance(sum_cents, daily_rate, delta_days, pay + 1) == -1:
+        return None
+
+    return pay
+
+
+def rozrahunok_plan_pay(credit_sum, daily_percent, months, start_date, pay_day, tol=1, max_iter=200,
+                        method=METHOD_NEWTON):
+    """
+    Підбирає платіж так, щоб фінальний баланс був <= 0.
+    method: METHOD_NEWTON (швидкий) або METHOD_BISECTION (еталонний, tol/max_iter — його параметри).
+    """
+
+    if isinstance(start_date, str):
+        start_date = datetime.strptime(start_date, "%Y-%m-%d").date()
+
+    if method == METHOD_BISECTION:
+        pay = pidbir_plan_pay_bisection(credit_sum, daily_percent, months, start_date, pay_day, tol, max_iter)
+    elif method == METHOD_NEWTON:
+        pay = pidbir_plan_pay_newton(credit_sum, daily_percent, months, start_date, pay_day)
+    else:
+        raise ValueError(f"Невідомий спосіб підбору платежу: {method}")
+
+    grafik, total_pays_sum = rozrahunok_grafik(credit_sum, daily_percent, months, start_date, pay_day, pay)
+
+    pereplata = from_cents(total_pays_sum) - credit_sum
+    return from_cents(pay), grafik, from_cents(total_pays_sum), round(pereplata, 2)
+
+
+def rozrahunok_grafik(credit_sum, daily_percent, months, start_date, pay_day, pay):
+    """Графік платежів (Grafik) для заданого планового платежу в копійках і сума всіх платежів у копійках."""
+    grafik = Grafik()
+    money_columns = [getattr(grafik, name) for name in GRAFIK_MONEY_FIELDS]
+
+    for date_pay, days, *money in iter_grafik_cents(credit_sum, daily_percent, months, start_date, pay_day, pay):
+        grafik.date_ordinals.append(date_pay.toordinal())
+        grafik.delta_days.append(days)
+        for column, value in zip(money_columns, money):
+            column.append(value)
+
+    return grafik, pay * len(grafik)
+
+
+def iter_grafik_cents(credit_sum, daily_percent, months, start_date, pay_day, pay):
+    """
+    Лінивий генератор рядків графіка: (дата платежу, днів у періоді, далі колонки
+    GRAFIK_MONEY_FIELDS у копійках). Кожен рядок рахується лише тоді, коли його запитали.
+    """
+    pay_calendar = get_payment_calendar(start_date, months, pay_day)
     ostatok = to_cents(credit_sum)
     dolg_by_percents = 0
-    total_pays_sum = 0
-
-    for m in range(1, months + 1):
-        year, month = current_date.year, current_date.month
-        month += 1
-        if month > 12:
-            month = 1
-            year += 1
-        last_day = calendar.monthrange(year, month)[1]
-        date_pay = date(year, month, min(pay_day, last_day))
-
-        days = (date_pay - current_date).days
+
+    for date_pay, days in zip(pay_calendar.dates, pay_calendar.delta_days):
         percents = to_cents(from_cents(ostatok) * daily_percent * days)
         ost_payment = pay
 
@@ -138,26 +416,52 @@ def rozrahunok_plan_pay(credit_sum, daily_percent, months, start_date, pay_day,
             current_pay = pay + ostatok
             ostatok = 0
 
-        total_pays_sum += pay
+        yield (date_pay, days, current_pay, percents, pog_dolg_by_percents, pog_percents,
+               dolg_by_percents, pog_ostatok, ostatok, ostatok + dolg_by_percents)
 
-        grafik.append({
-            "number": m,
-            "date_of_pay": date_pay.strftime("%d.%m.%Y"),   # "%Y-%m-%d"
-            "delta_days": days,
-            "payment": from_cents(current_pay),
-            "summa_percent": from_cents(percents),
-            "pog_dolg_by_percents": from_cents(pog_dolg_by_percents),
-            "pog_summa_percent": from_cents(pog_percents),
-            "dolg_percent": from_cents(dolg_by_percents),
-            "pog_credit": from_cents(pog_ostatok),
-            "ostatok": from_cents(ostatok),
-            "total_dolg": from_cents(ostatok + dolg_by_percents)
-        })
 
-        current_date = date_pay
+def iter_grafik(credit_sum, daily_percent, months, start_date, pay_day, pay):
+    """Рядки графіка по одному, у форматі Grafik.to_list() (гривні, дата "дд.мм.рррр")."""
+    rows = iter_grafik_cents(credit_sum, daily_percent, months, start_date, pay_day, pay)
+    for number, (date_pay, days, *money) in enumerate(rows, start=1):
+        row = {"number": number, "date_of_pay": date_pay.strftime("%d.%m.%Y"), "delta_days": days}
+        row.update(zip(GRAFIK_MONEY_FIELDS, map(from_cents, money)))
+        yield row
 
-    pereplata = from_cents(total_pays_sum) - credit_sum
-    return from_cents(pay), grafik, from_cents(total_pays_sum), round(pereplata, 2)
+
+def rozrahunok_offer_grid(credit_sum, start_date, pay_day, terms, daily_percents):
+    """
+    Планові платежі для всіх комбінацій термін × ставка (без графіків).
+    Календар рахується один раз для найдовшого терміну, коротші терміни беруть його початок,
+    а ануїтетні оцінки для всіх термінів — за один прохід на кожну ставку.
+    Повертає список словників: srok, daily_percent, plan_pay, total_pays_sum, pereplata.
+    """
+    if isinstance(start_date, str):
+        start_date = datetime.strptime(start_date, "%Y-%m-%d").date()
+
+    terms = sorted(set(terms))
+    sum_cents = to_cents(credit_sum)
+    delta_days = get_payment_calendar(start_date, terms[-1], pay_day).delta_days
+
+    offers = []
+    for daily_percent in daily_percents:
+        estimates = list(annuity_estimates(sum_cents, daily_percent, delta_days))
+        for months in terms:
+            estimate, slope = estimates[months - 1]
+            pay = newton_pay(sum_cents, daily_percent, delta_days[:months], estimate, slope)
+            if pay is None:
+                pay = pidbir_plan_pay_bisection(credit_sum, daily_percent, months, start_date, pay_day)
+
+            total_pays_sum = from_cents(pay * months)
+            offers.append({
+                "srok": months,
+                "daily_percent": daily_percent,
+                "plan_pay": from_cents(pay),
+                "total_pays_sum": total_pays_sum,
+                "pereplata": round(total_pays_sum - credit_sum, 2),
+            })
+
+    return offers
 
 
 
@@ -0,0 +1,90 @@
+"""
+Кеш готових розрахунків калькулятора поверх кешу Django (аліас CALCULATOR_QUOTE_CACHE).
+
+Вхідні дані калькулятора мають невеликий простір значень (4 ставки, типові терміни,
+круглі суми), тому повторні розрахунки віддаються з кешу без запуску rozrahunok_plan_pay.
+Розмір і час життя записів задаються в settings.CACHES (MAX_ENTRIES, TIMEOUT). Лічильники статистики
+живуть в окремому аліасі QUOTE_STATS_CACHE: при переповненні кеш розрахунків викидає частину записів,
+і разом з ними зникали б лічильники.
+"""
+import hashlib
+from time import perf_counter
+
+from django.core.cache import caches
+
+from credit_calculator.plan_pay import rozrahunok_plan_pay, to_cents
+
+CALCULATOR_QUOTE_CACHE = 'calculator_quotes'
+QUOTE_STATS_CACHE = 'calculator_stats'
+
+# Версія розрахунку: збільшити при будь-якій зміні результатів rozrahunok_plan_pay,
+# щоб старі записи кешу та ETag-и (браузер, CDN) перестали збігатися
+QUOTE_ENGINE_VERSION = 1
+
+# Лічильники статистики (час — у мікросекундах, бо cache.incr працює лише з цілими)
+STATS_KEYS = ('hits', 'misses', 'compute_us', 'saved_us')
+STATS_TIMEOUT = None  # лічильники не протухають
+
+
+def quote_key(credit_sum, percent, srok, start_date, day_of_pay):
+    """Нормалізований ключ: сума в копійках, ставка з 4 знаками, дата ISO."""
+    return f"quote:v{QUOTE_ENGINE_VERSION}:{to_cents(credit_sum)}:{float(percent):.4f}:{int(srok)}:{start_date.isoformat()}:{int(day_of_pay)}"
+
+
+def quote_etag(credit_sum, percent, srok, start_date, day_of_pay):
+    """Детермінований ETag розрахунку — хеш нормалізованого ключа."""
+    key = quote_key(credit_sum, percent, srok, start_date, day_of_pay)
+    return '"%s"' % hashlib.sha256(key.encode()).hexdigest()[:32]
+
+
+def _incr(name, delta):
+    cache = caches[QUOTE_STATS_CACHE]
+    key = f"quote-stats:{name}"
+    # add() нічого не робить, якщо лічильник вже існує
+    cache.add(key, 0, timeout=STATS_TIMEOUT)
+    try:
+        cache.incr(key, delta)
+    except ValueError:
+        # Лічильник витіснено між add() та incr()
+        cache.set(key, delta, timeout=STATS_TIMEOUT)
+
+
+def get_quote(credit_sum, percent, srok, start_date, day_of_pay):
+    """
+    Розрахунок калькулятора з кешу; percent — добова ставка у % (як у формі).
+    Повертає те саме, що rozrahunok_plan_pay: (plan_pay, grafik, total_pays_sum, pereplata).
+    """
+    cache = caches[CALCULATOR_QUOTE_CACHE]
+    key = quote_key(credit_sum, percent, srok, start_date, day_of_pay)
+
+    cached = cache.get(key)
+    if cached is not None:
+        quote, compute_us = cached
+        _incr('hits', 1)
+        _incr('saved_us', compute_us)
+        return quote
+
+    started = perf_counter()
+    quote = rozrahunok_plan_pay(credit_sum, percent / 100, srok, start_date, day_of_pay)
+    compute_us = int((perf_counter() - started) * 1_000_000)
+
+    cache.set(key, (quote, compute_us))
+    _incr('misses', 1)
+    _incr('compute_us', compute_us)
+    return quote
+
+
+def quote_cache_stats():
+    """Статистика кешу: звернення, частка влучань, витрачений і зекономлений час (с)."""
+    cache = caches[QUOTE_STATS_CACHE]
+    values = cache.get_many([f"quote-stats:{name}" for name in STATS_KEYS])
+    hits, misses, compute_us, saved_us = (values.get(f"quote-stats:{name}", 0) for name in STATS_KEYS)
+
+    total = hits + misses
+    return {
+        'hits': hits,
+        'misses': misses,
+        'hit_ratio': round(hits / total, 4) if total else 0.0,
+        'compute_seconds': compute_us / 1_000_000,
+        'saved_seconds': saved_us / 1_000_000,
+    }
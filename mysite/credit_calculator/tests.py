@@ -1,3 +1,123 @@
-from django.test import TestCase
+from datetime import date, datetime, timedelta
+from unittest import mock
 
-# Create your tests here.
+from django.core.cache import caches
+from django.test import SimpleTestCase
+from django.urls import reverse
+from django.utils import timezone
+
+from credit_calculator.plan_pay import rozrahunok_plan_pay, iter_grafik, pidbir_plan_pay_newton
+from credit_calculator.quote_cache import (
+    CALCULATOR_QUOTE_CACHE, QUOTE_STATS_CACHE, get_quote, quote_cache_stats, quote_key,
+)
+
+
+class QuoteCacheTests(SimpleTestCase):
+    def setUp(self):
+        caches[CALCULATOR_QUOTE_CACHE].clear()
+        caches[QUOTE_STATS_CACHE].clear()
+        self.start_date = date.today() + timedelta(days=1)
+
+    def test_repeated_quote_is_cached(self):
+        first = get_quote(10000, 0.10, 12, self.start_date, 15)
+        second = get_quote(10000.0, 0.1, 12, self.start_date, 15)
+
+        self.assertEqual(first, rozrahunok_plan_pay(10000, 0.10 / 100, 12, self.start_date, 15))
+        self.assertEqual(second, first)
+        stats = quote_cache_stats()
+        self.assertEqual((stats['hits'], stats['misses']), (1, 1))
+        self.assertEqual(stats['hit_ratio'], 0.5)
+
+    def test_stats_survive_quote_eviction(self):
+        get_quote(10000, 0.10, 12, self.start_date, 15)
+        # Як при витісненні записів переповненим кешем розрахунків
+        caches[CALCULATOR_QUOTE_CACHE].clear()
+        get_quote(10000, 0.10, 12, self.start_date, 15)
+        self.assertEqual(quote_cache_stats()['misses'], 2)
+
+    def test_key_is_normalized(self):
+        self.assertEqual(quote_key(1000.001, 0.1, 12, self.start_date, 15),
+                         quote_key(1000, 0.10, 12.0, self.start_date, 15))
+        self.assertNotEqual(quote_key(1000, 0.1, 12, self.start_date, 15),
+                            quote_key(1000, 0.12, 12, self.start_date, 15))
+
+
+class ScheduleViewTests(SimpleTestCase):
+    def setUp(self):
+        self.start_date = date.today() + timedelta(days=1)
+        self.params = {'credit_sum': 20000, 'percent': '0.1', 'srok': 130,
+                       'start_date': self.start_date.isoformat(), 'day_of_pay': 31}
+        self.grafik = rozrahunok_plan_pay(20000, 0.001, 130, self.start_date, 31)[1].to_list()
+
+    def test_lazy_rows_match_grafik(self):
+        pay = pidbir_plan_pay_newton(20000, 0.001, 130, self.start_date, 31)
+        self.assertEqual(list(iter_grafik(20000, 0.001, 130, self.start_date, 31, pay)), self.grafik)
+
+    def test_page(self):
+        response = self.client.get(reverse('calculator_schedule'), {**self.params, 'page': 3})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.context['num_pages'], 3)
+        self.assertEqual(response.context['rows'], self.grafik[120:])
+
+    def test_stream(self):
+        response = self.client.get(reverse('calculator_schedule'), {**self.params, 'stream': 1})
+        body = b''.join(response.streaming_content).decode()
+        self.assertEqual(body.count('<tr>'), 131)
+        self.assertTrue(body.endswith('</html>'))
+
+    def test_invalid_params(self):
+        self.assertEqual(self.client.get(reverse('calculator_schedule'), {'credit_sum': 10}).status_code, 400)
+
+
+class QuoteApiTests(SimpleTestCase):
+    def setUp(self):
+        caches[CALCULATOR_QUOTE_CACHE].clear()
+        self.start_date = date.today() + timedelta(days=1)
+        self.params = {'credit_sum': 15000, 'percent': '0.12', 'srok': 18,
+                       'start_date': self.start_date.isoformat(), 'day_of_pay': 30}
+
+    def test_quote_json(self):
+        response = self.client.get(reverse('calculator_api_quote'), self.params)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('public', response['Cache-Control'])
+        self.assertIn('max-age=', response['Cache-Control'])
+        plan_pay, grafik, total_pays_sum, pereplata = rozrahunok_plan_pay(15000, 0.0012, 18, self.start_date, 30)
+        data = response.json()
+        self.assertEqual((data['plan_pay'], data['total_pays_sum'], data['pereplata']),
+                         (plan_pay, total_pays_sum, pereplata))
+        self.assertEqual(len(data['grafik']), 18)
+        self.assertEqual(data['grafik'][0]['date_pay'], grafik[0].date_pay.isoformat())
+
+    def test_max_age_ends_at_local_midnight(self):
+        # 23:50 за TIME_ZONE — відповідь можна тримати лише 10 хвилин
+        late_evening = timezone.make_aware(datetime.combine(date.today(), datetime.min.time())
+                                           + timedelta(hours=23, minutes=50))
+        with mock.patch('django.utils.timezone.now', return_value=late_evening):
+            response = self.client.get(reverse('calculator_api_quote'), self.params)
+        self.assertIn('max-age=600', response['Cache-Control'])
+
+    def test_conditional_request_skips_engine(self):
+        etag = self.client.get(reverse('calculator_api_quote'), self.params)['ETag']
+        self.assertEqual(etag, self.client.get(reverse('calculator_api_quote'), self.params)['ETag'])
+        misses = quote_cache_stats()['misses']
+
+        response = self.client.get(reverse('calculator_api_quote'), self.params, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response['ETag'], etag)
+        self.assertIn('max-age=', response['Cache-Control'])
+        self.assertEqual(quote_cache_stats()['misses'], misses)
+
+    def test_etag_depends_on_inputs(self):
+        etag = self.client.get(reverse('calculator_api_quote'), self.params)['ETag']
+        other = self.client.get(reverse('calculator_api_quote'), {**self.params, 'srok': 19})['ETag']
+        self.assertNotEqual(etag, other)
+
+    def test_invalid_params_not_cached(self):
+        response = self.client.get(reverse('calculator_api_quote'), {'credit_sum': 10})
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(response.has_header('Cache-Control'))
+
+    def test_term_is_capped(self):
+        response = self.client.get(reverse('calculator_api_quote'), {**self.params, 'srok': 100000})
+        self.assertEqual(response.status_code, 400)
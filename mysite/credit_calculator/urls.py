@@ -3,4 +3,7 @@ from . import views
 
 urlpatterns = [
     path('', views.CalculatorView.as_view(), name='credit_calculator'),
+    path('schedule/', views.ScheduleView.as_view(), name='calculator_schedule'),
+    path('api/quote/', views.QuoteApiView.as_view(), name='calculator_api_quote'),
+    path('cache-stats/', views.quote_cache_stats_view, name='calculator_cache_stats'),
 ]
\ No newline at end of file
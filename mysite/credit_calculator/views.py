@@ -1,8 +1,44 @@
+from datetime import datetime, time, timedelta
+from itertools import islice
+from urllib.parse import urlencode
+
+from django.core.exceptions import PermissionDenied
+from django.http import JsonResponse, StreamingHttpResponse
 from django.shortcuts import render
+from django.template.loader import get_template
+from django.utils import timezone
+from django.utils.cache import get_conditional_response, patch_cache_control
 from django.views import View
 
 from credit_calculator.forms import CalculatorForm
-from credit_calculator.plan_pay import rozrahunok_plan_pay
+from credit_calculator.plan_pay import iter_grafik, pidbir_plan_pay_newton
+from credit_calculator.quote_cache import get_quote, quote_cache_stats, quote_etag
+
+# Скільки рядків графіка показувати на одній сторінці
+SCHEDULE_PAGE_SIZE = 60
+# Скільки рядків рендерити за раз у потоковому режимі
+SCHEDULE_STREAM_CHUNK = 50
+# Найбільше, скільки секунд браузер, CDN чи проксі можуть тримати відповідь API. Фактично — лише до
+# локальної півночі: форма відхиляє дату видачі раніше сьогоднішньої, тож завтра ті самі параметри дадуть 400
+QUOTE_API_MAX_AGE = 60 * 60 * 24
+
+
+def seconds_until_midnight(now=None):
+    """Секунди до наступної локальної (TIME_ZONE) півночі."""
+    now = timezone.localtime(now)
+    midnight = timezone.make_aware(datetime.combine(now.date() + timedelta(days=1), time.min))
+    return max(int(midnight.timestamp() - now.timestamp()), 0)
+
+
+def schedule_query(credit_sum, percent, srok, start_date, day_of_pay):
+    """Параметри для ScheduleView з даних форми калькулятора."""
+    return urlencode({
+        'credit_sum': credit_sum,
+        'percent': percent,
+        'srok': srok,
+        'start_date': start_date.isoformat(),
+        'day_of_pay': day_of_pay,
+    })
 
 
 # def calculator_view(request):
@@ -23,16 +59,21 @@ class CalculatorView(View):
             # Отримуємо дані з форми
             start_date = form.cleaned_data['start_date']
             srok = form.cleaned_data['srok']
-            percent = form.cleaned_data['percent']/100
+            percent = form.cleaned_data['percent']
             credit_sum = form.cleaned_data['credit_sum']
             day_of_pay = form.cleaned_data['day_of_pay']
 
-            plan_pay, grafik, total_pays_sum, pereplata = rozrahunok_plan_pay(credit_sum, percent, srok, start_date, day_of_pay)
+            # Повторні розрахунки з тими самими даними віддаються з кешу
+            plan_pay, grafik, total_pays_sum, pereplata = get_quote(credit_sum, percent, srok, start_date, day_of_pay)
 
             context = {
                 'form': form,
                 'plan_pay': plan_pay,
                 'grafik': grafik,
+                # Довгі графіки показуємо першою сторінкою, решта — через ScheduleView
+                'grafik_page': grafik[:SCHEDULE_PAGE_SIZE],
+                'grafik_has_more': len(grafik) > SCHEDULE_PAGE_SIZE,
+                'schedule_query': schedule_query(credit_sum, percent, srok, start_date, day_of_pay),
                 'total_pays_sum': total_pays_sum,
                 'pereplata': pereplata,
             }
@@ -40,4 +81,101 @@ class CalculatorView(View):
             return render(request, self.template_name, context)
 
         # Якщо форма невалідна — повертаємо її з помилками
-        return render(request, self.template_name, {'form': form})
\ No newline at end of file
+        return render(request, self.template_name, {'form': form})
+
+
+# Графік платежів частинами: сторінка N (?page=N) або потокова таблиця (?stream=1)
+class ScheduleView(View):
+    template_name = 'credit_calculator/schedule.html'
+    rows_template_name = 'credit_calculator/schedule_rows.html'
+
+    def get(self, request):
+        form = CalculatorForm(request.GET)
+        if not form.is_valid():
+            return render(request, self.template_name, {'form': form}, status=400)
+
+        cleaned_data = form.cleaned_data
+        args = (cleaned_data['credit_sum'], cleaned_data['percent'] / 100, cleaned_data['srok'],
+                cleaned_data['start_date'], cleaned_data['day_of_pay'])
+
+        # Платіж підбирається швидким методом, а рядки графіка — рахуються лише ті, що віддаємо
+        pay = pidbir_plan_pay_newton(*args)
+        rows = iter_grafik(*args, pay)
+
+        if request.GET.get('stream'):
+            response = StreamingHttpResponse(self.stream(rows), content_type='text/html; charset=utf-8')
+            response['X-Accel-Buffering'] = 'no'  # щоб проксі не буферизував відповідь
+            return response
+
+        try:
+            page = max(int(request.GET.get('page', 1)), 1)
+        except ValueError:
+            page = 1
+        num_pages = max((cleaned_data['srok'] + SCHEDULE_PAGE_SIZE - 1) // SCHEDULE_PAGE_SIZE, 1)
+        page = min(page, num_pages)
+
+        context = {
+            'form': form,
+            'rows': list(islice(rows, (page - 1) * SCHEDULE_PAGE_SIZE, page * SCHEDULE_PAGE_SIZE)),
+            'page': page,
+            'num_pages': num_pages,
+            'schedule_query': schedule_query(cleaned_data['credit_sum'], cleaned_data['percent'],
+                                             cleaned_data['srok'], cleaned_data['start_date'],
+                                             cleaned_data['day_of_pay']),
+        }
+        return render(request, self.template_name, context)
+
+    def stream(self, rows):
+        rows_template = get_template(self.rows_template_name)
+
+        yield ('<!DOCTYPE html><html lang="uk"><head><meta charset="UTF-8"><title>Графік платежів</title></head>'
+               '<body><table border="1" cellpadding="4"><thead><tr><th>Платіж</th><th>Дата</th>'
+               '<th>Сума платежу</th><th>Погашені %</th><th>Борг по %</th><th>Погашено кредиту</th>'
+               '<th>Залишок кредиту</th></tr></thead><tbody>')
+        while True:
+            chunk = list(islice(rows, SCHEDULE_STREAM_CHUNK))
+            if not chunk:
+                break
+            yield rows_template.render({'rows': chunk})
+        yield '</tbody></table></body></html>'
+
+
+# JSON API калькулятора з ETag та Cache-Control
+class QuoteApiView(View):
+    def get(self, request):
+        form = CalculatorForm(request.GET)
+        if not form.is_valid():
+            return JsonResponse({'errors': form.errors}, status=400)
+
+        cleaned_data = form.cleaned_data
+        args = (cleaned_data['credit_sum'], cleaned_data['percent'], cleaned_data['srok'],
+                cleaned_data['start_date'], cleaned_data['day_of_pay'])
+        etag = quote_etag(*args)
+
+        # If-None-Match з тим самим ETag — 304 без розрахунку
+        response = get_conditional_response(request, etag=etag)
+        if response is None:
+            plan_pay, grafik, total_pays_sum, pereplata = get_quote(*args)
+            response = JsonResponse({
+                'credit_sum': cleaned_data['credit_sum'],
+                'percent': cleaned_data['percent'],
+                'srok': cleaned_data['srok'],
+                'start_date': cleaned_data['start_date'].isoformat(),
+                'day_of_pay': cleaned_data['day_of_pay'],
+                'plan_pay': plan_pay,
+                'total_pays_sum': total_pays_sum,
+                'pereplata': pereplata,
+                'grafik': grafik.to_json(),
+            })
+
+        response['ETag'] = etag
+        patch_cache_control(response, public=True, max_age=min(QUOTE_API_MAX_AGE, seconds_until_midnight()))
+        return response
+
+
+# Статистика кешу розрахунків (лише для менеджерів та адміна)
+def quote_cache_stats_view(request):
+    user = request.user
+    if not (user.is_authenticated and (user.is_superuser or user.is_manager)):
+        raise PermissionDenied
+    return JsonResponse(quote_cache_stats())
@@ -0,0 +1,102 @@
+"""
+Нічне нарахування відсотків по відкритих кредитах.
+
+Відкриті кредити читаються потоком (.iterator(chunk_size)) у порядку id, відсотки з last_pay_date
+до дати нарахування рахуються векторизовано (NumPy) пачкою, знімки InterestAccrual записуються
+одним bulk_create на пачку (повторний запуск оновлює вже записані знімки).
+Після кожної пачки в AccrualRun зберігається id останнього кредиту, тож перерваний запуск
+продовжується з того ж місця.
+"""
+import numpy as np
+from django.db import transaction
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from credit_system.models import Credit, InterestAccrual, AccrualRun
+from credit_system.services import from_cents
+
+CHUNK_SIZE = 2000
+ACCRUAL_UPDATE_FIELDS = ['days', 'ostatok', 'summa_percent', 'dolg_percent', 'total_dolg']
+
+
+def accrued_percents(ostatok, percent, days):
+    """
+    Векторизований аналог services.percent_cents: масиви залишків (копійки), ставок (% за добу)
+    і днів -> нараховані відсотки в копійках з тим самим округленням round(x, 2).
+    """
+    amount = ostatok / 100.0 * (percent / 100) * days
+    scaled = amount * 100
+    cents = np.rint(scaled)
+
+    # np.rint(x * 100) і round(x, 2) можуть розійтись лише біля половини копійки — ці рахуємо як у Python
+    for i in np.flatnonzero(np.abs(scaled - np.floor(scaled) - 0.5) < 1e-6):
+        cents[i] = round(round(float(amount[i]), 2) * 100)
+
+    return cents.astype(np.int64)
+
+
+def build_accruals(rows, accrual_date):
+    """Рядки (id, ostatok, dolg_percent, percent, last_pay_date) -> знімки InterestAccrual на accrual_date."""
+    credit_ids, ostatok, dolg_percent, percent, last_pay_dates = zip(*rows)
+
+    days = (np.datetime64(accrual_date, 'D') - np.array(last_pay_dates, dtype='datetime64[D]')).astype(np.int64)
+    ostatok = np.rint(np.array(ostatok) * 100).astype(np.int64)
+    dolg_percent = np.rint(np.array(dolg_percent) * 100).astype(np.int64)
+    summa_percent = accrued_percents(ostatok, np.array(percent), days)
+    total_dolg = ostatok + dolg_percent + summa_percent
+
+    # Кредити з платежем після дати нарахування пропускаємо
+    return [
+        InterestAccrual(
+            credit_id=credit_ids[i], accrual_date=accrual_date, days=int(days[i]),
+            ostatok=from_cents(int(ostatok[i])), summa_percent=from_cents(int(summa_percent[i])),
+            dolg_percent=from_cents(int(dolg_percent[i])), total_dolg=from_cents(int(total_dolg[i])),
+        )
+        for i in np.flatnonzero(days >= 0)
+    ]
+
+
+def _chunks(rows, size):
+    chunk = []
+    for row in rows:
+        chunk.append(row)
+        if len(chunk) == size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def run_accrual(accrual_date, chunk_size=CHUNK_SIZE, restart=False, progress=None):
+    """
+    Нарахування на accrual_date по всіх відкритих кредитах. Продовжує незавершений запуск
+    (restart=True — з початку). progress(run) викликається після кожної пачки.
+    """
+    run, created = AccrualRun.objects.get_or_create(accrual_date=accrual_date)
+    if restart:
+        run.last_credit_id, run.credits, run.finished_at = 0, 0, None
+        run.save(update_fields=['last_credit_id', 'credits', 'finished_at'])
+    elif run.finished_at:
+        return run
+
+    rows = (Credit.objects.filter(closed=False, pk__gt=run.last_credit_id)
+            .order_by('pk')
+            .values_list('pk', 'ostatok', 'dolg_percent', 'percent', Coalesce('last_pay_date', 'start_date'))
+            .iterator(chunk_size=chunk_size))
+
+    for chunk in _chunks(rows, chunk_size):
+        accruals = build_accruals(chunk, accrual_date)
+        with transaction.atomic():
+            InterestAccrual.objects.bulk_create(
+                accruals, update_conflicts=True,
+                unique_fields=['credit', 'accrual_date'], update_fields=ACCRUAL_UPDATE_FIELDS,
+            )
+            run.last_credit_id = chunk[-1][0]
+            run.credits += len(chunk)
+            run.save(update_fields=['last_credit_id', 'credits'])
+        if progress:
+            progress(run)
+
+    run.finished_at = timezone.now()
+    run.save(update_fields=['finished_at'])
+    return run
@@ -3,6 +3,7 @@ from django.contrib.auth.admin import UserAdmin
 from .models import CustomUser, Credit, Payment
 from django.contrib.auth.models import Group, Permission
 from .forms import CustomUserCreationForm, CustomUserChangeForm
+from .replay import replay_credit, replay_credits
 
 admin.site.unregister(Group)    # Ховаємо групи в адмін-панелі
 
@@ -164,6 +165,14 @@ class CreditAdmin(admin.ModelAdmin):
             return qs
         return qs.filter(user=request.user)
 
+    actions = ['replay_ledger']
+
+    @admin.action(description="Перерахувати стан за історією платежів")
+    def replay_ledger(self, request, queryset):
+        stats = replay_credits(queryset.values_list('pk', flat=True))
+        self.message_user(request, f"Перераховано кредитів: {stats['credits']}, змінено кредитів: "
+                                   f"{stats['changed_credits']}, змінено платежів: {stats['changed_payments']}")
+
 
 @admin.register(Payment)
 class PaymentAdmin(admin.ModelAdmin):
@@ -179,4 +188,21 @@ class PaymentAdmin(admin.ModelAdmin):
         if request.user.is_superuser or request.user.is_manager:
             return qs
         # Для простого клієнта вибираємо тільки його платежі
-        return qs.filter(credit__user=request.user)
\ No newline at end of file
+        return qs.filter(credit__user=request.user)
+
+    # Після зміни чи видалення платежу стан кредиту відновлюється з історії платежів
+    def save_model(self, request, obj, form, change):
+        super().save_model(request, obj, form, change)
+        credit_ids = {obj.credit_id}
+        if change and 'credit' in form.changed_data:
+            credit_ids.add(form.initial['credit'])
+        replay_credits(credit_ids)
+
+    def delete_model(self, request, obj):
+        super().delete_model(request, obj)
+        replay_credit(obj.credit_id)
+
+    def delete_queryset(self, request, queryset):
+        credit_ids = set(queryset.values_list('credit_id', flat=True))
+        super().delete_queryset(request, queryset)
+        replay_credits(credit_ids)
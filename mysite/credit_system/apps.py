@@ -1,6 +1,42 @@
 from django.apps import AppConfig
+from django.db.models.signals import post_migrate, post_save, post_delete, pre_delete, pre_save
+
+
+def ensure_search_index(using, apps, **kwargs):
+    from django.db import connections
+    from credit_system.client_search import install_search_index
+
+    # Після відкату нижче 0022_client_search колонки search_text немає — індексувати нічого
+    try:
+        user_model = apps.get_model('credit_system', 'CustomUser')
+    except LookupError:
+        return
+    if 'search_text' not in {field.name for field in user_model._meta.get_fields()}:
+        return
+    install_search_index(connections[using])
 
 
 class CreditSystemConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'credit_system'
+
+    def ready(self):
+        from credit_system.page_cache import credit_deleted as credit_deleted_page_cache, payment_changed
+        from credit_system.client_summary import credit_deleted
+        from credit_system.portfolio import payment_saving, payment_saved, payment_deleted
+
+        # Тригери FTS на SQLite зникають, коли міграція перестворює таблицю користувачів
+        post_migrate.connect(ensure_search_index, sender=self)
+        # Зміна платежу — нова версія сторінок кредиту і клієнта
+        payment = self.get_model('Payment')
+        post_save.connect(payment_changed, sender=payment, dispatch_uid='payment_saved_page_cache')
+        post_delete.connect(payment_changed, sender=payment, dispatch_uid='payment_deleted_page_cache')
+        # Видалений кредит зникає зі сторінки клієнта
+        post_delete.connect(credit_deleted_page_cache, sender=self.get_model('Credit'),
+                            dispatch_uid='credit_deleted_page_cache')
+        # Видалений кредит виходить з підсумку клієнта
+        pre_delete.connect(credit_deleted, sender=self.get_model('Credit'), dispatch_uid='credit_deleted_summary')
+        # Платежі поза масовими шляхами (post_payment, адмін-панель) — у рух портфеля по днях
+        pre_save.connect(payment_saving, sender=payment, dispatch_uid='payment_saving_portfolio')
+        post_save.connect(payment_saved, sender=payment, dispatch_uid='payment_saved_portfolio')
+        post_delete.connect(payment_deleted, sender=payment, dispatch_uid='payment_deleted_portfolio')
@@ -0,0 +1,268 @@
+"""
+Пакетний (векторизований через NumPy) розрахунок планових платежів і графіків
+для багатьох кредитів одночасно.
+
+Семантика округлення така сама, як у plan_pay.py: усі суми — цілі копійки (int64),
+відсотки за період = to_cents(from_cents(ostatok) * daily_rate * days).
+Матриці мають розмір (кількість кредитів, найбільший термін), тож великі портфелі
+краще рахувати частинами по кілька тисяч кредитів.
+"""
+import numpy as np
+
+from datetime import date
+
+from credit_system.plan_pay import pidbir_plan_pay_newton, Grafik, GRAFIK_MONEY_FIELDS
+
+# Колонки графіка (в копійках), як у Grafik з rozrahunok_plan_pay
+GRAFIK_COLUMNS = GRAFIK_MONEY_FIELDS
+
+# datetime64[D] рахує дні від 1970-01-01, Grafik зберігає ординали дат
+EPOCH_ORDINAL = date(1970, 1, 1).toordinal()
+
+# Переплачений (від'ємний) залишок далі лише зростає за модулем під від'ємні «відсотки»
+# і при високих ставках виходить за int64. Знак фінального балансу на той момент уже
+# визначений (борг по % нульовий), тож залишок обмежуємо знизу цією межею (в копійках).
+NEGATIVE_OSTATOK_LIMIT = 10 ** 15
+
+
+def batch_payment_calendar(start_dates, months, pay_days):
+    """
+    Календарі платежів для всіх кредитів: матриці (N, max_months)
+    дат платежів (datetime64[D]), кількості днів у періодах та маски активних місяців.
+    """
+    start_dates = np.asarray(start_dates, dtype="datetime64[D]")
+    months = np.asarray(months, dtype=np.int64)
+    pay_days = np.asarray(pay_days, dtype=np.int64)
+
+    max_months = int(months.max()) if months.size else 0
+    steps = np.arange(1, max_months + 1)
+
+    # Місяць k-го платежу = місяць видачі + k, день оплати обрізається до кінця місяця
+    pay_months = start_dates.astype("datetime64[M]")[:, None] + steps[None, :]
+    month_starts = pay_months.astype("datetime64[D]")
+    days_in_month = ((pay_months + 1).astype("datetime64[D]") - month_starts).astype(np.int64)
+    dates = month_starts + (np.minimum(pay_days[:, None], days_in_month) - 1)
+
+    previous = np.concatenate([start_dates[:, None], dates[:, :-1]], axis=1)
+    mask = steps[None, :] <= months[:, None]
+    delta_days = np.where(mask, (dates - previous).astype(np.int64), 0)
+
+    return dates, delta_days, mask
+
+
+def _percents(ostatok, daily_rates, days):
+    # to_cents(from_cents(ostatok) * daily_rate * days) — той самий порядок операцій над float
+    return np.rint(ostatok / 100.0 * daily_rates * days * 100).astype(np.int64)
+
+
+def batch_rozrahunok_payment(sums_cents, daily_rates, delta_days, mask, pays):
+    """Фінальні залишки (тіло + борг по відсотках) у копійках для масиву платежів."""
+    ostatok = sums_cents.copy()
+    dolg_by_percents = np.zeros_like(ostatok)
+
+    for k in range(delta_days.shape[1]):
+        percents = _percents(ostatok, daily_rates, delta_days[:, k])
+        ost_payment = np.where(mask[:, k], pays, 0)
+
+        # 1. Погашення боргу по %
+        covered = ost_payment >= dolg_by_percents
+        ost_payment, dolg_by_percents = (np.where(covered, ost_payment - dolg_by_percents, 0),
+                                         np.where(covered, 0, dolg_by_percents - ost_payment))
+
+        # 2. Погашення поточних %
+        covered = ost_payment >= percents
+        dolg_by_percents += np.where(covered, 0, percents - ost_payment)
+        ost_payment = np.where(covered, ost_payment - percents, 0)
+
+        # 3. Погашення тіла
+        ostatok = np.maximum(ostatok - ost_payment, -NEGATIVE_OSTATOK_LIMIT)
+
+    return ostatok + dolg_by_percents
+
+
+def batch_pidbir_plan_pay(sums_cents, daily_rates, delta_days, mask, max_iter=20, max_refine=8):
+    """
+    Векторизований аналог pidbir_plan_pay_newton: мінімальні платежі (в копійках),
+    при яких фінальний баланс <= 0. Повертає також маску кредитів, які треба дорахувати
+    скалярним методом (Ньютон не зійшовся, платіж не доведено до копійки за max_refine кроків
+    або межовий випадок поділу навпіл).
+    """
+    def final_balance(idx, pays):
+        return batch_rozrahunok_payment(sums_cents[idx], daily_rates[idx], delta_days[idx], mask[idx], pays)
+
+    # Ануїтетна оцінка з реальною кількістю днів (див. plan_pay.annuity_estimate)
+    growth = np.ones(len(sums_cents))
+    annuity_factor = np.zeros(len(sums_cents))
+    for k in range(delta_days.shape[1]):
+        g = 1 + daily_rates * delta_days[:, k]
+        growth = np.where(mask[:, k], growth * g, growth)
+        annuity_factor = np.where(mask[:, k], annuity_factor * g + 1, annuity_factor)
+
+    pays = np.maximum(np.ceil(sums_cents * growth / annuity_factor), 1).astype(np.int64)
+    all_idx = np.arange(len(pays))
+    final_ostatok = final_balance(all_idx, pays)
+
+    # Кроки Ньютона/січних — лише для кредитів, що ще не зійшлись;
+    # low/high — відомий інтервал (баланс > 0 / <= 0), за який кроки не виходять
+    slope = annuity_factor.copy()
+    low = np.zeros(len(pays), dtype=np.int64)
+    high = np.full(len(pays), np.iinfo(np.int64).max)
+    high_final = np.zeros_like(final_ostatok)
+    converged = np.zeros(len(pays), dtype=bool)
+    for _ in range(max_iter):
+        positive = final_ostatok > 0
+        low = np.where(positive, np.maximum(low, pays), low)
+        lower_high = ~positive & (pays < high)
+        high = np.where(lower_high, pays, high)
+        high_final = np.where(lower_high, final_ostatok, high_final)
+        bracketed = ~converged & (high - low <= 1)
+        pays[bracketed], final_ostatok[bracketed] = high[bracketed], high_final[bracketed]
+
+        step = final_ostatok / slope
+        converged |= bracketed | (np.abs(step) < 1)
+        idx = np.flatnonzero(~converged)
+        if not idx.size:
+            break
+        new_pays = pays[idx] + np.where(step[idx] > 0, np.ceil(step[idx]), np.floor(step[idx])).astype(np.int64)
+        new_pays = np.minimum(np.maximum(new_pays, low[idx] + 1), high[idx] - 1)
+        new_final = final_balance(idx, new_pays)
+        changed = new_final != final_ostatok[idx]
+        slope[idx[changed]] = ((final_ostatok[idx] - new_final) / (new_pays - pays[idx]))[changed]
+        pays[idx], final_ostatok[idx] = new_pays, new_final
+
+    # Доводимо до копійки: баланс <= 0, а при платежі на 1 коп. меншому — > 0.
+    # Після збіжного Ньютона це кілька копійок; кредити, що й далі не доведені, — скалярним методом
+    idx = np.flatnonzero(converged & (final_ostatok > 0))
+    for _ in range(max_refine):
+        if not idx.size:
+            break
+        pays[idx] += 1
+        final_ostatok[idx] = final_balance(idx, pays[idx])
+        idx = idx[final_ostatok[idx] > 0]
+    converged[idx] = False
+
+    idx = np.flatnonzero(converged & (pays > 1))
+    for _ in range(max_refine):
+        if not idx.size:
+            break
+        lower_final = final_balance(idx, pays[idx] - 1)
+        keep = lower_final <= 0
+        idx = idx[keep]
+        pays[idx] -= 1
+        final_ostatok[idx] = lower_final[keep]
+        idx = idx[pays[idx] > 1]
+    converged[idx] = False
+
+    # Межовий випадок еталонного поділу навпіл (див. plan_pay.newton_pay) — рахуємо ним
+    idx = np.flatnonzero(converged & (final_ostatok == 0))
+    converged[idx[final_balance(idx, pays[idx] + 1) == -1]] = False
+
+    return pays, ~converged
+
+
+def batch_grafik(sums_cents, daily_rates, delta_days, mask, pays):
+    """Графіки платежів для всіх кредитів: словник колонок GRAFIK_COLUMNS, матриці (N, max_months) у копійках."""
+    ostatok = sums_cents.copy()
+    dolg_by_percents = np.zeros_like(ostatok)
+    columns = {name: np.zeros(delta_days.shape, dtype=np.int64) for name in GRAFIK_COLUMNS}
+
+    for k in range(delta_days.shape[1]):
+        active = mask[:, k]
+        percents = _percents(ostatok, daily_rates, delta_days[:, k])
+        ost_payment = np.where(active, pays, 0)
+
+        # 1. Погашення боргу по %
+        covered = ost_payment >= dolg_by_percents
+        pog_dolg_by_percents = np.where(covered, dolg_by_percents, ost_payment)
+        ost_payment, dolg_by_percents = (np.where(covered, ost_payment - dolg_by_percents, 0),
+                                         np.where(covered, 0, dolg_by_percents - ost_payment))
+
+        # 2. Поточні %
+        covered = ost_payment >= percents
+        pog_percents = np.where(covered, percents, ost_payment)
+        dolg_by_percents += np.where(covered, 0, percents - ost_payment)
+        ost_payment = np.where(covered, ost_payment - percents, 0)
+
+        # 3. Тіло (переплата на останньому платежі зменшує сам платіж)
+        ostatok -= ost_payment
+        overpaid = ostatok < 0
+        current_pay = np.where(active, np.where(overpaid, pays + ostatok, pays), 0)
+        ostatok = np.where(overpaid, 0, ostatok)
+
+        columns["payment"][:, k] = current_pay
+        columns["summa_percent"][:, k] = percents
+        columns["pog_dolg_by_percents"][:, k] = pog_dolg_by_percents
+        columns["pog_summa_percent"][:, k] = pog_percents
+        columns["dolg_percent"][:, k] = np.where(active, dolg_by_percents, 0)
+        columns["pog_credit"][:, k] = ost_payment
+        columns["ostatok"][:, k] = np.where(active, ostatok, 0)
+        columns["total_dolg"][:, k] = np.where(active, ostatok + dolg_by_percents, 0)
+
+    return columns
+
+
+class BatchSchedule:
+    """Результат пакетного розрахунку: планові платежі та графіки всіх кредитів (у копійках)."""
+
+    def __init__(self, credit_sums, plan_pay, months, dates, delta_days, mask, columns):
+        self.credit_sums = credit_sums
+        self.plan_pay = plan_pay
+        self.months = months
+        self.dates = dates
+        self.delta_days = delta_days
+        self.mask = mask
+        self.columns = columns
+        # Як у rozrahunok_plan_pay: сума всіх планових платежів і переплата
+        self.total_pays_sum = plan_pay * months
+        self.pereplata = self.total_pays_sum - np.rint(credit_sums * 100).astype(np.int64)
+
+    def __len__(self):
+        return len(self.plan_pay)
+
+    def grafik(self, i):
+        """Графік i-го кредиту у форматі rozrahunok_plan_pay (Grafik)."""
+        months = int(self.months[i])
+        return Grafik.from_columns(
+            (self.dates[i, :months].astype(np.int64) + EPOCH_ORDINAL).tolist(),
+            self.delta_days[i, :months].tolist(),
+            {name: self.columns[name][i, :months].tolist() for name in GRAFIK_COLUMNS},
+        )
+
+
+def batch_rozrahunok_plan_pay(credit_sums, daily_rates, months, start_dates, pay_days, with_grafik=True):
+    """
+    Пакетний аналог rozrahunok_plan_pay: масиви сум, добових ставок (частка, не %),
+    термінів, дат видачі та днів оплати -> BatchSchedule.
+    """
+    credit_sums = np.asarray(credit_sums, dtype=np.float64)
+    daily_rates = np.asarray(daily_rates, dtype=np.float64)
+    months = np.asarray(months, dtype=np.int64)
+    start_dates = np.asarray(start_dates, dtype="datetime64[D]")
+    pay_days = np.asarray(pay_days, dtype=np.int64)
+
+    sums_cents = np.rint(credit_sums * 100).astype(np.int64)
+    dates, delta_days, mask = batch_payment_calendar(start_dates, months, pay_days)
+
+    pays, not_converged = batch_pidbir_plan_pay(sums_cents, daily_rates, delta_days, mask)
+
+    # Нетипові параметри (дуже високі ставки тощо) — тим самим скалярним підбором, що й rozrahunok_plan_pay
+    for i in np.flatnonzero(not_converged):
+        pays[i] = pidbir_plan_pay_newton(
+            float(credit_sums[i]), float(daily_rates[i]), int(months[i]),
+            start_dates[i].astype(object), int(pay_days[i]),
+        )
+
+    columns = batch_grafik(sums_cents, daily_rates, delta_days, mask, pays) if with_grafik else None
+    return BatchSchedule(credit_sums, pays, months, dates, delta_days, mask, columns)
+
+
+def batch_args_from_credits(credits):
+    """Масиви для batch_rozrahunok_plan_pay з ітерованого набору об'єктів Credit."""
+    credits = list(credits)
+    return (
+        [c.summa_credit for c in credits],
+        [c.percent / 100 for c in credits],
+        [c.srok_months for c in credits],
+        np.array([c.start_date for c in credits], dtype="datetime64[D]"),
+        [c.day_of_pay for c in credits],
+    )
@@ -0,0 +1,166 @@
+"""
+Бенчмарки розрахункового движка (plan_pay, batch_plan_pay, services.process_payment).
+
+Кожне навантаження — функція без аргументів, яка виконує одну операцію; run_benchmark
+міряє час кожного виклику і рахує ops/sec, p50 та p99. Запуск: manage.py bench_credit_engine.
+"""
+import json
+import statistics
+import uuid
+from datetime import date, timedelta
+from time import perf_counter_ns
+
+from django.db import transaction
+
+from credit_system.forms import AddCreditForm
+from credit_system.plan_pay import (
+    rozrahunok_plan_pay, rozrahunok_payment, rozrahunok_offer_grid, pidbir_plan_pay_newton,
+    METHOD_BISECTION, METHOD_NEWTON,
+)
+
+# Добові ставки (частка, не %) — усі варіанти з форми
+DAILY_PERCENTS = [float(value) / 100 for value, label in AddCreditForm.PERCENT_CHOICES]
+# Звичайний день оплати та кінець місяця, де день обрізається (29-31)
+PAY_DAYS = (15, 29, 30, 31)
+TERMS = {'short': 12, 'long': 120}
+START_DATE = date(2025, 1, 31)
+CREDIT_SUM = 25000
+BATCH_SIZE = 1000
+
+
+def _cycle(items):
+    while True:
+        yield from items
+
+
+def _scenarios(months):
+    """Усі комбінації ставка × день оплати для терміну months (по черзі між викликами)."""
+    return _cycle([(CREDIT_SUM, rate, months, START_DATE, pay_day) for rate in DAILY_PERCENTS for pay_day in PAY_DAYS])
+
+
+def plan_pay_workload(months, method):
+    scenarios = _scenarios(months)
+    return lambda: rozrahunok_plan_pay(*next(scenarios), method=method)
+
+
+def payment_workload(months):
+    scenarios = _scenarios(months)
+    prepared = {}
+
+    def run():
+        args = next(scenarios)
+        if args not in prepared:
+            prepared[args] = pidbir_plan_pay_newton(*args)
+        return rozrahunok_payment(*args, prepared[args])
+    return run
+
+
+def offer_grid_workload():
+    return lambda: rozrahunok_offer_grid(CREDIT_SUM, START_DATE, 31, range(1, 61), DAILY_PERCENTS)
+
+
+def batch_workload():
+    from credit_system.batch_plan_pay import batch_rozrahunok_plan_pay
+
+    count = BATCH_SIZE
+    args = (
+        [CREDIT_SUM + 137 * i for i in range(count)],
+        [DAILY_PERCENTS[i % len(DAILY_PERCENTS)] for i in range(count)],
+        [(6, 12, 24, 36, 60)[i % 5] for i in range(count)],
+        [START_DATE + timedelta(days=i % 365) for i in range(count)],
+        [PAY_DAYS[i % len(PAY_DAYS)] for i in range(count)],
+    )
+    return lambda: batch_rozrahunok_plan_pay(*args)
+
+
+def workloads():
+    """Назва навантаження -> фабрика функції, що виконує одну операцію."""
+    result = {}
+    for term, months in TERMS.items():
+        result[f'plan_pay_newton_{term}'] = lambda months=months: plan_pay_workload(months, METHOD_NEWTON)
+        result[f'plan_pay_bisection_{term}'] = lambda months=months: plan_pay_workload(months, METHOD_BISECTION)
+        result[f'rozrahunok_payment_{term}'] = lambda months=months: payment_workload(months)
+    result['offer_grid_60x4'] = offer_grid_workload
+    result[f'batch_plan_pay_{BATCH_SIZE}'] = batch_workload
+    result['process_payment'] = None  # потребує БД, див. run_process_payment_benchmark
+    return result
+
+
+def summarize(durations_ns):
+    """ops/sec, p50 та p99 (мс) за часами окремих викликів."""
+    durations_ms = sorted(d / 1_000_000 for d in durations_ns)
+    total_seconds = sum(durations_ns) / 1_000_000_000
+    if len(durations_ms) > 1:
+        percentiles = statistics.quantiles(durations_ms, n=100, method='inclusive')
+        p50, p99 = percentiles[49], percentiles[98]
+    else:
+        p50 = p99 = durations_ms[0]
+    return {
+        'ops_per_sec': round(len(durations_ms) / total_seconds, 2) if total_seconds else 0.0,
+        'p50_ms': round(p50, 4),
+        'p99_ms': round(p99, 4),
+        'iterations': len(durations_ms),
+    }
+
+
+def run_benchmark(operation, iterations, warmup=20):
+    # warmup покриває всі комбінації ставка × день оплати (прогріває кеш календарів)
+    for _ in range(warmup):
+        operation()
+
+    durations = []
+    for _ in range(iterations):
+        started = perf_counter_ns()
+        operation()
+        durations.append(perf_counter_ns() - started)
+    return summarize(durations)
+
+
+def run_process_payment_benchmark(iterations):
+    """
+    process_payment на тимчасовому кредиті; усі зміни в БД відкочуються. Транзакція тримає блокування
+    весь прогін, тож bench_credit_engine запускає цей бенчмарк у тимчасовій базі (scratch_db).
+    """
+    from credit_system.models import Credit, CustomUser
+    from credit_system.services import process_payment
+
+    with transaction.atomic():
+        user = CustomUser.objects.create(username=f'benchmark-{uuid.uuid4().hex}', role='client')
+        credit = Credit.objects.create(
+            user=user, summa_credit=10_000_000, percent=0.1, start_date=START_DATE,
+            srok_months=360, day_of_pay=31, ostatok=10_000_000, plan_pay=10_000,
+        )
+
+        date_pay = credit.last_pay_date
+        durations = []
+        for _ in range(iterations):
+            date_pay += timedelta(days=1)
+            started = perf_counter_ns()
+            process_payment(credit, 500, date_pay, 1)
+            durations.append(perf_counter_ns() - started)
+
+        transaction.set_rollback(True)
+
+    return summarize(durations)
+
+
+def load_baseline(path):
+    with open(path, encoding='utf-8') as f:
+        return json.load(f)
+
+
+def save_baseline(path, results):
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(results, f, indent=2, sort_keys=True)
+
+
+def find_regressions(results, baseline, threshold):
+    """Навантаження, де ops/sec впали більше ніж на threshold (частка) відносно базового рівня."""
+    regressions = []
+    for name, result in results.items():
+        if name not in baseline:
+            continue
+        expected = baseline[name]['ops_per_sec']
+        if result['ops_per_sec'] < expected * (1 - threshold):
+            regressions.append((name, expected, result['ops_per_sec']))
+    return regressions
@@ -0,0 +1,107 @@
+"""
+Щомісячні контрольні точки стану кредиту (BalanceCheckpoint) і стан на довільну дату.
+
+Точка на кінець місяця E — стан після всіх платежів з date_pay <= E. Точки дописуються при
+проведенні платежу (post_payment, імпорт виписки): кінці місяців між попереднім і новим платежем
+отримують стан до нового платежу (раніше за останній платіж проводити не можна, тож ці точки вже
+не зміняться). Перерахунок історії (replay, manage.py replay_ledger) будує точки кредиту заново.
+credit_state_as_of бере найближчу точку і доповнює її лише платежами після неї.
+"""
+from datetime import date, timedelta
+
+from credit_system.models import BalanceCheckpoint, Payment
+from credit_system.services import allocate_payment_cents, percent_cents, to_cents, from_cents
+
+CHECKPOINT_UPDATE_FIELDS = ['ostatok', 'dolg_percent', 'last_pay_date', 'closed']
+
+
+def month_ends(from_date, to_date):
+    """Кінці місяців E, для яких from_date <= E < to_date."""
+    month_end = date(from_date.year, from_date.month, 1) + timedelta(days=31)
+    month_end = month_end.replace(day=1) - timedelta(days=1)
+
+    while month_end < to_date:
+        yield month_end
+        month_end = (month_end + timedelta(days=32)).replace(day=1) - timedelta(days=1)
+
+
+def checkpoints_between(credit_id, ostatok, dolg_percent, last_pay_date, closed, to_date):
+    """Точки зі станом (ostatok, dolg_percent у копійках) на всі кінці місяців від last_pay_date до to_date."""
+    return [
+        BalanceCheckpoint(
+            credit_id=credit_id, checkpoint_date=month_end, ostatok=from_cents(ostatok),
+            dolg_percent=from_cents(dolg_percent), last_pay_date=last_pay_date, closed=closed,
+        )
+        for month_end in month_ends(last_pay_date, to_date)
+    ]
+
+
+def checkpoints_from_history(credit_id, start_date, summa_credit, history, until=None):
+    """
+    Усі точки кредиту за історією [(date_pay, ostatok, dolg_percent)] — стан (у копійках) після
+    кожного платежу в порядку дати. Точки після останнього платежу — лише до until (не включно).
+    """
+    checkpoints = []
+    ostatok, dolg_percent, last_pay_date, closed = to_cents(summa_credit), 0, start_date, False
+
+    for date_pay, new_ostatok, new_dolg_percent in history:
+        checkpoints += checkpoints_between(credit_id, ostatok, dolg_percent, last_pay_date, closed, date_pay)
+        ostatok, dolg_percent, last_pay_date = new_ostatok, new_dolg_percent, date_pay
+        # Залишок стає нулем лише при закритті кредиту
+        closed = closed or ostatok == 0
+
+    if until is not None:
+        checkpoints += checkpoints_between(credit_id, ostatok, dolg_percent, last_pay_date, closed, until)
+    return checkpoints
+
+
+def save_checkpoints(checkpoints):
+    return BalanceCheckpoint.objects.bulk_create(
+        checkpoints, update_conflicts=True,
+        unique_fields=['credit', 'checkpoint_date'], update_fields=CHECKPOINT_UPDATE_FIELDS,
+    )
+
+
+def replace_checkpoints(credit_ids, checkpoints):
+    """Повна заміна точок кредитів (після перерахунку історії)."""
+    BalanceCheckpoint.objects.filter(credit_id__in=credit_ids).delete()
+    return BalanceCheckpoint.objects.bulk_create(checkpoints)
+
+
+def credit_state_as_of(credit, as_of):
+    """
+    Стан кредиту на кінець дня as_of (гривні): залишок, борг по %, дата останнього платежу,
+    нараховані з неї відсотки і загальна заборгованість. Два запити: найближча точка
+    і платежі після неї до as_of.
+    """
+    if as_of < credit.start_date:
+        raise ValueError("Дата раніше дати видачі кредиту.")
+
+    checkpoint = (credit.checkpoints.filter(checkpoint_date__lte=as_of)
+                  .order_by('-checkpoint_date').first())
+    if checkpoint is not None:
+        ostatok, dolg_percent = int(checkpoint.ostatok * 100), int(checkpoint.dolg_percent * 100)
+        last_pay_date, closed = checkpoint.last_pay_date, checkpoint.closed
+        payments = Payment.objects.filter(credit=credit, date_pay__gt=checkpoint.checkpoint_date, date_pay__lte=as_of)
+    else:
+        ostatok, dolg_percent, last_pay_date, closed = to_cents(credit.summa_credit), 0, credit.start_date, False
+        payments = Payment.objects.filter(credit=credit, date_pay__lte=as_of)
+
+    for date_pay, pay, ost_payment in payments.order_by('date_pay', 'id').values_list('date_pay', 'pay', 'ost_payment'):
+        # Отримана сума — платіж разом з переплатою, як у replay
+        received = int((pay + ost_payment) * 100)
+        result = allocate_payment_cents(ostatok, dolg_percent, credit.percent, received, (date_pay - last_pay_date).days)
+        ostatok, dolg_percent, last_pay_date = result['ostatok'], result['dolg_percent'], date_pay
+        closed = closed or result['closed']
+
+    summa_percent = 0 if closed else percent_cents(ostatok, credit.percent, (as_of - last_pay_date).days)
+    return {
+        'as_of': as_of,
+        'checkpoint_date': checkpoint.checkpoint_date if checkpoint else None,
+        'ostatok': from_cents(ostatok),
+        'dolg_percent': from_cents(dolg_percent),
+        'last_pay_date': last_pay_date,
+        'closed': closed,
+        'summa_percent': from_cents(summa_percent),
+        'total_dolg': from_cents(ostatok + dolg_percent + summa_percent),
+    }
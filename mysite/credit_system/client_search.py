@@ -0,0 +1,147 @@
+"""
+Індексований пошук клієнтів.
+
+CustomUser.search_text — нормалізований (нижній регістр, єдиний апостроф, одинарні пробіли) рядок
+з ПІБ, ІПН, телефону (також лише цифрами), адрес і паспорта; оновлюється в CustomUser.save.
+SQLite: зовнішня FTS5-таблиця з триграмним токенізатором поверх search_text, синхронізується
+тригерами. PostgreSQL: GIN-індекс gin_trgm_ops (pg_trgm) на search_text, який обслуговує LIKE '%...%'.
+
+Точні значення йдуть в індексовані порівняння на рівність: 10 цифр (не з нуля) — ІПН,
+дві літери і 6 цифр — серія і номер паспорта-книжечки. 9 цифр можуть бути і номером ID-картки,
+і частиною телефону чи ІПН, тож номер ID-картки шукається на рівність разом із повнотекстовим пошуком.
+"""
+import re
+
+from django.db import connections
+from django.db.models import Q
+from django.db.models.expressions import RawSQL
+
+FTS_TABLE = 'credit_system_client_fts'
+USER_TABLE = 'credit_system_customuser'
+TRGM_INDEX = 'credit_system_customuser_search_trgm'
+# Триграмний індекс шукає лише слова від трьох символів
+MIN_FTS_TERM = 3
+
+# 10 цифр з нулем попереду — це радше телефон (0XX...), його шукаємо повнотекстово
+IPN_RE = re.compile(r'^[1-9]\d{9}$')
+ID_CARD_RE = re.compile(r'^\d{9}$')
+PASSPORT_RE = re.compile(r'^([A-ZА-ЯІЇЄҐ]{2})\s*(\d{6})$')
+APOSTROPHES_RE = re.compile(r"[’ʼ`´‘]")
+
+SQLITE_TRIGGERS = {
+    f'{FTS_TABLE}_ai': f"""
+        CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_ai AFTER INSERT ON {USER_TABLE} BEGIN
+            INSERT INTO {FTS_TABLE}(rowid, search_text) VALUES (new.id, new.search_text);
+        END""",
+    f'{FTS_TABLE}_ad': f"""
+        CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_ad AFTER DELETE ON {USER_TABLE} BEGIN
+            INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, search_text) VALUES ('delete', old.id, old.search_text);
+        END""",
+    f'{FTS_TABLE}_au': f"""
+        CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_au AFTER UPDATE OF search_text ON {USER_TABLE} BEGIN
+            INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, search_text) VALUES ('delete', old.id, old.search_text);
+            INSERT INTO {FTS_TABLE}(rowid, search_text) VALUES (new.id, new.search_text);
+        END""",
+}
+
+
+def normalize(text):
+    """Нижній регістр, один вид апострофа, одинарні пробіли."""
+    return ' '.join(APOSTROPHES_RE.sub("'", text or '').casefold().split())
+
+
+def build_search_text(user):
+    phone = user.phone_number or ''
+    parts = [
+        user.last_name, user.first_name, user.middle_name, user.IPN, phone, re.sub(r'\D', '', phone),
+        user.address, user.address_registration, user.address_residential,
+        f'{user.passport_series or ""}{user.passport_number or ""}', user.passport_number,
+    ]
+    return normalize(' '.join(part for part in parts if part))
+
+
+def install_search_index(connection):
+    """
+    Створює індекс пошуку, якщо його немає (ідемпотентно). На SQLite перестворення таблиці користувачів
+    міграцією видаляє тригери — тоді вони створюються знову, а FTS-таблиця перебудовується.
+    """
+    with connection.cursor() as cursor:
+        if connection.vendor == 'sqlite':
+            cursor.execute(
+                "SELECT name FROM sqlite_master WHERE type IN ('table', 'trigger') AND name LIKE %s",
+                [f'{FTS_TABLE}%'],
+            )
+            existing = {row[0] for row in cursor.fetchall()}
+            if FTS_TABLE in existing and existing.issuperset(SQLITE_TRIGGERS):
+                return
+
+            cursor.execute(
+                f"CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} USING fts5("
+                f"search_text, content='{USER_TABLE}', content_rowid='id', tokenize='trigram')"
+            )
+            for sql in SQLITE_TRIGGERS.values():
+                cursor.execute(sql)
+            cursor.execute(f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('rebuild')")
+
+        elif connection.vendor == 'postgresql':
+            cursor.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+            cursor.execute(
+                f"CREATE INDEX IF NOT EXISTS {TRGM_INDEX} ON {USER_TABLE} USING gin (search_text gin_trgm_ops)"
+            )
+
+
+def drop_search_index(connection):
+    with connection.cursor() as cursor:
+        if connection.vendor == 'sqlite':
+            for trigger in SQLITE_TRIGGERS:
+                cursor.execute(f"DROP TRIGGER IF EXISTS {trigger}")
+            cursor.execute(f"DROP TABLE IF EXISTS {FTS_TABLE}")
+        elif connection.vendor == 'postgresql':
+            cursor.execute(f"DROP INDEX IF EXISTS {TRGM_INDEX}")
+
+
+def exact_lookup(query):
+    """Q для точного значення (ІПН, паспорт) або None, якщо запит схожий на довільний текст."""
+    query = query.strip()
+    if IPN_RE.match(query):
+        return Q(IPN=query)
+
+    passport = PASSPORT_RE.match(query.upper())
+    if passport:
+        return Q(passport_series=passport.group(1), passport_number=passport.group(2))
+    return None
+
+
+def fts_match(terms):
+    """Запит MATCH: кожне слово — окрема фраза, всі слова обов'язкові."""
+    return ' AND '.join('"{}"'.format(term.replace('"', '""')) for term in terms)
+
+
+def text_lookup(query, using):
+    """Q повнотекстового пошуку: всі слова запиту мають бути в search_text."""
+    lookup = Q()
+    terms = normalize(query).split()
+    if connections[using].vendor == 'sqlite':
+        fts_terms = [term for term in terms if len(term) >= MIN_FTS_TERM]
+        if fts_terms:
+            lookup &= Q(pk__in=RawSQL(f"SELECT rowid FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s",
+                                      [fts_match(fts_terms)]))
+        # Короткі слова індекс не покриває — їх доперевіряємо по search_text вже відібраних рядків
+        terms = [term for term in terms if len(term) < MIN_FTS_TERM]
+
+    for term in terms:
+        lookup &= Q(search_text__contains=term)
+    return lookup
+
+
+def search_clients(queryset, query):
+    """Фільтрує queryset користувачів за рядком пошуку."""
+    lookup = exact_lookup(query)
+    if lookup is not None:
+        return queryset.filter(lookup)
+
+    lookup = text_lookup(query, queryset.db)
+    if ID_CARD_RE.match(query.strip()):
+        # Номер ID-картки — на додачу до пошуку по телефону, ІПН тощо, а не замість нього
+        lookup |= Q(passport_number=query.strip())
+    return queryset.filter(lookup)
@@ -0,0 +1,109 @@
+"""
+Підсумок кредитного портфеля клієнта (ClientSummary): кількість кредитів, відкритих кредитів
+і загальний залишок.
+
+Підсумок оновлюється приростами (UPDATE ... SET credits = credits + ...) в тій самій транзакції,
+що й зміна кредиту, тож паралельні проведення по кредитах одного клієнта не перетирають одне
+одного. Приріст рахується від стану, з яким кредит прочитали з БД (Credit.from_db), до нового:
+Credit.save (створення, закриття, платіж через process_payment), видалення кредиту (сигнал pre_delete),
+масові шляхи без save (імпорт виписки, replay). Ті самі зміни переносяться в підсумок портфеля
+(portfolio). manage.py rebuild_client_summaries перераховує підсумки з таблиці кредитів.
+"""
+from collections import defaultdict, namedtuple
+from decimal import Decimal
+
+from django.db import transaction
+
+from credit_system.models import ClientSummary, Credit, CustomUser
+from credit_system.portfolio import credits_changed, increment_rows, to_decimal
+
+CHUNK_SIZE = 2000
+SUMMARY_FIELDS = ['credits', 'open_credits', 'total_ostatok']
+# Поля кредиту, від яких залежать підсумки
+STATE_FIELDS = ['id', 'user_id', 'closed', 'ostatok', 'dolg_percent', 'start_date', 'last_pay_date']
+
+CreditState = namedtuple('CreditState', 'credit_id user_id is_open ostatok dolg_percent start_date closed_on')
+
+
+def credit_state(credit):
+    """Внесок кредиту в підсумки клієнта і портфеля."""
+    return CreditState(
+        credit.pk, credit.user_id, not credit.closed, to_decimal(credit.ostatok), to_decimal(credit.dolg_percent),
+        credit.start_date, credit.last_pay_date if credit.closed else None,
+    )
+
+
+def stored_credit_state(credit_id):
+    """Стан кредиту, як він є в БД (None — рядка немає)."""
+    row = Credit.objects.filter(pk=credit_id).values(*STATE_FIELDS).first()
+    return credit_state(Credit(**row)) if row else None
+
+
+def new_deltas():
+    return defaultdict(lambda: [0, 0, Decimal(0)])
+
+
+def add_delta(deltas, old, new):
+    """Приріст від стану old до new (None — кредиту не було або більше немає)."""
+    for state, sign in ((old, -1), (new, 1)):
+        if state is not None:
+            delta = deltas[state.user_id]
+            delta[0] += sign
+            delta[1] += sign * state.is_open
+            delta[2] += sign * state.ostatok
+    return deltas
+
+
+def apply_changes(changes):
+    """changes — [(старий, новий)] стан кредиту або None; оновлює підсумки клієнтів і портфеля."""
+    deltas = new_deltas()
+    for old, new in changes:
+        add_delta(deltas, old, new)
+    increment_rows(ClientSummary, deltas, SUMMARY_FIELDS)
+    credits_changed(changes)
+
+
+def update_summaries(credits):
+    """Переносить у підсумки зміни кредитів відносно стану, з яким їх прочитали (або створили)."""
+    changes = []
+    for credit in credits:
+        new = credit_state(credit)
+        changes.append((credit._summary_state, new))
+        credit._summary_state = new
+    apply_changes(changes)
+
+
+def credit_deleted(sender, instance, **kwargs):
+    """Сигнал pre_delete для Credit: внесок береться з рядка в БД, а не з (можливо застарілого) об'єкта."""
+    state = stored_credit_state(instance.pk)
+    if state:
+        apply_changes([(state, None)])
+
+
+def rebuild_client_summaries(user_ids=None, chunk_size=CHUNK_SIZE, progress=None):
+    """
+    Перераховує підсумки з таблиці кредитів (усіх користувачів або user_ids) пачками клієнтів.
+    progress(клієнтів) викликається після кожної пачки. Повертає кількість клієнтів.
+    """
+    users = CustomUser.objects.order_by('pk')
+    if user_ids is not None:
+        users = users.filter(pk__in=user_ids)
+    ids = list(users.values_list('pk', flat=True))
+
+    for start in range(0, len(ids), chunk_size):
+        chunk = ids[start:start + chunk_size]
+        deltas = {user_id: [0, 0, Decimal(0)] for user_id in chunk}
+        rows = Credit.objects.filter(user_id__in=chunk).values_list('user_id', 'closed', 'ostatok')
+        for user_id, closed, ostatok in rows.iterator(chunk_size=chunk_size):
+            add_delta(deltas, None, credit_state(Credit(user_id=user_id, closed=closed, ostatok=ostatok)))
+
+        with transaction.atomic():
+            ClientSummary.objects.bulk_create(
+                [ClientSummary(user_id=user_id, credits=credits, open_credits=open_credits, total_ostatok=ostatok)
+                 for user_id, (credits, open_credits, ostatok) in deltas.items()],
+                update_conflicts=True, unique_fields=['user'], update_fields=SUMMARY_FIELDS,
+            )
+        if progress:
+            progress(start + len(chunk))
+
+    return len(ids)
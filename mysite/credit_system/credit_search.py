@@ -0,0 +1,56 @@
+"""
+Пошук кредитів по номеру.
+
+Номер кредиту — NNNN/YYYY-POSTFIX, зібраний з number1, number2 і number3 (у старих кредитах рік
+двозначний: 0001/25-Credit). Запити, схожі на номер з роком (0012/2025, 12/25, 0012/2025-Credit), стають
+точними умовами на (number1, number2[, number3]) — префікс унікального індексу (number1, number2, number3),
+тож пошук точковий. 10 цифр — ІПН клієнта (теж унікальний індекс). Голе число (0012, 2025, 30412) може бути
+і порядковим номером, і роком, і частиною ІПН, тому точна умова на number1 доповнюється пошуком по підрядку.
+Решта — звичайний пошук по підрядку.
+"""
+import re
+
+from django.db.models import Q
+
+NUMBER_RE = re.compile(r'^№?\s*(\d{1,6})(?:\s*/\s*(\d{2}|\d{4}))?(?:-(\S+))?$')
+IPN_RE = re.compile(r'^\d{10}$')
+
+
+def credit_number_lookup(query):
+    """Q для запиту, схожого на номер кредиту чи ІПН, або None для довільного тексту."""
+    query = query.strip()
+    if IPN_RE.match(query):
+        return Q(user__IPN=query)
+
+    match = NUMBER_RE.match(query)
+    if not match:
+        return None
+
+    number1, year, number3 = match.groups()
+    lookup = Q(number1=int(number1))
+    if year:
+        lookup &= Q(number2=int(year) + 2000 if len(year) == 2 else int(year))
+    if number3:
+        lookup &= Q(number3__iexact=number3)
+    elif not year:
+        lookup |= substring_lookup(query)
+    return lookup
+
+
+def substring_lookup(query):
+    """Пошук по підрядку номера, ІПН і ПІБ клієнта."""
+    return (
+            Q(number__icontains=query) |
+            Q(user__IPN__icontains=query) |
+            Q(user__last_name__icontains=query) |
+            Q(user__first_name__icontains=query) |
+            Q(user__middle_name__icontains=query)
+    )
+
+
+def search_credits(queryset, query):
+    """Фільтрує queryset кредитів за рядком пошуку."""
+    lookup = credit_number_lookup(query)
+    if lookup is None:
+        lookup = substring_lookup(query.strip())
+    return queryset.filter(lookup)
@@ -80,6 +80,10 @@ class CustomUserChangeForm(UserChangeForm):
         fields = '__all__'
 
 class AddCreditForm(forms.Form):
+    # Найбільший термін (міс.) — як CalculatorForm.MAX_SROK: решту графіка попереднього перегляду
+    # показує calculator_schedule, а довші календарі не потрапляють у кеш розрахунків
+    MAX_SROK = 360
+
     start_date = forms.DateField(
         label="Дата видачі",
         input_formats=["%Y-%m-%d"],
@@ -89,7 +93,8 @@ class AddCreditForm(forms.Form):
     srok_months = forms.IntegerField(
         label="Термін (міс.)",
         initial=12,
-        widget=forms.NumberInput(attrs={"class": "form-control"}))
+        max_value=MAX_SROK,
+        widget=forms.NumberInput(attrs={"class": "form-control", "max": MAX_SROK}))
 
     day_of_pay = forms.IntegerField(
         label="День оплати",
@@ -169,6 +174,32 @@ class AddCreditForm(forms.Form):
 
         return cleaned_data
 
+class OfferGridForm(forms.Form):
+    """Параметри сітки пропозицій (термін × ставка) для сторінки нового кредиту."""
+    MAX_SROK = AddCreditForm.MAX_SROK
+
+    credit_sum = forms.FloatField(label="Сума (грн)")
+    start_date = forms.DateField(label="Дата видачі", input_formats=["%Y-%m-%d"])
+    day_of_pay = forms.IntegerField(label="День оплати", min_value=1, max_value=31)
+    min_srok = forms.IntegerField(label="Мінімальний термін (міс.)", required=False, min_value=1, max_value=MAX_SROK)
+    max_srok = forms.IntegerField(label="Максимальний термін (міс.)", required=False, min_value=1, max_value=MAX_SROK)
+
+    # Перевірка даних
+    def clean(self):
+        cleaned_data = super().clean()
+
+        credit_sum = cleaned_data.get('credit_sum')
+        if credit_sum is not None and credit_sum < 1000:
+            self.add_error('credit_sum', "Сума кредиту має бути не менше 1000 грн")
+
+        # Типовий діапазон термінів — від 1 до 60 місяців
+        cleaned_data['min_srok'] = cleaned_data.get('min_srok') or 1
+        cleaned_data['max_srok'] = cleaned_data.get('max_srok') or 60
+        if cleaned_data['min_srok'] > cleaned_data['max_srok']:
+            self.add_error('max_srok', "Максимальний термін має бути не менше мінімального.")
+
+        return cleaned_data
+
 class ClientCreationForm(UserCreationForm):
     password1 = forms.CharField(
         label="Пароль",
@@ -237,4 +268,10 @@ class ClientCreationForm(UserCreationForm):
 
         if commit:
             user.save()
-        return user
\ No newline at end of file
+        return user
+
+class ImportPaymentsForm(forms.Form):
+    """Завантаження банківської виписки (CSV) для масового імпорту платежів."""
+    statement = forms.FileField(
+        label="Виписка (CSV)",
+        widget=forms.ClearableFileInput(attrs={"class": "form-control", "accept": ".csv"}))
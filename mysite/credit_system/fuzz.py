@@ -0,0 +1,264 @@
+"""
+Диференційне fuzz-тестування швидких движків проти еталонних.
+
+Генератор (з фіксованим seed) створює випадкові кредити та потоки платежів; кожен випадок
+рахується еталонним кодом і швидким движком, результати порівнюються до копійки:
+- графік: rozrahunok_plan_pay(method=METHOD_BISECTION) проти Ньютона, iter_grafik
+  та batch_rozrahunok_plan_pay;
+- платежі: services.process_payment (з записом у БД, кожен випадок — у точці збереження з відкатом)
+  проти services.allocate_payment_cents.
+Запуск: manage.py fuzz_credit_engine (платежі рахуються в тимчасовій базі, див. scratch_db).
+"""
+import random
+import time
+import uuid
+from datetime import date, timedelta
+
+from django.db import transaction
+
+from credit_system.forms import AddCreditForm
+from credit_system.plan_pay import (
+    rozrahunok_plan_pay, iter_grafik, get_payment_calendar, to_cents, METHOD_BISECTION,
+)
+
+PLAN_PAY_ENGINES = ('newton', 'iter_grafik', 'batch')
+PAYMENT_ENGINES = ('allocate_payment_cents',)
+
+# Добові ставки у % — з форми плюс довільні від 0,01 до 0,50
+FORM_PERCENTS = [float(value) for value, label in AddCreditForm.PERCENT_CHOICES]
+TERMS = (1, 2, 3, 6, 12, 24, 36, 60, 120)
+MAX_TERM = 180
+FIRST_DAY = date(2020, 1, 1)
+LAST_DAY = date(2030, 12, 31)
+BATCH_CHUNK = 1000
+
+
+def random_credit(rng):
+    """(сума, добова ставка (частка), термін, дата видачі, день оплати) з акцентом на межові випадки."""
+    credit_sum = rng.randint(100_00, 500_000_00) / 100
+    percent = rng.choice(FORM_PERCENTS) if rng.random() < 0.7 else rng.randint(1, 50) / 100
+    months = rng.choice(TERMS) if rng.random() < 0.7 else rng.randint(1, MAX_TERM)
+
+    start_date = FIRST_DAY + timedelta(days=rng.randint(0, (LAST_DAY - FIRST_DAY).days))
+    if rng.random() < 0.25:
+        # Кінець місяця (28/29 лютого, 30, 31)
+        start_date = date(start_date.year, start_date.month, 1) + timedelta(days=31)
+        start_date = start_date.replace(day=1) - timedelta(days=1)
+
+    # День оплати 29-31 обрізається до кінця коротких місяців
+    pay_day = rng.choice((29, 30, 31)) if rng.random() < 0.5 else rng.randint(1, 31)
+
+    return credit_sum, percent / 100, months, start_date, pay_day
+
+
+def random_payments(rng, credit_case, plan_pay):
+    """
+    Потік платежів (дата, сума в копійках) по кредиту: планові, часткові (менші за відсотки),
+    збільшені та дострокове погашення з переплатою на останньому платежі.
+    """
+    credit_sum, daily_percent, months, start_date, pay_day = credit_case
+    date_pay = start_date
+
+    for planned_date in get_payment_calendar(start_date, months, pay_day).dates:
+        # Дата з відхиленням від графіка, але не раніше попереднього платежу
+        date_pay = max(date_pay, planned_date + timedelta(days=rng.randint(-10, 10)))
+
+        kind = rng.random()
+        if kind < 0.5:
+            pay = plan_pay
+        elif kind < 0.7:
+            pay = rng.randint(1, plan_pay)
+        elif kind < 0.97:
+            pay = rng.randint(plan_pay, plan_pay * 3)
+        else:
+            pay = to_cents(credit_sum) * 2
+        yield date_pay, pay
+
+
+def _divergence(engine, case, row, field, reference, fast):
+    return {'engine': engine, 'case': case, 'row': row, 'field': field, 'reference': reference, 'fast': fast}
+
+
+def first_row_divergence(engine, case, reference_rows, fast_rows):
+    """Перший рядок (1-based) і поле, де графіки у форматі Grafik.to_list() відрізняються."""
+    for number, (reference_row, fast_row) in enumerate(zip(reference_rows, fast_rows), start=1):
+        for field, value in reference_row.items():
+            if fast_row.get(field) != value:
+                return _divergence(engine, case, number, field, value, fast_row.get(field))
+
+    if len(reference_rows) != len(fast_rows):
+        return _divergence(engine, case, min(len(reference_rows), len(fast_rows)) + 1,
+                           'rows', len(reference_rows), len(fast_rows))
+    return None
+
+
+class EngineStats:
+    """Лічильники одного движка: кількість випадків/рядків, час еталону і швидкого шляху, розбіжності."""
+
+    def __init__(self):
+        self.cases = 0
+        self.rows = 0
+        self.reference_seconds = 0.0
+        self.fast_seconds = 0.0
+        self.divergences = 0
+        self.first_divergence = None
+
+    def add_divergence(self, divergence):
+        if divergence is None:
+            return
+        self.divergences += 1
+        if self.first_divergence is None:
+            self.first_divergence = divergence
+
+    def as_dict(self):
+        return {
+            'cases': self.cases,
+            'rows': self.rows,
+            'reference_per_sec': round(self.cases / self.reference_seconds, 2) if self.reference_seconds else 0.0,
+            'fast_per_sec': round(self.cases / self.fast_seconds, 2) if self.fast_seconds else 0.0,
+            'divergences': self.divergences,
+            'first_divergence': self.first_divergence,
+        }
+
+
+def _timed(func, *args, **kwargs):
+    started = time.perf_counter()
+    result = func(*args, **kwargs)
+    return result, time.perf_counter() - started
+
+
+def fuzz_plan_pay(cases, engines=PLAN_PAY_ENGINES):
+    """Порівнює графіки швидких движків з еталонним поділом навпіл; повертає {движок: EngineStats}."""
+    from credit_system.batch_plan_pay import batch_rozrahunok_plan_pay
+
+    stats = {engine: EngineStats() for engine in engines}
+    references = []
+    reference_seconds = 0.0
+    for case in cases:
+        reference, seconds = _timed(rozrahunok_plan_pay, *case, method=METHOD_BISECTION)
+        reference_seconds += seconds
+        references.append(reference)
+
+    for engine in engines:
+        stats[engine].cases = len(cases)
+        stats[engine].reference_seconds = reference_seconds
+
+    for case, (plan_pay, grafik, *_) in zip(cases, references):
+        reference_rows = grafik.to_list()
+
+        if 'newton' in stats:
+            (fast_pay, fast_grafik, *_), seconds = _timed(rozrahunok_plan_pay, *case)
+            stats['newton'].fast_seconds += seconds
+            stats['newton'].rows += len(reference_rows)
+            if fast_pay != plan_pay:
+                stats['newton'].add_divergence(_divergence('newton', case, 0, 'plan_pay', plan_pay, fast_pay))
+            else:
+                stats['newton'].add_divergence(
+                    first_row_divergence('newton', case, reference_rows, fast_grafik.to_list()))
+
+        if 'iter_grafik' in stats:
+            fast_rows, seconds = _timed(lambda: list(iter_grafik(*case, to_cents(plan_pay))))
+            stats['iter_grafik'].fast_seconds += seconds
+            stats['iter_grafik'].rows += len(reference_rows)
+            stats['iter_grafik'].add_divergence(
+                first_row_divergence('iter_grafik', case, reference_rows, fast_rows))
+
+    if 'batch' in stats:
+        for start in range(0, len(cases), BATCH_CHUNK):
+            chunk = cases[start:start + BATCH_CHUNK]
+            schedule, seconds = _timed(batch_rozrahunok_plan_pay, *zip(*chunk))
+            stats['batch'].fast_seconds += seconds
+
+            for i, case in enumerate(chunk):
+                plan_pay, grafik = references[start + i][:2]
+                reference_rows = grafik.to_list()
+                stats['batch'].rows += len(reference_rows)
+                fast_pay = int(schedule.plan_pay[i]) / 100
+                if fast_pay != plan_pay:
+                    stats['batch'].add_divergence(_divergence('batch', case, 0, 'plan_pay', plan_pay, fast_pay))
+                else:
+                    stats['batch'].add_divergence(
+                        first_row_divergence('batch', case, reference_rows, schedule.grafik(i).to_list()))
+
+    return stats
+
+
+def fuzz_payments(cases, rng):
+    """
+    Проганяє потоки платежів через process_payment і allocate_payment_cents,
+    порівнює результат кожного платежу та стан кредиту. Кожен випадок — окрема транзакція з відкатом,
+    тож блокування (лічильник номерів, підсумки портфеля) не тримаються весь прогін.
+    """
+    from credit_system.models import CustomUser
+
+    stats = EngineStats()
+    # Випадкове ім'я не збігається з наявними користувачами
+    user = CustomUser.objects.create(username=f'fuzz-{uuid.uuid4().hex}', role='client')
+    try:
+        for case in cases:
+            with transaction.atomic():
+                fuzz_credit_payments(stats, user, case, rng)
+                transaction.set_rollback(True)
+    finally:
+        user.delete()
+
+    return {'allocate_payment_cents': stats}
+
+
+def fuzz_credit_payments(stats, user, case, rng):
+    """Один випадок fuzz_payments: кредит і потік платежів по ньому."""
+    from credit_system.models import Credit
+    from credit_system.services import process_payment, allocate_payment_cents
+
+    fields = ('summa_percent', 'pog_summa_percent', 'dolg_percent', 'pog_credit', 'ostatok', 'ost_payment')
+    credit_sum, daily_percent, months, start_date, pay_day = case
+    plan_pay = rozrahunok_plan_pay(*case)[0]
+    credit = Credit.objects.create(
+        user=user, summa_credit=credit_sum, percent=daily_percent * 100, start_date=start_date,
+        srok_months=months, day_of_pay=pay_day, ostatok=credit_sum, plan_pay=plan_pay,
+    )
+    stats.cases += 1
+
+    ostatok, dolg_percent, last_pay_date = to_cents(credit_sum), 0, start_date
+    for number, (date_pay, pay) in enumerate(random_payments(rng, case, to_cents(plan_pay)), start=1):
+        delta_days = (date_pay - last_pay_date).days
+
+        reference, seconds = _timed(process_payment, credit, pay / 100, date_pay, delta_days)
+        stats.reference_seconds += seconds
+        fast, seconds = _timed(allocate_payment_cents, ostatok, dolg_percent, credit.percent, pay, delta_days)
+        stats.fast_seconds += seconds
+        stats.rows += 1
+
+        ostatok, dolg_percent, last_pay_date = fast['ostatok'], fast['dolg_percent'], date_pay
+        actual = {field: to_cents(reference[field]) for field in fields}
+        actual['closed'] = credit.closed
+        actual['credit.ostatok'] = to_cents(credit.ostatok)
+        actual['credit.dolg_percent'] = to_cents(credit.dolg_percent)
+        expected = dict(fast, **{'credit.ostatok': ostatok, 'credit.dolg_percent': dolg_percent})
+
+        divergence = next((
+            _divergence('allocate_payment_cents', case, number, field, actual[field], expected[field])
+            for field in actual if actual[field] != expected[field]
+        ), None)
+        if divergence is not None:
+            divergence['date_pay'] = date_pay
+            divergence['pay'] = pay / 100
+            stats.add_divergence(divergence)
+            return
+        if credit.closed:
+            return
+
+
+def run_fuzz(seed, credits, engines=PLAN_PAY_ENGINES + PAYMENT_ENGINES):
+    """Генерує credits випадкових кредитів (seed — для відтворення) і повертає статистику по движках."""
+    rng = random.Random(seed)
+    cases = [random_credit(rng) for _ in range(credits)]
+
+    stats = {}
+    plan_pay_engines = [engine for engine in engines if engine in PLAN_PAY_ENGINES]
+    if plan_pay_engines:
+        stats.update(fuzz_plan_pay(cases, plan_pay_engines))
+    if any(engine in PAYMENT_ENGINES for engine in engines):
+        stats.update(fuzz_payments(cases, rng))
+
+    return {engine: engine_stats.as_dict() for engine, engine_stats in stats.items()}
@@ -0,0 +1,34 @@
+import time
+from datetime import date
+
+from django.core.management.base import BaseCommand, CommandError
+
+from credit_system.accrual import run_accrual, CHUNK_SIZE
+
+
+class Command(BaseCommand):
+    help = ("Нічне нарахування відсотків: знімок нарахованих з дати останнього платежу відсотків "
+            "по всіх відкритих кредитах. Перерваний запуск продовжується з місця зупинки.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--date', help="Дата нарахування (рррр-мм-дд), за замовчуванням — сьогодні")
+        parser.add_argument('--chunk-size', type=int, default=CHUNK_SIZE, help="Кредитів у пачці")
+        parser.add_argument('--restart', action='store_true', help="Почати нарахування на дату з початку")
+
+    def handle(self, *args, **options):
+        try:
+            accrual_date = date.fromisoformat(options['date']) if options['date'] else date.today()
+        except ValueError:
+            raise CommandError(f"Невірна дата: '{options['date']}'")
+        if options['chunk_size'] < 1:
+            raise CommandError("--chunk-size має бути не менше 1")
+
+        started = time.perf_counter()
+        run = run_accrual(
+            accrual_date, options['chunk_size'], options['restart'],
+            progress=lambda run: self.stdout.write(f"Оброблено кредитів: {run.credits} (до id {run.last_credit_id})"),
+        )
+        self.stdout.write(self.style.SUCCESS(
+            f"Нарахування на {accrual_date:%d.%m.%Y} завершено: кредитів {run.credits}, "
+            f"{time.perf_counter() - started:.1f} с"
+        ))
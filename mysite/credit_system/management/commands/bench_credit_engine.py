@@ -0,0 +1,54 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from credit_system import benchmarks
+from credit_system.scratch_db import scratch_database
+
+
+class Command(BaseCommand):
+    help = ("Бенчмарк розрахункового движка: ops/sec, p50 та p99 для кожного навантаження. "
+            "Може зберегти базовий рівень у файл і впасти, якщо продуктивність погіршилась.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--iterations', type=int, default=200, help="Кількість вимірів на навантаження")
+        parser.add_argument('--filter', default='', help="Запускати лише навантаження, назва яких містить цей рядок")
+        parser.add_argument('--baseline', help="JSON-файл з базовим рівнем для порівняння")
+        parser.add_argument('--save-baseline', help="Зберегти результати як базовий рівень у JSON-файл")
+        parser.add_argument('--threshold', type=float, default=0.2,
+                            help="Допустиме падіння ops/sec відносно базового рівня (частка, 0.2 = 20%%)")
+
+    def handle(self, *args, **options):
+        iterations = options['iterations']
+        if iterations < 1:
+            raise CommandError("--iterations має бути не менше 1")
+
+        results = {}
+        for name, factory in benchmarks.workloads().items():
+            if options['filter'] not in name:
+                continue
+            if factory is None:
+                # Пише в БД — у тимчасовій базі, а не в робочій
+                with scratch_database():
+                    result = benchmarks.run_process_payment_benchmark(iterations)
+            else:
+                result = benchmarks.run_benchmark(factory(), iterations)
+            results[name] = result
+            self.stdout.write(
+                f"{name:<28} {result['ops_per_sec']:>12.2f} ops/s   "
+                f"p50 {result['p50_ms']:>9.4f} ms   p99 {result['p99_ms']:>9.4f} ms"
+            )
+
+        if not results:
+            raise CommandError(f"Немає навантажень, що відповідають фільтру '{options['filter']}'")
+
+        if options['save_baseline']:
+            benchmarks.save_baseline(options['save_baseline'], results)
+            self.stdout.write(f"Базовий рівень збережено: {options['save_baseline']}")
+
+        if options['baseline']:
+            regressions = benchmarks.find_regressions(
+                results, benchmarks.load_baseline(options['baseline']), options['threshold'])
+            if regressions:
+                details = "; ".join(f"{name}: {expected:.2f} -> {actual:.2f} ops/s"
+                                    for name, expected, actual in regressions)
+                raise CommandError(f"Регресія продуктивності (поріг {options['threshold']:.0%}): {details}")
+            self.stdout.write(self.style.SUCCESS("Регресій відносно базового рівня немає"))
@@ -0,0 +1,42 @@
+from contextlib import nullcontext
+
+from django.core.management.base import BaseCommand, CommandError
+
+from credit_system import fuzz
+from credit_system.scratch_db import scratch_database
+
+
+class Command(BaseCommand):
+    help = ("Диференційне fuzz-тестування: випадкові кредити і платежі рахуються еталонним кодом "
+            "і швидкими движками, результати порівнюються до копійки.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--seed', type=int, default=0, help="Seed генератора (для відтворення розбіжності)")
+        parser.add_argument('--credits', type=int, default=500, help="Кількість випадкових кредитів")
+        parser.add_argument('--engine', action='append', choices=fuzz.PLAN_PAY_ENGINES + fuzz.PAYMENT_ENGINES,
+                            help="Перевіряти лише цей движок (можна вказати кілька разів)")
+
+    def handle(self, *args, **options):
+        if options['credits'] < 1:
+            raise CommandError("--credits має бути не менше 1")
+
+        engines = tuple(options['engine'] or fuzz.PLAN_PAY_ENGINES + fuzz.PAYMENT_ENGINES)
+        # Перевірка платежів пише в БД — у тимчасовій базі, а не в робочій
+        database = scratch_database() if set(engines) & set(fuzz.PAYMENT_ENGINES) else nullcontext()
+        with database:
+            results = fuzz.run_fuzz(options['seed'], options['credits'], engines)
+
+        failed = []
+        for engine, result in results.items():
+            self.stdout.write(
+                f"{engine:<24} випадків {result['cases']:>6}  рядків {result['rows']:>8}  "
+                f"еталон {result['reference_per_sec']:>10.2f}/s  швидкий {result['fast_per_sec']:>10.2f}/s  "
+                f"розбіжностей {result['divergences']}"
+            )
+            if result['first_divergence']:
+                failed.append(engine)
+                self.stdout.write(f"  перша розбіжність: {result['first_divergence']}")
+
+        if failed:
+            raise CommandError(f"Швидкі движки розходяться з еталоном (seed {options['seed']}): {', '.join(failed)}")
+        self.stdout.write(self.style.SUCCESS(f"Розбіжностей немає (seed {options['seed']})"))
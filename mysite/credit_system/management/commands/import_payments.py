@@ -0,0 +1,30 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from credit_system.payment_import import import_payments, CHUNK_SIZE
+
+
+class Command(BaseCommand):
+    help = ("Імпорт платежів з банківської виписки (CSV з колонками credit_number або credit_id, "
+            "date_pay, pay). Помилкові рядки виводяться у звіті і не зупиняють імпорт.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('csv_path', help="Шлях до CSV-файлу виписки")
+        parser.add_argument('--chunk-size', type=int, default=CHUNK_SIZE,
+                            help="Скільки кредитів записувати в одній транзакції")
+
+    def handle(self, *args, **options):
+        if options['chunk_size'] < 1:
+            raise CommandError("--chunk-size має бути не менше 1")
+
+        try:
+            with open(options['csv_path'], encoding='utf-8-sig', newline='') as f:
+                report = import_payments(f, options['chunk_size'])
+        except OSError as e:
+            raise CommandError(f"Не вдалося прочитати файл: {e}")
+
+        for line, message in report.sorted_errors:
+            self.stderr.write(f"Рядок {line}: {message}")
+
+        summary = (f"Рядків: {report.rows}, проведено платежів: {report.imported}, "
+                   f"оновлено кредитів: {report.credits}, помилок: {len(report.errors)}")
+        self.stdout.write(self.style.SUCCESS(summary) if not report.errors else summary)
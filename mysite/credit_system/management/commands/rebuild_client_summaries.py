@@ -0,0 +1,27 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from credit_system.client_summary import rebuild_client_summaries, CHUNK_SIZE
+
+
+class Command(BaseCommand):
+    help = ("Перерахунок підсумків кредитних портфелів клієнтів (кількість кредитів, відкритих кредитів, "
+            "загальний залишок) з таблиці кредитів.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('user_ids', nargs='*', type=int, help="id клієнтів (за замовчуванням — усі)")
+        parser.add_argument('--chunk-size', type=int, default=CHUNK_SIZE, help="Клієнтів у пачці")
+
+    def handle(self, *args, **options):
+        if options['chunk_size'] < 1:
+            raise CommandError("--chunk-size має бути не менше 1")
+
+        started = time.perf_counter()
+        users = rebuild_client_summaries(
+            options['user_ids'] or None, options['chunk_size'],
+            progress=lambda done: self.stdout.write(f"Оброблено клієнтів: {done}"),
+        )
+        self.stdout.write(self.style.SUCCESS(
+            f"Підсумки перераховано: клієнтів {users}, {time.perf_counter() - started:.1f} с"
+        ))
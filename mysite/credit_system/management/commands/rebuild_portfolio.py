@@ -0,0 +1,17 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from credit_system.portfolio import rebuild_portfolio
+
+
+class Command(BaseCommand):
+    help = ("Перерахунок підсумку кредитного портфеля і руху по днях (панель менеджера) "
+            "з таблиць кредитів і платежів.")
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        days = rebuild_portfolio()
+        self.stdout.write(self.style.SUCCESS(
+            f"Підсумок портфеля перераховано: днів {days}, {time.perf_counter() - started:.1f} с"
+        ))
@@ -0,0 +1,39 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from credit_system.models import Credit
+from credit_system.replay import replay_credits, default_workers, CHUNK_SIZE
+
+
+class Command(BaseCommand):
+    help = ("Перерахунок стану кредитів (залишок, борг по %, закриття, дата останнього платежу) "
+            "та похідних колонок платежів за історією платежів.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('credit_ids', nargs='*', type=int, help="id кредитів")
+        parser.add_argument('--all', action='store_true', help="Перерахувати всі кредити")
+        parser.add_argument('--workers', type=int, default=default_workers(),
+                            help="Кількість процесів для розрахунку (1 — без паралельності)")
+        parser.add_argument('--chunk-size', type=int, default=CHUNK_SIZE,
+                            help="Скільки кредитів обробляти в одній транзакції")
+        parser.add_argument('--dry-run', action='store_true', help="Лише порахувати зміни, нічого не записувати")
+
+    def handle(self, *args, **options):
+        if options['all'] == bool(options['credit_ids']):
+            raise CommandError("Вкажіть id кредитів або --all")
+        if options['workers'] < 1 or options['chunk_size'] < 1:
+            raise CommandError("--workers і --chunk-size мають бути не менше 1")
+
+        credit_ids = options['credit_ids']
+        if options['all']:
+            credit_ids = list(Credit.objects.values_list('pk', flat=True))
+        else:
+            missing = set(credit_ids) - set(Credit.objects.filter(pk__in=credit_ids).values_list('pk', flat=True))
+            if missing:
+                raise CommandError(f"Кредити не знайдено: {', '.join(map(str, sorted(missing)))}")
+
+        stats = replay_credits(credit_ids, options['workers'], options['chunk_size'], options['dry_run'])
+        prefix = "Без запису: " if options['dry_run'] else ""
+        self.stdout.write(self.style.SUCCESS(
+            f"{prefix}кредитів: {stats['credits']}, змінено кредитів: {stats['changed_credits']}, "
+            f"змінено платежів: {stats['changed_payments']}"
+        ))
@@ -0,0 +1,38 @@
+# Generated by Django 5.2.18 on 2026-10-18 10:58
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('credit_system', '0016_alter_credit_number1_alter_credit_number2_and_more'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PlannedInstallment',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('number', models.PositiveIntegerField(verbose_name='Номер платежу')),
+                ('date_pay', models.DateField(verbose_name='Дата платежу')),
+                ('delta_days', models.IntegerField(verbose_name='Днів у періоді')),
+                ('payment', models.DecimalField(decimal_places=2, max_digits=10, verbose_name='Сума платежу')),
+                ('summa_percent', models.DecimalField(decimal_places=2, max_digits=10, verbose_name='Нараховано %')),
+                ('pog_dolg_by_percents', models.DecimalField(decimal_places=2, max_digits=10, verbose_name='Погашено боргу по %')),
+                ('pog_summa_percent', models.DecimalField(decimal_places=2, max_digits=10, verbose_name='Погашено %')),
+                ('dolg_percent', models.DecimalField(decimal_places=2, max_digits=10, verbose_name='Борг по оплаті %')),
+                ('pog_credit', models.DecimalField(decimal_places=2, max_digits=10, verbose_name='Погашено кредиту')),
+                ('ostatok', models.DecimalField(decimal_places=2, max_digits=10, verbose_name='Залишок кредиту')),
+                ('total_dolg', models.DecimalField(decimal_places=2, max_digits=10, verbose_name='Загальна заборгованість')),
+                ('credit', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='planned_installments', to='credit_system.credit', verbose_name='Кредит')),
+            ],
+            options={
+                'verbose_name': 'Плановий платіж',
+                'verbose_name_plural': 'Графік платежів',
+                'indexes': [models.Index(fields=['credit', 'date_pay'], name='credit_syst_credit__33cc5a_idx')],
+                'unique_together': {('credit', 'number')},
+            },
+        ),
+    ]
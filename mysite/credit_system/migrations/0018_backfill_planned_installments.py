@@ -0,0 +1,188 @@
+# Заповнення планового графіка для вже створених кредитів
+
+import calendar
+from datetime import date
+
+from django.db import migrations, transaction
+
+BATCH_SIZE = 500
+
+# Нижче — знімок логіки credit_system.plan_pay на момент цієї міграції.
+# Міграція не імпортує живий модуль, щоб його подальші зміни не змінювали історичний backfill.
+
+
+def to_cents(x):
+    return int(round(x * 100))
+
+
+def from_cents(x):
+    return x / 100.0
+
+
+def payment_calendar(start_date, months, pay_day):
+    """Список (дата платежу, днів у періоді) — наступний місяць, день обрізається до кінця місяця."""
+    rows = []
+    current_date = start_date
+    for _ in range(months):
+        year, month = current_date.year, current_date.month + 1
+        if month > 12:
+            year, month = year + 1, 1
+        date_pay = date(year, month, min(pay_day, calendar.monthrange(year, month)[1]))
+        rows.append((date_pay, (date_pay - current_date).days))
+        current_date = date_pay
+    return rows
+
+
+def iter_grafik_cents(credit_sum, daily_percent, pay_calendar, pay):
+    """Рядки графіка в копійках: (дата, дні, платіж, нараховано %, погашено боргу по %, погашено %,
+    борг по %, погашено тіла, залишок, загальна заборгованість)."""
+    ostatok = to_cents(credit_sum)
+    dolg_by_percents = 0
+
+    for date_pay, days in pay_calendar:
+        percents = to_cents(from_cents(ostatok) * daily_percent * days)
+        ost_payment = pay
+
+        # 1. Погашення боргу по %
+        if ost_payment >= dolg_by_percents:
+            pog_dolg_by_percents = dolg_by_percents
+            ost_payment -= dolg_by_percents
+            dolg_by_percents = 0
+        else:
+            pog_dolg_by_percents = ost_payment
+            dolg_by_percents -= ost_payment
+            ost_payment = 0
+
+        # 2. Поточні %
+        if ost_payment >= percents:
+            pog_percents = percents
+            ost_payment -= percents
+        else:
+            pog_percents = ost_payment
+            dolg_by_percents += (percents - ost_payment)
+            ost_payment = 0
+
+        # 3. Тіло
+        pog_ostatok = ost_payment
+        ostatok -= pog_ostatok
+        current_pay = pay
+        if ostatok < 0:
+            current_pay = pay + ostatok
+            ostatok = 0
+
+        yield (date_pay, days, current_pay, percents, pog_dolg_by_percents, pog_percents,
+               dolg_by_percents, pog_ostatok, ostatok, ostatok + dolg_by_percents)
+
+
+def final_balance(credit_sum, daily_percent, pay_calendar, pay):
+    """Фінальний залишок (тіло + борг по відсотках) у копійках; переплата дає від'ємний залишок."""
+    ostatok = to_cents(credit_sum)
+    dolg_by_percents = 0
+
+    for _, days in pay_calendar:
+        percents = to_cents(from_cents(ostatok) * daily_percent * days)
+        ost_payment = pay
+
+        # 1. Погашення боргу по %
+        if ost_payment >= dolg_by_percents:
+            ost_payment -= dolg_by_percents
+            dolg_by_percents = 0
+        else:
+            dolg_by_percents -= ost_payment
+            ost_payment = 0
+
+        # 2. Погашення поточних %
+        if ost_payment >= percents:
+            ost_payment -= percents
+        else:
+            dolg_by_percents += (percents - ost_payment)
+            ost_payment = 0
+
+        # 3. Погашення тіла
+        ostatok -= ost_payment
+
+    return ostatok + dolg_by_percents
+
+
+def pidbir_plan_pay(credit_sum, daily_percent, pay_calendar, tol=1, max_iter=200):
+    """Плановий платіж у копійках — поділом навпіл, як еталонний підбір plan_pay."""
+    low, high = 0, to_cents(credit_sum) * 2
+    pay = (low + high) // 2
+
+    for _ in range(max_iter):
+        final_ostatok = final_balance(credit_sum, daily_percent, pay_calendar, pay)
+        if -tol <= final_ostatok <= tol:
+            break
+        if final_ostatok > 0:
+            low = pay
+        else:
+            high = pay
+        pay = (low + high) // 2
+
+    # Гарантуємо, що борг погашений (залишок ≤ 0)
+    if final_balance(credit_sum, daily_percent, pay_calendar, pay) > 0:
+        pay += 1
+    return pay
+
+
+def backfill_planned_installments(apps, schema_editor):
+    Credit = apps.get_model('credit_system', 'Credit')
+    PlannedInstallment = apps.get_model('credit_system', 'PlannedInstallment')
+
+    # Кредити обробляються пачками по BATCH_SIZE, кожна пачка — окрема транзакція,
+    # тож на великій таблиці перерваний backfill можна просто запустити знову
+    last_pk = 0
+    while True:
+        credits = list(
+            Credit.objects.filter(pk__gt=last_pk, planned_installments__isnull=True)
+            .order_by('pk')[:BATCH_SIZE]
+        )
+        if not credits:
+            break
+
+        installments = []
+        for credit in credits:
+            daily_percent = credit.percent / 100
+            pay_calendar = payment_calendar(credit.start_date, credit.srok_months, credit.day_of_pay)
+            if credit.plan_pay:
+                # Графік будуємо для збереженого планового платежу
+                pay = to_cents(credit.plan_pay)
+            else:
+                pay = pidbir_plan_pay(credit.summa_credit, daily_percent, pay_calendar)
+
+            rows = iter_grafik_cents(credit.summa_credit, daily_percent, pay_calendar, pay)
+            for number, (date_pay, delta_days, *money) in enumerate(rows, start=1):
+                (payment, summa_percent, pog_dolg_by_percents, pog_summa_percent,
+                 dolg_percent, pog_credit, ostatok, total_dolg) = map(from_cents, money)
+                installments.append(PlannedInstallment(
+                    credit_id=credit.pk,
+                    number=number,
+                    date_pay=date_pay,
+                    delta_days=delta_days,
+                    payment=payment,
+                    summa_percent=summa_percent,
+                    pog_dolg_by_percents=pog_dolg_by_percents,
+                    pog_summa_percent=pog_summa_percent,
+                    dolg_percent=dolg_percent,
+                    pog_credit=pog_credit,
+                    ostatok=ostatok,
+                    total_dolg=total_dolg,
+                ))
+
+        with transaction.atomic():
+            PlannedInstallment.objects.bulk_create(installments, batch_size=BATCH_SIZE)
+
+        last_pk = credits[-1].pk
+
+
+class Migration(migrations.Migration):
+    # Кожна пачка комітиться окремо (див. backfill_planned_installments)
+    atomic = False
+
+    dependencies = [
+        ('credit_system', '0017_plannedinstallment'),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill_planned_installments, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,48 @@
+# Generated by Django 5.2.18 on 2026-10-18 11:15
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('credit_system', '0018_backfill_planned_installments'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AccrualRun',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('accrual_date', models.DateField(unique=True, verbose_name='Дата нарахування')),
+                ('last_credit_id', models.IntegerField(default=0, verbose_name='Останній оброблений кредит')),
+                ('credits', models.IntegerField(default=0, verbose_name='Оброблено кредитів')),
+                ('started_at', models.DateTimeField(auto_now_add=True, verbose_name='Початок')),
+                ('finished_at', models.DateTimeField(blank=True, null=True, verbose_name='Завершено')),
+            ],
+            options={
+                'verbose_name': 'Запуск нарахування',
+                'verbose_name_plural': 'Запуски нарахування',
+            },
+        ),
+        migrations.CreateModel(
+            name='InterestAccrual',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('accrual_date', models.DateField(verbose_name='Дата нарахування')),
+                ('days', models.IntegerField(verbose_name='Днів з останнього платежу')),
+                ('ostatok', models.DecimalField(decimal_places=2, max_digits=10, verbose_name='Залишок кредиту')),
+                ('summa_percent', models.DecimalField(decimal_places=2, max_digits=10, verbose_name='Нараховано %')),
+                ('dolg_percent', models.DecimalField(decimal_places=2, max_digits=10, verbose_name='Борг по оплаті %')),
+                ('total_dolg', models.DecimalField(decimal_places=2, max_digits=12, verbose_name='Загальна заборгованість')),
+                ('credit', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='accruals', to='credit_system.credit', verbose_name='Кредит')),
+            ],
+            options={
+                'verbose_name': 'Нарахування відсотків',
+                'verbose_name_plural': 'Нарахування відсотків',
+                'indexes': [models.Index(fields=['accrual_date'], name='credit_syst_accrual_9d331f_idx')],
+                'unique_together': {('credit', 'accrual_date')},
+            },
+        ),
+    ]
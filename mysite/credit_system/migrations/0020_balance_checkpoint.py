@@ -0,0 +1,31 @@
+# Generated by Django 5.2.18 on 2026-10-18 11:18
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('credit_system', '0019_interest_accrual'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='BalanceCheckpoint',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('checkpoint_date', models.DateField(verbose_name='Дата (кінець місяця)')),
+                ('ostatok', models.DecimalField(decimal_places=2, max_digits=10, verbose_name='Залишок кредиту')),
+                ('dolg_percent', models.DecimalField(decimal_places=2, max_digits=10, verbose_name='Борг по оплаті %')),
+                ('last_pay_date', models.DateField(verbose_name='Дата останнього платежу')),
+                ('closed', models.BooleanField(default=False, verbose_name='Кредит закрит')),
+                ('credit', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='checkpoints', to='credit_system.credit', verbose_name='Кредит')),
+            ],
+            options={
+                'verbose_name': 'Контрольна точка балансу',
+                'verbose_name_plural': 'Контрольні точки балансу',
+                'unique_together': {('credit', 'checkpoint_date')},
+            },
+        ),
+    ]
@@ -0,0 +1,50 @@
+# Лічильники номерів кредитів по роках і постфіксах замість пошуку максимального number1
+
+from django.db import migrations, models
+from django.db.models import Max
+
+
+def seed_sequences(apps, schema_editor):
+    Credit = apps.get_model('credit_system', 'Credit')
+    CreditNumberSequence = apps.get_model('credit_system', 'CreditNumberSequence')
+
+    last_numbers = {}
+    rows = (Credit.objects.filter(number1__isnull=False, number2__isnull=False)
+            .values('number2', 'number3').annotate(last_number=Max('number1')))
+    for row in rows:
+        key = (row['number2'], row['number3'] or 'Credit')
+        last_numbers[key] = max(last_numbers.get(key, 0), row['last_number'])
+
+    CreditNumberSequence.objects.bulk_create([
+        CreditNumberSequence(year=year, number3=number3, last_number=last_number)
+        for (year, number3), last_number in last_numbers.items()
+    ])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('credit_system', '0020_balance_checkpoint'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CreditNumberSequence',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('year', models.IntegerField(verbose_name='Рік видачі')),
+                ('number3', models.CharField(max_length=20, verbose_name='Постфікс/Підрозділ')),
+                ('last_number', models.IntegerField(default=0, verbose_name='Останній виданий номер')),
+            ],
+            options={
+                'verbose_name': 'Лічильник номерів кредитів',
+                'verbose_name_plural': 'Лічильники номерів кредитів',
+                'unique_together': {('year', 'number3')},
+            },
+        ),
+        migrations.AlterUniqueTogether(
+            name='credit',
+            unique_together={('number1', 'number2', 'number3')},
+        ),
+        migrations.RunPython(seed_sequences, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,109 @@
+# Рядок пошуку клієнтів і індекс над ним (FTS5 на SQLite, pg_trgm на PostgreSQL)
+
+import re
+
+from django.db import migrations, models
+
+BATCH_SIZE = 1000
+
+# Нижче — знімок логіки credit_system.client_search на момент цієї міграції.
+# Міграція не імпортує живий модуль, щоб його подальші зміни не змінювали історичні кроки.
+FTS_TABLE = 'credit_system_client_fts'
+USER_TABLE = 'credit_system_customuser'
+TRGM_INDEX = 'credit_system_customuser_search_trgm'
+APOSTROPHES_RE = re.compile(r"[’ʼ`´‘]")
+
+SQLITE_TRIGGERS = {
+    f'{FTS_TABLE}_ai': f"""
+        CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_ai AFTER INSERT ON {USER_TABLE} BEGIN
+            INSERT INTO {FTS_TABLE}(rowid, search_text) VALUES (new.id, new.search_text);
+        END""",
+    f'{FTS_TABLE}_ad': f"""
+        CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_ad AFTER DELETE ON {USER_TABLE} BEGIN
+            INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, search_text) VALUES ('delete', old.id, old.search_text);
+        END""",
+    f'{FTS_TABLE}_au': f"""
+        CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_au AFTER UPDATE OF search_text ON {USER_TABLE} BEGIN
+            INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, search_text) VALUES ('delete', old.id, old.search_text);
+            INSERT INTO {FTS_TABLE}(rowid, search_text) VALUES (new.id, new.search_text);
+        END""",
+}
+
+
+def normalize(text):
+    """Нижній регістр, один вид апострофа, одинарні пробіли."""
+    return ' '.join(APOSTROPHES_RE.sub("'", text or '').casefold().split())
+
+
+def build_search_text(user):
+    phone = user.phone_number or ''
+    parts = [
+        user.last_name, user.first_name, user.middle_name, user.IPN, phone, re.sub(r'\D', '', phone),
+        user.address, user.address_registration, user.address_residential,
+        f'{user.passport_series or ""}{user.passport_number or ""}', user.passport_number,
+    ]
+    return normalize(' '.join(part for part in parts if part))
+
+
+def backfill_search_text(apps, schema_editor):
+    CustomUser = apps.get_model('credit_system', 'CustomUser')
+    users = []
+    for user in CustomUser.objects.order_by('pk').iterator(chunk_size=BATCH_SIZE):
+        user.search_text = build_search_text(user)
+        users.append(user)
+        if len(users) == BATCH_SIZE:
+            CustomUser.objects.bulk_update(users, ['search_text'])
+            users = []
+    CustomUser.objects.bulk_update(users, ['search_text'])
+
+
+def create_search_index(apps, schema_editor):
+    connection = schema_editor.connection
+    with connection.cursor() as cursor:
+        if connection.vendor == 'sqlite':
+            cursor.execute(
+                f"CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} USING fts5("
+                f"search_text, content='{USER_TABLE}', content_rowid='id', tokenize='trigram')"
+            )
+            for sql in SQLITE_TRIGGERS.values():
+                cursor.execute(sql)
+            cursor.execute(f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('rebuild')")
+
+        elif connection.vendor == 'postgresql':
+            cursor.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+            cursor.execute(
+                f"CREATE INDEX IF NOT EXISTS {TRGM_INDEX} ON {USER_TABLE} USING gin (search_text gin_trgm_ops)"
+            )
+
+
+def remove_search_index(apps, schema_editor):
+    connection = schema_editor.connection
+    with connection.cursor() as cursor:
+        if connection.vendor == 'sqlite':
+            for trigger in SQLITE_TRIGGERS:
+                cursor.execute(f"DROP TRIGGER IF EXISTS {trigger}")
+            cursor.execute(f"DROP TABLE IF EXISTS {FTS_TABLE}")
+        elif connection.vendor == 'postgresql':
+            cursor.execute(f"DROP INDEX IF EXISTS {TRGM_INDEX}")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('auth', '0012_alter_user_first_name_max_length'),
+        ('credit_system', '0021_credit_number_sequence'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='customuser',
+            name='search_text',
+            field=models.TextField(blank=True, default='', editable=False, verbose_name='Рядок пошуку'),
+        ),
+        migrations.AddIndex(
+            model_name='customuser',
+            index=models.Index(fields=['passport_number', 'passport_series'], name='credit_syst_passpor_ac42b5_idx'),
+        ),
+        migrations.RunPython(backfill_search_text, migrations.RunPython.noop),
+        migrations.RunPython(create_search_index, remove_search_index),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 5.2.18 on 2026-10-18 11:29
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('credit_system', '0023_keyset_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='credit',
+            name='cache_version',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='Версія кешу'),
+        ),
+        migrations.AddField(
+            model_name='customuser',
+            name='cache_version',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='Версія кешу'),
+        ),
+    ]
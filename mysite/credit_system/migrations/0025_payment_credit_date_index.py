@@ -0,0 +1,17 @@
+# Generated by Django 5.2.18 on 2026-10-18 11:33
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('credit_system', '0024_cache_version'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='payment',
+            index=models.Index(fields=['credit', 'date_pay', 'id'], name='payment_credit_date_idx'),
+        ),
+    ]
@@ -0,0 +1,51 @@
+# Підсумок кредитного портфеля клієнта і його заповнення для наявних клієнтів
+
+from decimal import Decimal
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+def backfill_client_summaries(apps, schema_editor):
+    # Те саме, що manage.py rebuild_client_summaries, на історичних моделях
+    CustomUser = apps.get_model('credit_system', 'CustomUser')
+    Credit = apps.get_model('credit_system', 'Credit')
+    ClientSummary = apps.get_model('credit_system', 'ClientSummary')
+
+    totals = {user_id: [0, 0, Decimal(0)] for user_id in CustomUser.objects.values_list('pk', flat=True)}
+    for user_id, closed, ostatok in Credit.objects.values_list('user_id', 'closed', 'ostatok').iterator():
+        summary = totals[user_id]
+        summary[0] += 1
+        summary[1] += not closed
+        summary[2] += Decimal(str(round(ostatok or 0, 2)))
+
+    ClientSummary.objects.bulk_create([
+        ClientSummary(user_id=user_id, credits=credits, open_credits=open_credits, total_ostatok=ostatok)
+        for user_id, (credits, open_credits, ostatok) in totals.items()
+    ], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('credit_system', '0025_payment_credit_date_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ClientSummary',
+            fields=[
+                ('user', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='summary', serialize=False, to=settings.AUTH_USER_MODEL, verbose_name='Клієнт')),
+                ('credits', models.IntegerField(default=0, verbose_name='Кредитів')),
+                ('open_credits', models.IntegerField(default=0, verbose_name='Відкритих кредитів')),
+                ('total_ostatok', models.DecimalField(decimal_places=2, default=0, max_digits=14, verbose_name='Загальний залишок')),
+            ],
+            options={
+                'verbose_name': 'Портфель клієнта',
+                'verbose_name_plural': 'Портфелі клієнтів',
+                'indexes': [models.Index(fields=['-total_ostatok', 'user'], name='client_summary_exposure_idx')],
+            },
+        ),
+        migrations.RunPython(backfill_client_summaries, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,81 @@
+# Підсумок кредитного портфеля і рух по днях для панелі менеджера, заповнення з наявних даних
+
+from collections import defaultdict
+from decimal import Decimal
+
+from django.db import migrations, models
+from django.db.models import Count, Q, Sum
+
+
+def to_decimal(value):
+    return Decimal(str(round(value or 0, 2)))
+
+
+def backfill_portfolio(apps, schema_editor):
+    # Те саме, що manage.py rebuild_portfolio, на історичних моделях
+    Credit = apps.get_model('credit_system', 'Credit')
+    Payment = apps.get_model('credit_system', 'Payment')
+    PortfolioTotals = apps.get_model('credit_system', 'PortfolioTotals')
+    PortfolioDay = apps.get_model('credit_system', 'PortfolioDay')
+
+    days = defaultdict(lambda: [0, Decimal(0), 0, 0])
+    for day, count, total in Payment.objects.values_list('date_pay').annotate(Count('id'), Sum('pay')).order_by():
+        days[day][0:2] = [count, to_decimal(total)]
+    for day, count in Credit.objects.values_list('start_date').annotate(Count('id')).order_by():
+        days[day][2] = count
+    closed = Credit.objects.filter(closed=True, last_pay_date__isnull=False)
+    for day, count in closed.values_list('last_pay_date').annotate(Count('id')).order_by():
+        days[day][3] = count
+
+    totals = Credit.objects.aggregate(
+        credits=Count('id'), open_credits=Count('id', filter=Q(closed=False)),
+        total_ostatok=Sum('ostatok'), total_dolg_percent=Sum('dolg_percent'),
+    )
+    PortfolioTotals.objects.create(
+        pk=1, credits=totals['credits'], open_credits=totals['open_credits'],
+        total_ostatok=to_decimal(totals['total_ostatok']), total_dolg_percent=to_decimal(totals['total_dolg_percent']),
+    )
+    PortfolioDay.objects.bulk_create([
+        PortfolioDay(day=day, payments=payments, payments_sum=payments_sum, credits_issued=issued,
+                     credits_closed=closed_count)
+        for day, (payments, payments_sum, issued, closed_count) in days.items()
+    ], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('credit_system', '0026_client_summary'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PortfolioDay',
+            fields=[
+                ('day', models.DateField(primary_key=True, serialize=False, verbose_name='День')),
+                ('payments', models.IntegerField(default=0, verbose_name='Платежів')),
+                ('payments_sum', models.DecimalField(decimal_places=2, default=0, max_digits=16, verbose_name='Сума платежів')),
+                ('credits_issued', models.IntegerField(default=0, verbose_name='Видано кредитів')),
+                ('credits_closed', models.IntegerField(default=0, verbose_name='Закрито кредитів')),
+            ],
+            options={
+                'verbose_name': 'Рух портфеля за день',
+                'verbose_name_plural': 'Рух портфеля по днях',
+            },
+        ),
+        migrations.CreateModel(
+            name='PortfolioTotals',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('credits', models.IntegerField(default=0, verbose_name='Кредитів')),
+                ('open_credits', models.IntegerField(default=0, verbose_name='Відкритих кредитів')),
+                ('total_ostatok', models.DecimalField(decimal_places=2, default=0, max_digits=16, verbose_name='Залишок кредитів')),
+                ('total_dolg_percent', models.DecimalField(decimal_places=2, default=0, max_digits=16, verbose_name='Борг по оплаті %')),
+            ],
+            options={
+                'verbose_name': 'Підсумок портфеля',
+                'verbose_name_plural': 'Підсумок портфеля',
+            },
+        ),
+        migrations.RunPython(backfill_portfolio, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,65 @@
+# Рух портфеля по днях розкладено на рядки-шарди (складений ключ день + шард).
+# Зміну первинного ключа на складений міграції не підтримують, тож таблиця днів перестворюється і
+# заповнюється з кредитів і платежів у шард 0.
+
+from collections import defaultdict
+from decimal import Decimal
+
+from django.db import migrations, models
+from django.db.models import Count, Sum
+
+
+def to_decimal(value):
+    return Decimal(str(round(value or 0, 2)))
+
+
+def backfill_portfolio_days(apps, schema_editor):
+    # Те саме, що manage.py rebuild_portfolio для днів, на історичних моделях
+    Credit = apps.get_model('credit_system', 'Credit')
+    Payment = apps.get_model('credit_system', 'Payment')
+    PortfolioDay = apps.get_model('credit_system', 'PortfolioDay')
+
+    days = defaultdict(lambda: [0, Decimal(0), 0, 0])
+    for day, count, total in Payment.objects.values_list('date_pay').annotate(Count('id'), Sum('pay')).order_by():
+        days[day][0:2] = [count, to_decimal(total)]
+    for day, count in Credit.objects.values_list('start_date').annotate(Count('id')).order_by():
+        days[day][2] = count
+    closed = Credit.objects.filter(closed=True, last_pay_date__isnull=False)
+    for day, count in closed.values_list('last_pay_date').annotate(Count('id')).order_by():
+        days[day][3] = count
+
+    PortfolioDay.objects.bulk_create([
+        PortfolioDay(day=day, shard=0, payments=payments, payments_sum=payments_sum, credits_issued=issued,
+                     credits_closed=closed_count)
+        for day, (payments, payments_sum, issued, closed_count) in days.items()
+    ], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('credit_system', '0027_portfolio'),
+    ]
+
+    operations = [
+        migrations.DeleteModel(
+            name='PortfolioDay',
+        ),
+        migrations.CreateModel(
+            name='PortfolioDay',
+            fields=[
+                ('pk', models.CompositePrimaryKey('day', 'shard', blank=True, editable=False, primary_key=True, serialize=False)),
+                ('day', models.DateField(verbose_name='День')),
+                ('shard', models.PositiveSmallIntegerField(default=0, verbose_name='Шард')),
+                ('payments', models.IntegerField(default=0, verbose_name='Платежів')),
+                ('payments_sum', models.DecimalField(decimal_places=2, default=0, max_digits=16, verbose_name='Сума платежів')),
+                ('credits_issued', models.IntegerField(default=0, verbose_name='Видано кредитів')),
+                ('credits_closed', models.IntegerField(default=0, verbose_name='Закрито кредитів')),
+            ],
+            options={
+                'verbose_name': 'Рух портфеля за день',
+                'verbose_name_plural': 'Рух портфеля по днях',
+            },
+        ),
+        migrations.RunPython(backfill_portfolio_days, migrations.RunPython.noop),
+    ]
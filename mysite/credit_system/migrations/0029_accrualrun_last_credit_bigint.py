@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-18 12:52
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('credit_system', '0028_portfolio_shards'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='accrualrun',
+            name='last_credit_id',
+            field=models.BigIntegerField(default=0, verbose_name='Останній оброблений кредит'),
+        ),
+    ]
@@ -1,9 +1,10 @@
 from django.contrib.auth.models import AbstractUser
-from django.db import models
+from django.db import models, transaction
 from django.core.validators import RegexValidator
 from datetime import date
 
-from django.db.models import Max
+from credit_system.client_search import build_search_text
+
 
 # Валідатор для ІПН — лише 10 цифр (ChatGPT)
 numeric_validator = RegexValidator(
@@ -66,6 +67,16 @@ class CustomUser(AbstractUser):
     work_place = models.CharField(max_length=100, verbose_name="Місце роботи", blank=True)
     position = models.CharField(max_length=100, verbose_name="Посада", blank=True)
     notes = models.CharField(max_length=255, verbose_name="Нотатки", blank=True)
+    # Нормалізований рядок для пошуку (див. client_search), заповнюється при збереженні
+    search_text = models.TextField(verbose_name="Рядок пошуку", blank=True, default='', editable=False)
+    # Версія для кешу сторінки клієнта (див. page_cache)
+    cache_version = models.PositiveIntegerField(default=0, editable=False, verbose_name="Версія кешу")
+
+    # Поля, з яких складається search_text
+    SEARCH_FIELDS = {
+        'last_name', 'first_name', 'middle_name', 'IPN', 'phone_number', 'address',
+        'address_registration', 'address_residential', 'passport_series', 'passport_number',
+    }
 
     def __str__(self):
         full_name = f"{self.last_name} {self.first_name} {self.middle_name}".strip()
@@ -81,10 +92,34 @@ class CustomUser(AbstractUser):
     def is_client(self):
         return self.role == 'client'
 
+    def save(self, *args, **kwargs):
+        self.search_text = build_search_text(self)
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and self.SEARCH_FIELDS.intersection(update_fields):
+            kwargs['update_fields'] = {*update_fields, 'search_text'}
+        # Повне збереження не повинно записати застарілу версію кешу поверх новішої
+        bump_version = not self._state.adding and update_fields is None
+        if bump_version:
+            self.cache_version = models.F('cache_version') + 1
+        super().save(*args, **kwargs)
+        if bump_version:
+            # Нове значення перечитається з БД при першому зверненні
+            del self.cache_version
+
     # Ці змінні працюють в адмін-панелі на сторінці Користувачі:
     class Meta:
         verbose_name = "Користувач"
         verbose_name_plural = "Користувачі"
+        # ІПН уже унікальний (індекс є); номер паспорта — для точного пошуку;
+        # (role, -date_joined, id) — порядок списку клієнтів для keyset-пагінації
+        indexes = [
+            models.Index(fields=['passport_number', 'passport_series']),
+            models.Index(fields=['role', '-date_joined', 'id'], name='customuser_role_joined_idx'),
+        ]
+
+
+# Постфікс номера кредиту за замовчуванням
+DEFAULT_NUMBER3 = "Credit"
 
 
 class Credit(models.Model):
@@ -105,6 +140,8 @@ class Credit(models.Model):
     last_pay_date = models.DateField(null=True, blank=True, verbose_name="Дата останнього платежу")
     dolg_percent = models.FloatField(default=0, verbose_name="Борг по оплаті %")
     plan_pay = models.FloatField(verbose_name="Плановий платіж", blank=True)
+    # Версія для кешу сторінок кредиту і клієнта (див. page_cache)
+    cache_version = models.PositiveIntegerField(default=0, editable=False, verbose_name="Версія кешу")
 
     def full_number(self):
         # Логіка формування повного номера, використовуючи поточні значення
@@ -119,46 +156,160 @@ class Credit(models.Model):
         # Виводимо повний номер, що зберігається в полі number
         return f"Кредит №{self.number or self.full_number()}"
 
-    def generate_new_number1(self):
-        # Використовуємо self.start_date, оскільки рік залежить від дати видачі
-        current_year = self.start_date.year
+    def fill_number(self, number1=None):
+        """Заповнює рік, постфікс і повний номер; number1 — вже зарезервований порядковий номер."""
+        # 1.1. Встановлюємо рік (number2)
+        if self.number2 is None:
+            # ВАЖЛИВО: self.start_date має бути встановлено перед save(),
+            # якщо воно не валідується формою, то буде помилка.
+            self.number2 = self.start_date.year
 
-        max_number1 = Credit.objects.filter(number2=current_year).aggregate(Max('number1'))['number1__max']
+        # 1.2. Встановлюємо фіксований постфікс (number3) — лічильник ведеться окремо для кожного
+        if not self.number3:
+            self.number3 = DEFAULT_NUMBER3
 
-        return (max_number1 or 0) + 1
+        # 1.3. Встановлюємо порядковий номер (number1)
+        if self.number1 is None:
+            self.number1 = number1 if number1 is not None else CreditNumberSequence.reserve(self.number2, self.number3)
 
-    def save(self, *args, **kwargs):
-        # 1. Логіка автозаповнення номера (працює лише для нового об'єкта)
-        if not self.pk:
-            # 1.1. Встановлюємо рік (number2)
-            if self.number2 is None:
-                # ВАЖЛИВО: self.start_date має бути встановлено перед save(),
-                # якщо воно не валідується формою, то буде помилка.
-                self.number2 = self.start_date.year
-
-            # 1.2. Встановлюємо порядковий номер (number1)
-            if self.number1 is None:
-                self.number1 = self.generate_new_number1()
-
-            # 1.3. Встановлюємо фіксований постфікс (number3)
-            # Якщо ви хочете, щоб він був "Credit", можете встановити його тут
-            if not self.number3:
-                self.number3 = "Credit"
-
-            # 1.4. Заповнюємо фінальне поле number
-            if not self.number:
-                self.number = self.full_number()
-
-                # 2. Встановлення last_pay_date
+        # 1.4. Заповнюємо фінальне поле number
+        if not self.number:
+            self.number = self.full_number()
+
+        # 2. Встановлення last_pay_date
         if not self.last_pay_date and self.start_date:
             self.last_pay_date = self.start_date
 
-        super().save(*args, **kwargs)
+    # Стан, з яким кредит прочитано з БД, — від нього рахується приріст підсумків клієнта і портфеля
+    # (client_summary, portfolio)
+    _summary_state = None
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        from credit_system.client_summary import STATE_FIELDS, credit_state
+
+        if set(STATE_FIELDS).issubset(instance.__dict__):
+            instance._summary_state = credit_state(instance)
+        return instance
+
+    def save(self, *args, **kwargs):
+        from credit_system.client_summary import stored_credit_state, update_summaries
+
+        # Автозаповнення номера лише для нового об'єкта; номер резервується в тій самій транзакції,
+        # що й вставка, тож при помилці збереження лічильник відкочується
+        with transaction.atomic():
+            adding = not self.pk
+            if adding:
+                self.fill_number()
+            else:
+                if self._summary_state is None:
+                    # Кредит створено не з БД (відомий лише pk) — попередній внесок у підсумки читаємо з рядка
+                    self._summary_state = stored_credit_state(self.pk)
+                if not self.last_pay_date and self.start_date:
+                    self.last_pay_date = self.start_date
+                # Нова версія для кешу сторінки — тим самим UPDATE
+                self.cache_version = models.F('cache_version') + 1
+                if kwargs.get('update_fields') is not None:
+                    kwargs['update_fields'] = {*kwargs['update_fields'], 'cache_version'}
+
+            super().save(*args, **kwargs)
+
+            if not adding:
+                # Нове значення перечитається з БД при першому зверненні
+                del self.cache_version
+            # Сторінка клієнта показує таблицю його кредитів
+            CustomUser.objects.filter(pk=self.user_id).update(cache_version=models.F('cache_version') + 1)
+
+            update_summaries([self])
 
     class Meta:
         verbose_name = "Кредит"
         verbose_name_plural = "Кредити"
-        unique_together = ('number1', 'number2')
+        unique_together = ('number1', 'number2', 'number3')
+        # Порядок списків кредитів (усіх і клієнта) для keyset-пагінації
+        indexes = [
+            models.Index(fields=['closed', '-start_date', 'id'], name='credit_closed_start_idx'),
+            models.Index(fields=['user', 'closed', '-start_date', 'id'], name='credit_user_closed_start_idx'),
+        ]
+
+
+class ClientSummary(models.Model):
+    """Підсумок кредитного портфеля клієнта (денормалізовано, див. client_summary)"""
+    user = models.OneToOneField(CustomUser, on_delete=models.CASCADE, primary_key=True, related_name='summary',
+                                verbose_name="Клієнт")
+    credits = models.IntegerField(default=0, verbose_name="Кредитів")
+    open_credits = models.IntegerField(default=0, verbose_name="Відкритих кредитів")
+    total_ostatok = models.DecimalField(max_digits=14, decimal_places=2, default=0, verbose_name="Загальний залишок")
+
+    def __str__(self):
+        return f"Портфель клієнта {self.user_id}"
+
+    class Meta:
+        verbose_name = "Портфель клієнта"
+        verbose_name_plural = "Портфелі клієнтів"
+        # Список клієнтів за заборгованістю (keyset-пагінація)
+        indexes = [models.Index(fields=['-total_ostatok', 'user'], name='client_summary_exposure_idx')]
+
+
+class PortfolioTotals(models.Model):
+    """Підсумок кредитного портфеля для панелі менеджера (рядок-шард, pk — номер шарду; див. portfolio)"""
+    credits = models.IntegerField(default=0, verbose_name="Кредитів")
+    open_credits = models.IntegerField(default=0, verbose_name="Відкритих кредитів")
+    total_ostatok = models.DecimalField(max_digits=16, decimal_places=2, default=0, verbose_name="Залишок кредитів")
+    total_dolg_percent = models.DecimalField(max_digits=16, decimal_places=2, default=0,
+                                             verbose_name="Борг по оплаті %")
+
+    class Meta:
+        verbose_name = "Підсумок портфеля"
+        verbose_name_plural = "Підсумок портфеля"
+
+
+class PortfolioDay(models.Model):
+    """Рух портфеля за день: платежі (за датою платежу), видані і закриті кредити (рядок-шард дня)"""
+    pk = models.CompositePrimaryKey('day', 'shard')
+    day = models.DateField(verbose_name="День")
+    shard = models.PositiveSmallIntegerField(default=0, verbose_name="Шард")
+    payments = models.IntegerField(default=0, verbose_name="Платежів")
+    payments_sum = models.DecimalField(max_digits=16, decimal_places=2, default=0, verbose_name="Сума платежів")
+    credits_issued = models.IntegerField(default=0, verbose_name="Видано кредитів")
+    credits_closed = models.IntegerField(default=0, verbose_name="Закрито кредитів")
+
+    class Meta:
+        verbose_name = "Рух портфеля за день"
+        verbose_name_plural = "Рух портфеля по днях"
+
+
+class CreditNumberSequence(models.Model):
+    """Лічильник порядкових номерів кредитів (number1) для року видачі і постфікса"""
+    year = models.IntegerField(verbose_name="Рік видачі")
+    number3 = models.CharField(max_length=20, verbose_name="Постфікс/Підрозділ")
+    last_number = models.IntegerField(default=0, verbose_name="Останній виданий номер")
+
+    def __str__(self):
+        return f"{self.year}-{self.number3}: {self.last_number}"
+
+    @classmethod
+    def reserve(cls, year, number3=None, count=1):
+        """
+        Резервує count номерів поспіль і повертає перший з них. Рядок лічильника блокується
+        (select_for_update) до кінця зовнішньої транзакції, тож паралельні створення чекають одне одного
+        замість того, щоб отримати однаковий номер.
+        """
+        if count < 1:
+            raise ValueError("Кількість номерів має бути додатною.")
+
+        with transaction.atomic():
+            sequence, _ = cls.objects.select_for_update().get_or_create(year=year, number3=number3 or DEFAULT_NUMBER3)
+            first = sequence.last_number + 1
+            sequence.last_number += count
+            sequence.save(update_fields=['last_number'])
+        return first
+
+    class Meta:
+        verbose_name = "Лічильник номерів кредитів"
+        verbose_name_plural = "Лічильники номерів кредитів"
+        unique_together = ('year', 'number3')
 
 
 class Payment(models.Model):
@@ -172,9 +323,107 @@ class Payment(models.Model):
     ostatok = models.DecimalField(max_digits=10, decimal_places=2, verbose_name="Залишок кредиту")
     ost_payment = models.DecimalField(max_digits=10, decimal_places=2, verbose_name="Залишок платежу")
 
+    # Стан, з яким платіж прочитано з БД, — від нього рахується приріст руху портфеля (portfolio)
+    _portfolio_state = None
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        from credit_system.portfolio import payment_state
+
+        if {'credit_id', 'date_pay', 'pay'}.issubset(instance.__dict__):
+            instance._portfolio_state = payment_state(instance)
+        return instance
+
     def __str__(self):
-        return f"Платіж {self.pay} грн по кредиту №{self.credit.id} від {self.date_pay}"
+        return f"Платіж {self.pay} грн по кредиту №{self.credit_id} від {self.date_pay}"
 
     class Meta:
         verbose_name = "Платіж"
-        verbose_name_plural = "Платежі"
\ No newline at end of file
+        verbose_name_plural = "Платежі"
+        # Історія платежів кредиту по даті: сторінки (seek по date_pay, id), replay, стан на дату
+        indexes = [
+            models.Index(fields=['credit', 'date_pay', 'id'], name='payment_credit_date_idx'),
+        ]
+
+
+class PlannedInstallment(models.Model):
+    """Рядок планового графіка платежів, що зберігається при створенні кредиту"""
+    credit = models.ForeignKey(Credit, on_delete=models.CASCADE, related_name='planned_installments', verbose_name="Кредит")
+    number = models.PositiveIntegerField(verbose_name="Номер платежу")
+    date_pay = models.DateField(verbose_name="Дата платежу")
+    delta_days = models.IntegerField(verbose_name="Днів у періоді")
+    payment = models.DecimalField(max_digits=10, decimal_places=2, verbose_name="Сума платежу")
+    summa_percent = models.DecimalField(max_digits=10, decimal_places=2, verbose_name="Нараховано %")
+    pog_dolg_by_percents = models.DecimalField(max_digits=10, decimal_places=2, verbose_name="Погашено боргу по %")
+    pog_summa_percent = models.DecimalField(max_digits=10, decimal_places=2, verbose_name="Погашено %")
+    dolg_percent = models.DecimalField(max_digits=10, decimal_places=2, verbose_name="Борг по оплаті %")
+    pog_credit = models.DecimalField(max_digits=10, decimal_places=2, verbose_name="Погашено кредиту")
+    ostatok = models.DecimalField(max_digits=10, decimal_places=2, verbose_name="Залишок кредиту")
+    total_dolg = models.DecimalField(max_digits=10, decimal_places=2, verbose_name="Загальна заборгованість")
+
+    def __str__(self):
+        return f"Плановий платіж №{self.number} від {self.date_pay}"
+
+    class Meta:
+        verbose_name = "Плановий платіж"
+        verbose_name_plural = "Графік платежів"
+        # (credit, number) — графік кредиту по порядку, (credit, date_pay) — найближчі платежі
+        unique_together = ('credit', 'number')
+        indexes = [
+            models.Index(fields=['credit', 'date_pay']),
+        ]
+
+
+class InterestAccrual(models.Model):
+    """Щоденний знімок нарахованих (ще не сплачених) відсотків по відкритому кредиту"""
+    credit = models.ForeignKey(Credit, on_delete=models.CASCADE, related_name='accruals', verbose_name="Кредит")
+    accrual_date = models.DateField(verbose_name="Дата нарахування")
+    days = models.IntegerField(verbose_name="Днів з останнього платежу")
+    ostatok = models.DecimalField(max_digits=10, decimal_places=2, verbose_name="Залишок кредиту")
+    summa_percent = models.DecimalField(max_digits=10, decimal_places=2, verbose_name="Нараховано %")
+    dolg_percent = models.DecimalField(max_digits=10, decimal_places=2, verbose_name="Борг по оплаті %")
+    total_dolg = models.DecimalField(max_digits=12, decimal_places=2, verbose_name="Загальна заборгованість")
+
+    def __str__(self):
+        return f"Нарахування по кредиту №{self.credit_id} на {self.accrual_date}"
+
+    class Meta:
+        verbose_name = "Нарахування відсотків"
+        verbose_name_plural = "Нарахування відсотків"
+        unique_together = ('credit', 'accrual_date')
+        indexes = [models.Index(fields=['accrual_date'])]
+
+
+class AccrualRun(models.Model):
+    """Прогрес нічного нарахування на дату: дозволяє продовжити перерваний запуск"""
+    accrual_date = models.DateField(unique=True, verbose_name="Дата нарахування")
+    last_credit_id = models.BigIntegerField(default=0, verbose_name="Останній оброблений кредит")
+    credits = models.IntegerField(default=0, verbose_name="Оброблено кредитів")
+    started_at = models.DateTimeField(auto_now_add=True, verbose_name="Початок")
+    finished_at = models.DateTimeField(null=True, blank=True, verbose_name="Завершено")
+
+    def __str__(self):
+        return f"Нарахування на {self.accrual_date}"
+
+    class Meta:
+        verbose_name = "Запуск нарахування"
+        verbose_name_plural = "Запуски нарахування"
+
+
+class BalanceCheckpoint(models.Model):
+    """Стан кредиту на кінець місяця — після всіх платежів з датою не пізніше checkpoint_date"""
+    credit = models.ForeignKey(Credit, on_delete=models.CASCADE, related_name='checkpoints', verbose_name="Кредит")
+    checkpoint_date = models.DateField(verbose_name="Дата (кінець місяця)")
+    ostatok = models.DecimalField(max_digits=10, decimal_places=2, verbose_name="Залишок кредиту")
+    dolg_percent = models.DecimalField(max_digits=10, decimal_places=2, verbose_name="Борг по оплаті %")
+    last_pay_date = models.DateField(verbose_name="Дата останнього платежу")
+    closed = models.BooleanField(default=False, verbose_name="Кредит закрит")
+
+    def __str__(self):
+        return f"Стан кредиту №{self.credit_id} на {self.checkpoint_date}"
+
+    class Meta:
+        verbose_name = "Контрольна точка балансу"
+        verbose_name_plural = "Контрольні точки балансу"
+        unique_together = ('credit', 'checkpoint_date')
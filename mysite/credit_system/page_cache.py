@@ -0,0 +1,37 @@
+"""
+Кеш фрагментів сторінок кредиту і клієнта з ключами за версією.
+
+Credit.cache_version і CustomUser.cache_version збільшуються (UPDATE ... SET cache_version =
+cache_version + 1) при кожній зміні, що видно на сторінці: Credit.save, збереження і видалення
+Payment (сигнали; платіж з post_payment — лише через Credit.save, без повторного збільшення),
+видалення кредиту (сигнал, версія клієнта — навіть якщо платежів не було), а також масові шляхи
+без сигналів (імпорт виписки, replay). Шаблони кешують
+таблиці тегом {% cache ... credit.pk credit.cache_version using="pages" %}: версія читається разом
+з самим об'єктом, тож інвалідація — одне оновлення рядка, а старі записи просто не запитуються.
+"""
+from django.db.models import F
+
+from credit_system.models import Credit, CustomUser
+
+PAGE_CACHE = 'pages'
+
+
+def bump_credit_versions(credit_ids):
+    """Нові версії кредитів і їхніх клієнтів (сторінка клієнта показує таблицю його кредитів)."""
+    credit_ids = list(credit_ids)
+    if not credit_ids:
+        return
+    Credit.objects.filter(pk__in=credit_ids).update(cache_version=F('cache_version') + 1)
+    CustomUser.objects.filter(credits__in=credit_ids).update(cache_version=F('cache_version') + 1)
+
+
+def credit_deleted(sender, instance, **kwargs):
+    """Сигнал post_delete для Credit: сторінка клієнта більше не показує цей кредит."""
+    CustomUser.objects.filter(pk=instance.user_id).update(cache_version=F('cache_version') + 1)
+
+
+def payment_changed(sender, instance, **kwargs):
+    """Сигнал post_save/post_delete для Payment."""
+    if instance.__dict__.pop('_page_cache_bumped', False):
+        return
+    bump_credit_versions([instance.credit_id])
@@ -0,0 +1,163 @@
+"""
+Keyset (seek) пагінація для списків.
+
+Замість OFFSET сторінка починається після (або перед) рядка, значення ключів сортування якого
+закодовані в непрозорому курсорі (?cursor=...). Умова "після рядка" a > x OR (a = x AND (b < y OR ...))
+розбивається на діапазони композитного індексу в тому самому порядку (див. seek_filters), тож
+сторінка читає лише page_size + 1 рядків, хоч би як далеко гортав менеджер.
+Порядок сортування має закінчуватись унікальним ключем (id).
+"""
+import base64
+import json
+from decimal import Decimal
+from functools import reduce
+
+from django.db.models import Q
+from django.http import Http404
+
+# Розмір сторінки за замовчуванням
+PAGE_SIZE = 50
+
+
+def _json_value(value):
+    if hasattr(value, 'isoformat'):
+        return value.isoformat()
+    return str(value) if isinstance(value, Decimal) else value
+
+
+def encode_cursor(direction, values):
+    payload = json.dumps([direction, [_json_value(value) for value in values]])
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip('=')
+
+
+def decode_cursor(cursor, fields):
+    """Курсор -> (напрям 'next'/'prev', значення ключів у типах полів); Http404 для зіпсованого курсора."""
+    try:
+        direction, values = json.loads(base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)))
+        if direction not in ('next', 'prev') or len(values) != len(fields):
+            raise ValueError
+        return direction, [field.to_python(value) for field, value in zip(fields, values)]
+    except Exception:
+        raise Http404("Невірний курсор сторінки.")
+
+
+def seek_filters(ordering, values, forward=True):
+    """
+    Умови для рядків після (forward) або перед рядком зі значеннями values у порядку ordering —
+    по одному діапазону індексу, в порядку сортування. Рядки, що відрізняються від курсора лише
+    двома останніми ключами, — один діапазон (передостанній ключ нестрого, останній доперевіряється);
+    далі — по діапазону на кожен коротший префікс ключів.
+    """
+    # (поле, чи йдемо до менших значень)
+    keys = [(key.lstrip('-'), key.startswith('-') == forward) for key in ordering]
+
+    def beyond(index, strict=True):
+        name, down = keys[index]
+        return Q(**{f"{name}__{'lt' if down else 'gt'}{'' if strict else 'e'}": values[index]})
+
+    def equal(count):
+        # __in, а не =: на SQLite closed=False перетворюється на NOT closed, і індекс не використовується
+        return Q(**{f'{name}__in': [value] for (name, _), value in zip(keys[:count], values[:count])})
+
+    if len(keys) == 1:
+        yield beyond(0)
+        return
+
+    last = len(keys) - 1
+    yield equal(last - 1) & beyond(last - 1, strict=False) & (beyond(last - 1) | beyond(last))
+    for index in range(last - 2, -1, -1):
+        yield equal(index) & beyond(index)
+
+
+class KeysetPage:
+    """Сторінка з курсорами сусідніх сторінок (None — сторінки немає)."""
+
+    def __init__(self, object_list, next_cursor, previous_cursor):
+        self.object_list = object_list
+        self.next_cursor = next_cursor
+        self.previous_cursor = previous_cursor
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def has_next(self):
+        return self.next_cursor is not None
+
+    def has_previous(self):
+        return self.previous_cursor is not None
+
+    def has_other_pages(self):
+        return self.has_next() or self.has_previous()
+
+
+def _ordering_field(model, path):
+    """Поле моделі за шляхом ключа сортування (можна через зв'язки: summary__total_ostatok)."""
+    *relations, name = path.split('__')
+    for relation in relations:
+        model = model._meta.get_field(relation).related_model
+    return model._meta.get_field(name)
+
+
+def keyset_page(queryset, ordering, page_size, cursor=None):
+    """
+    Одна сторінка queryset у порядку ordering, починаючи з курсора. Для ключів через зв'язки
+    queryset має робити select_related, щоб значення курсора не читались окремими запитами.
+    """
+    paths = [key.lstrip('-') for key in ordering]
+    fields = [_ordering_field(queryset.model, path) for path in paths]
+    direction, values = decode_cursor(cursor, fields) if cursor else ('next', None)
+    forward = direction == 'next'
+
+    walk_ordering = ordering
+    if not forward:
+        # Назад читаємо у зворотному порядку і розвертаємо результат
+        walk_ordering = [key[1:] if key.startswith('-') else f'-{key}' for key in ordering]
+
+    if values is None:
+        rows = list(queryset.order_by(*walk_ordering)[:page_size + 1])
+    else:
+        # Діапазони читаються по черзі, поки не набереться сторінка (зазвичай вистачає першого)
+        rows = []
+        for condition in seek_filters(ordering, values, forward):
+            rows += queryset.filter(condition).order_by(*walk_ordering)[:page_size + 1 - len(rows)]
+            if len(rows) > page_size:
+                break
+
+    has_more = len(rows) > page_size
+    rows = rows[:page_size]
+    if not forward:
+        rows.reverse()
+
+    def row_cursor(direction, row):
+        return encode_cursor(direction, [reduce(getattr, path.split('__'), row) for path in paths])
+
+    has_next, has_previous = (has_more, values is not None) if forward else (True, has_more)
+    return KeysetPage(
+        rows,
+        row_cursor('next', rows[-1]) if rows and has_next else None,
+        row_cursor('prev', rows[0]) if rows and has_previous else None,
+    )
+
+
+class KeysetPaginationMixin:
+    """Для ListView: keyset-пагінація замість Paginator; порядок задає get_keyset_ordering()."""
+    keyset_ordering = ('id',)
+    paginate_by = PAGE_SIZE
+
+    def get_keyset_ordering(self):
+        return self.keyset_ordering
+
+    def paginate_queryset(self, queryset, page_size):
+        page = keyset_page(queryset, self.get_keyset_ordering(), page_size, self.request.GET.get('cursor'))
+        return None, page, page.object_list, page.has_other_pages()
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        # Параметри запиту без курсора — для посилань на сусідні сторінки
+        params = self.request.GET.copy()
+        params.pop('cursor', None)
+        context['page_query'] = params.urlencode()
+        return context
@@ -0,0 +1,226 @@
+"""
+Масовий імпорт платежів з банківської виписки (CSV).
+
+Перший рядок — заголовок з колонками credit_number (повний номер кредиту, як у Credit.number)
+або credit_id, date_pay (рррр-мм-дд або дд.мм.рррр) та pay (сума, кома або крапка).
+Рядки групуються по кредитах і сортуються по даті; розподіл рахується в пам'яті
+(allocate_payment_cents — той самий, що й у process_payment), а записи йдуть пачками:
+bulk_create для Payment і bulk_update для Credit (плюс версії кешу сторінок, підсумки клієнтів і
+портфеля), по одній транзакції на пачку кредитів.
+Помилкові рядки потрапляють у звіт і не зупиняють імпорт.
+"""
+import csv
+from collections import Counter, defaultdict
+from datetime import datetime
+from decimal import Decimal, InvalidOperation
+
+from django.db import DatabaseError, transaction
+
+from credit_system.models import Credit, Payment
+from credit_system.services import allocate_payment_cents, to_cents, from_cents, PAYMENT_CREDIT_FIELDS
+from credit_system.checkpoints import checkpoints_between, save_checkpoints
+from credit_system.page_cache import bump_credit_versions
+from credit_system.client_summary import update_summaries
+from credit_system.portfolio import payment_state, payments_changed
+
+DATE_FORMATS = ('%Y-%m-%d', '%d.%m.%Y')
+# Найбільша сума, що вміщується в Payment.pay (max_digits=10, decimal_places=2)
+MAX_PAY = Decimal('99999999.99')
+# Скільки кредитів обробляти в одній транзакції
+CHUNK_SIZE = 500
+
+
+class ImportReport:
+    """Підсумок імпорту: кількість рядків, проведених платежів, оновлених кредитів і помилки по рядках."""
+
+    def __init__(self):
+        self.rows = 0
+        self.imported = 0
+        self.credits = 0
+        self.errors = []
+
+    def add_error(self, line, message):
+        self.errors.append((line, message))
+
+    @property
+    def sorted_errors(self):
+        return sorted(self.errors)
+
+
+class StatementRow:
+    __slots__ = ('line', 'credit_id', 'credit_number', 'date_pay', 'pay')
+
+    def __init__(self, line, credit_id, credit_number, date_pay, pay):
+        self.line = line
+        self.credit_id = credit_id
+        self.credit_number = credit_number
+        self.date_pay = date_pay
+        self.pay = pay
+
+
+def parse_date(value):
+    for date_format in DATE_FORMATS:
+        try:
+            return datetime.strptime(value.strip(), date_format).date()
+        except ValueError:
+            continue
+    raise ValueError(f"Невірна дата платежу: '{value}'")
+
+
+def parse_pay(value):
+    """Сума платежу в копійках."""
+    try:
+        pay = Decimal(value.replace(' ', '').replace('\xa0', '').replace(',', '.'))
+    except InvalidOperation:
+        raise ValueError(f"Невірна сума платежу: '{value}'")
+    # nan, inf: порівняння і quantize з ними кидають InvalidOperation
+    if not pay.is_finite():
+        raise ValueError(f"Невірна сума платежу: '{value}'")
+    if pay <= 0:
+        raise ValueError("Сума платежу має бути додатною.")
+    if pay > MAX_PAY:
+        raise ValueError(f"Сума платежу завелика: '{value}'")
+    if pay != pay.quantize(Decimal('0.01')):
+        raise ValueError(f"Сума платежу має бути в копійках: '{value}'")
+    return int(pay * 100)
+
+
+def parse_statement(lines, report):
+    """Рядки виписки (список) -> список StatementRow; рядки з помилками записуються у звіт."""
+    rows = []
+    # Виписки з Excel часто розділені крапкою з комою — дивимось на заголовок
+    header = lines[0] if lines else ''
+    reader = csv.DictReader(lines, delimiter=';' if header.count(';') > header.count(',') else ',')
+
+    for row in reader:
+        report.rows += 1
+        line = reader.line_num
+        credit_id = (row.get('credit_id') or '').strip()
+        credit_number = (row.get('credit_number') or '').strip()
+        try:
+            if not credit_id and not credit_number:
+                raise ValueError("Не вказано кредит (credit_number або credit_id).")
+            if credit_id and not credit_id.isdigit():
+                raise ValueError(f"Невірний credit_id: '{credit_id}'")
+            date_pay = parse_date(row.get('date_pay') or '')
+            pay = parse_pay(row.get('pay') or '')
+        except ValueError as e:
+            report.add_error(line, str(e))
+            continue
+
+        rows.append(StatementRow(line, int(credit_id) if credit_id else None, credit_number, date_pay, pay))
+
+    return rows
+
+
+def group_by_credit(rows, report):
+    """{credit_id: рядки, відсортовані по date_pay} — кредити шукаються двома запитами (по id та номеру)."""
+    numbers = {row.credit_number for row in rows if row.credit_id is None}
+    found = list(Credit.objects.filter(number__in=numbers).values_list('number', 'id'))
+    number_counts = Counter(number for number, _ in found)
+    id_by_number = dict(found)
+    existing_ids = set(Credit.objects.filter(
+        pk__in={row.credit_id for row in rows if row.credit_id is not None}).values_list('pk', flat=True))
+
+    groups = defaultdict(list)
+    for row in rows:
+        if row.credit_id is not None:
+            credit_id = row.credit_id if row.credit_id in existing_ids else None
+        elif number_counts[row.credit_number] > 1:
+            report.add_error(row.line, f"Номер кредиту '{row.credit_number}' неоднозначний.")
+            continue
+        else:
+            credit_id = id_by_number.get(row.credit_number)
+
+        if credit_id is None:
+            report.add_error(row.line, f"Кредит не знайдено: '{row.credit_number or row.credit_id}'")
+            continue
+        groups[credit_id].append(row)
+
+    for credit_rows in groups.values():
+        credit_rows.sort(key=lambda row: (row.date_pay, row.line))
+    return groups
+
+
+def allocate_rows(credit, rows, report):
+    """
+    Проводить рядки по кредиту в пам'яті: повертає нові Payment і контрольні точки на кінці місяців
+    між платежами, оновлює поля стану credit.
+    """
+    payments, checkpoints = [], []
+    ostatok, dolg_percent = to_cents(credit.ostatok), to_cents(credit.dolg_percent)
+
+    for row in rows:
+        if credit.closed:
+            report.add_error(row.line, f"Кредит №{credit.number} вже закрито.")
+            continue
+        delta_days = (row.date_pay - credit.last_pay_date).days
+        if delta_days < 0:
+            report.add_error(row.line, "Дата платежу не може бути раніше останньої дати платежу.")
+            continue
+
+        checkpoints += checkpoints_between(credit.pk, ostatok, dolg_percent, credit.last_pay_date, credit.closed,
+                                           row.date_pay)
+        result = allocate_payment_cents(ostatok, dolg_percent, credit.percent, row.pay, delta_days)
+        ostatok, dolg_percent = result['ostatok'], result['dolg_percent']
+        credit.last_pay_date = row.date_pay
+        credit.closed = result['closed']
+
+        # Переплата на останньому платежі зменшує сам платіж
+        payments.append(Payment(
+            credit=credit, pay=from_cents(row.pay - result['ost_payment']), date_pay=row.date_pay,
+            summa_percent=from_cents(result['summa_percent']),
+            pog_summa_percent=from_cents(result['pog_summa_percent']),
+            dolg_percent=from_cents(dolg_percent), pog_credit=from_cents(result['pog_credit']),
+            ostatok=from_cents(ostatok), ost_payment=from_cents(result['ost_payment']),
+        ))
+
+    if payments:
+        credit.ostatok = from_cents(ostatok)
+        credit.dolg_percent = from_cents(dolg_percent)
+    return payments, checkpoints
+
+
+def import_payments(lines, chunk_size=CHUNK_SIZE):
+    """Імпортує платежі з рядків CSV (список рядків або файл у текстовому режимі); повертає ImportReport."""
+    if not isinstance(lines, list):
+        lines = list(lines)
+
+    report = ImportReport()
+    groups = group_by_credit(parse_statement(lines, report), report)
+    credit_ids = sorted(groups)
+
+    for start in range(0, len(credit_ids), chunk_size):
+        chunk = credit_ids[start:start + chunk_size]
+        # Помилки рядків пачки, записані до відкату, замінюються однією помилкою збереження на рядок
+        errors_before = len(report.errors)
+        try:
+            with transaction.atomic():
+                # Стан кредитів читаємо під блокуванням, як і post_payment
+                credits = Credit.objects.select_for_update().in_bulk(chunk)
+                payments, checkpoints, changed = [], [], []
+                for credit_id in chunk:
+                    credit_payments, credit_checkpoints = allocate_rows(credits[credit_id], groups[credit_id], report)
+                    if credit_payments:
+                        payments.extend(credit_payments)
+                        checkpoints.extend(credit_checkpoints)
+                        changed.append(credits[credit_id])
+
+                Payment.objects.bulk_create(payments)
+                Credit.objects.bulk_update(changed, PAYMENT_CREDIT_FIELDS)
+                save_checkpoints(checkpoints)
+                # bulk_create і bulk_update обходять save і сигнали — версії кешу і підсумки оновлюємо самі
+                bump_credit_versions(credit.pk for credit in changed)
+                update_summaries(changed)
+                payments_changed([(None, payment_state(payment)) for payment in payments])
+        except DatabaseError as e:
+            del report.errors[errors_before:]
+            for credit_id in chunk:
+                for row in groups[credit_id]:
+                    report.add_error(row.line, f"Помилка збереження: {e}")
+            continue
+
+        report.imported += len(payments)
+        report.credits += len(changed)
+
+    return report
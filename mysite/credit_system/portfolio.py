@@ -0,0 +1,195 @@
+"""
+Панель менеджера на головній сторінці: підсумок кредитного портфеля (PortfolioTotals) і рух по днях
+(PortfolioDay: платежі за датою платежу, видані кредити за датою видачі, закриті — за датою останнього платежу).
+
+Як і підсумки клієнтів (client_summary), таблиці оновлюються приростами в транзакції, що змінює
+кредит чи платіж: зміни кредитів приходять з client_summary (Credit.save, видалення, імпорт, replay),
+платежі — із сигналів Payment (post_payment, адмін-панель), імпорту виписки (bulk_create) і replay
+(змінена сума). Щоб проведення по різних кредитах не чекали на блокування одного рядка, і підсумок,
+і кожен день розкладені на SHARDS рядків-шардів: приріст кредиту та його платежів іде в шард
+id кредиту % SHARDS, а панель додає шарди — не більше SHARDS рядків підсумку і SHARDS * 31 рядків днів
+поточного місяця, хоч би який великий портфель. manage.py rebuild_portfolio перераховує все з кредитів і платежів.
+"""
+from collections import defaultdict
+from datetime import date
+from decimal import Decimal
+
+from django.db import transaction
+from django.db.models import Case, Count, F, Q, Sum, Value, When
+
+from credit_system.models import Credit, Payment, PortfolioDay, PortfolioTotals
+
+# Кількість рядків-шардів підсумку (pk) і кожного дня (PortfolioDay.shard)
+SHARDS = 16
+TOTALS_FIELDS = ['credits', 'open_credits', 'total_ostatok', 'total_dolg_percent']
+DAY_FIELDS = ['payments', 'payments_sum', 'credits_issued', 'credits_closed']
+
+
+def to_decimal(value):
+    """Гривні (float або Decimal) -> Decimal з копійками."""
+    return Decimal(str(round(value or 0, 2)))
+
+
+def increment_rows(model, deltas, fields):
+    """
+    Додає прирости deltas ({pk: [приріст для кожного з fields]}) до рядків model. Два запити на будь-яку
+    кількість рядків: створення відсутніх і одне UPDATE ... SET поле = поле + CASE pk ... END.
+    """
+    deltas = {key: delta for key, delta in deltas.items() if any(delta)}
+    if not deltas:
+        return
+
+    model.objects.bulk_create([model(pk=key) for key in deltas], ignore_conflicts=True)
+
+    def increment(field, index):
+        return F(field) + Case(
+            *[When(pk=key, then=Value(delta[index])) for key, delta in deltas.items()],
+            default=Value(0), output_field=model._meta.get_field(field).clone(),
+        )
+
+    model.objects.filter(pk__in=list(deltas)).update(
+        **{field: increment(field, index) for index, field in enumerate(fields)}
+    )
+
+
+def shard(credit_id):
+    """Рядок-шард, у який іде приріст кредиту і його платежів."""
+    return (credit_id or 0) % SHARDS
+
+
+def new_day_deltas():
+    """Прирости днів: {(день, шард): [...]} — ключ первинний (складений) PortfolioDay."""
+    return defaultdict(lambda: [0, Decimal(0), 0, 0])
+
+
+def credits_changed(changes):
+    """changes — [(старий, новий)] стан кредиту (client_summary.credit_state) або None."""
+    totals = defaultdict(lambda: [0, 0, Decimal(0), Decimal(0)])
+    days = new_day_deltas()
+    for old, new in changes:
+        for state, sign in ((old, -1), (new, 1)):
+            if state is None:
+                continue
+            key = shard(state.credit_id)
+            delta = totals[key]
+            delta[0] += sign
+            delta[1] += sign * state.is_open
+            delta[2] += sign * state.ostatok
+            delta[3] += sign * state.dolg_percent
+            if state.start_date:
+                days[state.start_date, key][2] += sign
+            if state.closed_on:
+                days[state.closed_on, key][3] += sign
+
+    increment_rows(PortfolioTotals, totals, TOTALS_FIELDS)
+    increment_rows(PortfolioDay, days, DAY_FIELDS)
+
+
+def payment_state(payment):
+    """Внесок платежу в рух за день: (кредит, дата платежу, сума)."""
+    return payment.credit_id, payment.date_pay, to_decimal(payment.pay)
+
+
+def payments_changed(changes):
+    """changes — [(старий, новий)] стан платежу (payment_state) або None."""
+    days = new_day_deltas()
+    for old, new in changes:
+        for state, sign in ((old, -1), (new, 1)):
+            if state is not None:
+                credit_id, day, pay = state
+                delta = days[day, shard(credit_id)]
+                delta[0] += sign
+                delta[1] += sign * pay
+    increment_rows(PortfolioDay, days, DAY_FIELDS)
+
+
+def payment_saving(sender, instance, **kwargs):
+    """
+    Сигнал pre_save для Payment. Попередній стан платежу береться з Payment.from_db; рядок читається,
+    лише якщо змінюється платіж, створений не з БД (відомий лише pk).
+    """
+    if instance._portfolio_state is None and not instance._state.adding:
+        row = Payment.objects.filter(pk=instance.pk).values('credit_id', 'date_pay', 'pay').first()
+        if row:
+            instance._portfolio_state = payment_state(Payment(**row))
+
+
+def payment_saved(sender, instance, **kwargs):
+    """Сигнал post_save для Payment."""
+    new = payment_state(instance)
+    payments_changed([(instance._portfolio_state, new)])
+    instance._portfolio_state = new
+
+
+def payment_deleted(sender, instance, **kwargs):
+    """Сигнал post_delete для Payment (при видаленні кредиту платежі читаються з БД перед видаленням)."""
+    payments_changed([(payment_state(instance), None)])
+
+
+def portfolio_totals():
+    """Підсумок портфеля — сума рядків-шардів (незбережений PortfolioTotals)."""
+    totals = PortfolioTotals.objects.aggregate(*[Sum(field) for field in TOTALS_FIELDS])
+    return PortfolioTotals(**{field: totals[f'{field}__sum'] or 0 for field in TOTALS_FIELDS})
+
+
+def portfolio_days(days):
+    """Рух по днях з queryset PortfolioDay — суми шардів: {день: незбережений PortfolioDay}."""
+    rows = days.values('day').annotate(*[Sum(field) for field in DAY_FIELDS]).order_by('day')
+    return {row['day']: PortfolioDay(day=row['day'], **{field: row[f'{field}__sum'] for field in DAY_FIELDS})
+            for row in rows}
+
+
+def dashboard(today=None):
+    """Дані панелі менеджера: два запити по первинних ключах незалежно від розміру портфеля."""
+    today = today or date.today()
+    totals = portfolio_totals()
+    month = portfolio_days(PortfolioDay.objects.filter(day__gte=today.replace(day=1), day__lte=today))
+
+    return {
+        'totals': totals,
+        'today': month.get(today) or PortfolioDay(day=today),
+        'month_issued': sum(row.credits_issued for row in month.values()),
+        'month_closed': sum(row.credits_closed for row in month.values()),
+        'month_payments_sum': sum((row.payments_sum for row in month.values()), Decimal(0)),
+    }
+
+
+def rebuild_portfolio():
+    """
+    Перераховує підсумок і рух по днях з таблиць кредитів і платежів; усе записується в шард 0.
+    Рядки підсумку блокуються на час перерахунку, тож проведення, що змінюють кредити, чекають
+    і додають свій приріст уже після. Повертає кількість днів.
+    """
+    days = new_day_deltas()
+    with transaction.atomic():
+        PortfolioTotals.objects.bulk_create([PortfolioTotals(pk=key) for key in range(SHARDS)], ignore_conflicts=True)
+        list(PortfolioTotals.objects.select_for_update().order_by('pk'))
+        PortfolioTotals.objects.exclude(pk=0).delete()
+        totals = PortfolioTotals(pk=0)
+
+        payments = Payment.objects.values_list('date_pay').annotate(count=Count('id'), total=Sum('pay'))
+        for day, count, total in payments.order_by():
+            days[day, 0][0:2] = [count, to_decimal(total)]
+        for day, count in Credit.objects.values_list('start_date').annotate(count=Count('id')).order_by():
+            days[day, 0][2] = count
+        closed = Credit.objects.filter(closed=True, last_pay_date__isnull=False)
+        for day, count in closed.values_list('last_pay_date').annotate(count=Count('id')).order_by():
+            days[day, 0][3] = count
+
+        aggregate = Credit.objects.aggregate(
+            credits=Count('id'), open_credits=Count('id', filter=Q(closed=False)),
+            total_ostatok=Sum('ostatok'), total_dolg_percent=Sum('dolg_percent'),
+        )
+        totals.credits = aggregate['credits']
+        totals.open_credits = aggregate['open_credits']
+        totals.total_ostatok = to_decimal(aggregate['total_ostatok'])
+        totals.total_dolg_percent = to_decimal(aggregate['total_dolg_percent'])
+        totals.save()
+
+        PortfolioDay.objects.all().delete()
+        PortfolioDay.objects.bulk_create(
+            [PortfolioDay(day=day, shard=key, **dict(zip(DAY_FIELDS, values)))
+             for (day, key), values in sorted(days.items())],
+            batch_size=1000,
+        )
+    return len(days)
@@ -0,0 +1,126 @@
+"""
+Облік SQL-запитів за HTTP-запит: кількість, сумарний час і найповільніші запити.
+
+QueryStatsMiddleware на час обробки запиту ставить execute_wrapper на всі підключення до БД
+(працює і без DEBUG, на відміну від connection.queries). У DEBUG підсумок іде в заголовки
+відповіді X-Query-Count, X-Query-Time-Ms і X-Query-Slowest, інакше — рядком JSON у лог
+'credit_system.queries' (обробник — у settings.LOGGING): INFO для кожного запиту, WARNING понад
+QUERY_STATS_WARN_QUERIES запитів або QUERY_STATS_WARN_MS мілісекунд SQL. Облік лишається на відповіді (response.query_stats),
+тож тести перевіряють бюджети запитів по в'юшках через QueryBudgetMixin.
+"""
+import json
+import logging
+import time
+from contextlib import ExitStack, contextmanager
+
+from django.conf import settings
+from django.db import connections
+
+logger = logging.getLogger('credit_system.queries')
+
+# Скільки найповільніших запитів запам'ятовувати
+SLOWEST = 3
+# Обрізання тексту запиту в заголовку і в лозі
+SQL_PREVIEW = 200
+# Пороги для WARNING у лозі, якщо не задані в settings
+WARN_QUERIES = 50
+WARN_MS = 500
+
+
+class QueryStats:
+    """execute_wrapper, що рахує запити, їхній сумарний час і найповільніші."""
+
+    def __init__(self, keep=SLOWEST):
+        self.keep = keep
+        self.count = 0
+        self.total = 0.0
+        # [(секунди, sql)] від найповільнішого
+        self.slowest = []
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            elapsed = time.perf_counter() - started
+            self.count += 1
+            self.total += elapsed
+            if len(self.slowest) < self.keep or elapsed > self.slowest[-1][0]:
+                self.slowest.append((elapsed, sql))
+                self.slowest.sort(key=lambda item: item[0], reverse=True)
+                del self.slowest[self.keep:]
+
+    @contextmanager
+    def record(self):
+        """Облік усіх запитів у межах блоку, по всіх підключеннях."""
+        with ExitStack() as stack:
+            for connection in connections.all():
+                stack.enter_context(connection.execute_wrapper(self))
+            yield self
+
+    @property
+    def total_ms(self):
+        return round(self.total * 1000, 1)
+
+    def slowest_preview(self):
+        """[(мс, sql в один рядок, обрізаний)] — для заголовків, логу і повідомлень тестів."""
+        return [(round(elapsed * 1000, 1), ' '.join(sql.split())[:SQL_PREVIEW]) for elapsed, sql in self.slowest]
+
+    def as_dict(self):
+        return {
+            'queries': self.count,
+            'sql_ms': self.total_ms,
+            'slowest': [{'ms': ms, 'sql': sql} for ms, sql in self.slowest_preview()],
+        }
+
+
+class QueryStatsMiddleware:
+    """Має стояти першим у MIDDLEWARE, щоб враховувати і запити сесій та автентифікації."""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        stats = QueryStats()
+        started = time.perf_counter()
+        with stats.record():
+            response = self.get_response(request)
+        response.query_stats = stats
+
+        if settings.DEBUG:
+            response.headers['X-Query-Count'] = str(stats.count)
+            response.headers['X-Query-Time-Ms'] = str(stats.total_ms)
+            if stats.slowest:
+                ms, sql = stats.slowest_preview()[0]
+                response.headers['X-Query-Slowest'] = f"{ms} ms: {sql}"
+        else:
+            match = request.resolver_match
+            over_budget = (stats.count > getattr(settings, 'QUERY_STATS_WARN_QUERIES', WARN_QUERIES)
+                           or stats.total_ms > getattr(settings, 'QUERY_STATS_WARN_MS', WARN_MS))
+            logger.log(logging.WARNING if over_budget else logging.INFO, json.dumps({
+                'method': request.method,
+                'path': request.path,
+                'view': match.view_name if match else None,
+                'status': response.status_code,
+                'total_ms': round((time.perf_counter() - started) * 1000, 1),
+                **stats.as_dict(),
+            }, ensure_ascii=False))
+        return response
+
+
+class QueryBudgetMixin:
+    """
+    Для TestCase: бюджети запитів по в'юшках. query_budgets = {ім'я url (view_name): максимум запитів};
+    assertQueryBudget(response) бере облік з відповіді (потрібен QueryStatsMiddleware).
+    """
+    query_budgets = {}
+
+    def assertQueryBudget(self, response, budget=None):
+        view_name = response.resolver_match.view_name
+        if budget is None:
+            budget = self.query_budgets[view_name]
+        stats = response.query_stats
+        if stats.count > budget:
+            slowest = '\n'.join(f"  {ms} ms: {sql}" for ms, sql in stats.slowest_preview())
+            self.fail(f"{view_name}: {stats.count} запитів SQL при бюджеті {budget} "
+                      f"({stats.total_ms} ms). Найповільніші:\n{slowest}")
@@ -0,0 +1,178 @@
+"""
+Перерахунок стану кредиту за історією платежів (ledger replay).
+
+Credit.ostatok, dolg_percent, closed і last_pay_date оновлюються лише інкрементально при проведенні
+платежу, тож після зміни дати, суми чи видалення платежу в адмін-панелі стан треба відновити.
+Платежі кредиту читаються одним запитом (по даті), розподіл заново рахується в цілих копійках
+(allocate_payment_cents) від стану на дату видачі, а змінені колонки Payment і стан кредиту
+записуються через bulk_update, а контрольні точки балансу кредиту будуються заново.
+Отримана сума платежу = pay + ost_payment (переплата, яку відрізали від останнього платежу,
+знову бере участь у розподілі).
+
+Пакетний режим читає і блокує кредити пачками, а сам розрахунок пачки роздає процесам-воркерам.
+"""
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import django
+from django.db import transaction
+
+from credit_system.models import Credit, Payment
+from credit_system.services import allocate_payment_cents, to_cents, from_cents, PAYMENT_CREDIT_FIELDS
+from credit_system.checkpoints import checkpoints_from_history, replace_checkpoints
+from credit_system.page_cache import bump_credit_versions
+from credit_system.client_summary import update_summaries
+from credit_system.portfolio import payments_changed, to_decimal
+
+# Колонки Payment, які виводяться з розподілу
+DERIVED_PAYMENT_FIELDS = ['pay', 'summa_percent', 'pog_summa_percent', 'dolg_percent', 'pog_credit', 'ostatok',
+                          'ost_payment']
+# Скільки кредитів читати, блокувати і записувати в одній транзакції
+CHUNK_SIZE = 1000
+
+
+def replay_allocations(summa_credit, percent, start_date, payments):
+    """
+    Чистий розрахунок (без БД — підходить для процесу-воркера).
+    payments — [(id, date_pay, отримана сума в копійках)] у порядку дати.
+    Повертає ([(id, {колонка: копійки})], {поле стану кредиту: значення}).
+    """
+    ostatok, dolg_percent, closed, last_pay_date = to_cents(summa_credit), 0, False, start_date
+    rows = []
+
+    for payment_id, date_pay, received in payments:
+        result = allocate_payment_cents(ostatok, dolg_percent, percent, received, (date_pay - last_pay_date).days)
+        ostatok, dolg_percent, last_pay_date = result['ostatok'], result['dolg_percent'], date_pay
+        closed = closed or result['closed']
+
+        rows.append((payment_id, {
+            'pay': received - result['ost_payment'],
+            'summa_percent': result['summa_percent'],
+            'pog_summa_percent': result['pog_summa_percent'],
+            'dolg_percent': dolg_percent,
+            'pog_credit': result['pog_credit'],
+            'ostatok': ostatok,
+            'ost_payment': result['ost_payment'],
+        }))
+
+    state = {'ostatok': ostatok, 'dolg_percent': dolg_percent, 'closed': closed, 'last_pay_date': last_pay_date}
+    return rows, state
+
+
+def _replay_ledger(ledger):
+    credit_id, summa_credit, percent, start_date, payments = ledger
+    return credit_id, replay_allocations(summa_credit, percent, start_date, payments)
+
+
+def load_ledgers(credits):
+    """
+    Історії платежів для кредитів (одним запитом по всіх): список аргументів для replay_allocations
+    і поточні значення похідних колонок платежів у копійках.
+    """
+    payments_by_credit = {credit.pk: [] for credit in credits}
+    stored = {}
+    rows = (Payment.objects.filter(credit_id__in=payments_by_credit)
+            .order_by('credit_id', 'date_pay', 'id')
+            .values_list('credit_id', 'id', 'date_pay', *DERIVED_PAYMENT_FIELDS))
+
+    for credit_id, payment_id, date_pay, *values in rows:
+        cents = dict(zip(DERIVED_PAYMENT_FIELDS, (int(value * 100) for value in values)))
+        stored[payment_id] = cents
+        payments_by_credit[credit_id].append((payment_id, date_pay, cents['pay'] + cents['ost_payment']))
+
+    ledgers = [
+        (credit.pk, credit.summa_credit, credit.percent, credit.start_date, payments_by_credit[credit.pk])
+        for credit in credits
+    ]
+    return ledgers, stored
+
+
+def replay_credits(credit_ids, workers=1, chunk_size=CHUNK_SIZE, dry_run=False):
+    """
+    Перераховує кредити пачками; workers > 1 — розрахунок у паралельних процесах.
+    Повертає лічильники: кредитів, змінених кредитів, змінених платежів.
+    """
+    credit_ids = sorted(credit_ids)
+    stats = {'credits': 0, 'changed_credits': 0, 'changed_payments': 0}
+    # Воркери не ходять у БД, але імпорт моделей вимагає налаштованого Django (spawn у Windows/macOS)
+    executor = ProcessPoolExecutor(workers, initializer=django.setup) if workers > 1 else None
+
+    try:
+        for start in range(0, len(credit_ids), chunk_size):
+            chunk = credit_ids[start:start + chunk_size]
+            with transaction.atomic():
+                credits = list(Credit.objects.select_for_update().filter(pk__in=chunk).order_by('pk'))
+                ledgers, stored = load_ledgers(credits)
+                if executor is not None:
+                    results = dict(executor.map(_replay_ledger, ledgers, chunksize=max(len(ledgers) // (workers * 4), 1)))
+                else:
+                    results = dict(map(_replay_ledger, ledgers))
+
+                changed_credits, changed_payments = _apply_results(credits, results, stored)
+                if not dry_run:
+                    Payment.objects.bulk_update(changed_payments, DERIVED_PAYMENT_FIELDS, batch_size=chunk_size)
+                    Credit.objects.bulk_update(changed_credits, PAYMENT_CREDIT_FIELDS)
+                    replace_checkpoints(chunk, _checkpoints(ledgers, results))
+                    bump_credit_versions({credit.pk for credit in changed_credits}
+                                         | {payment.credit_id for payment in changed_payments})
+                    update_summaries(changed_credits)
+                    payments_changed(_payment_changes(ledgers, changed_payments, stored))
+
+            stats['credits'] += len(credits)
+            stats['changed_credits'] += len(changed_credits)
+            stats['changed_payments'] += len(changed_payments)
+    finally:
+        if executor is not None:
+            executor.shutdown()
+
+    return stats
+
+
+def _payment_changes(ledgers, changed_payments, stored):
+    """Зміни сум платежів для руху портфеля по днях: [((кредит, дата, стара сума), (кредит, дата, нова сума))]."""
+    dates = {payment_id: date_pay for *_, payments in ledgers for payment_id, date_pay, _ in payments}
+    return [
+        ((payment.credit_id, dates[payment.pk], to_decimal(from_cents(stored[payment.pk]['pay']))),
+         (payment.credit_id, dates[payment.pk], to_decimal(payment.pay)))
+        for payment in changed_payments
+    ]
+
+
+def _apply_results(credits, results, stored):
+    """Оновлює об'єкти кредитів і створює Payment лише для рядків, що змінились."""
+    changed_credits, changed_payments = [], []
+
+    for credit in credits:
+        rows, state = results[credit.pk]
+        for payment_id, cents in rows:
+            if cents != stored[payment_id]:
+                changed_payments.append(Payment(id=payment_id, credit_id=credit.pk,
+                                                **{field: from_cents(value) for field, value in cents.items()}))
+
+        new_state = dict(state, ostatok=from_cents(state['ostatok']), dolg_percent=from_cents(state['dolg_percent']))
+        if any(getattr(credit, field) != value for field, value in new_state.items()):
+            for field, value in new_state.items():
+                setattr(credit, field, value)
+            changed_credits.append(credit)
+
+    return changed_credits, changed_payments
+
+
+def _checkpoints(ledgers, results):
+    """Контрольні точки на кінці місяців за перерахованою історією."""
+    checkpoints = []
+    for credit_id, summa_credit, percent, start_date, payments in ledgers:
+        rows = results[credit_id][0]
+        history = [(date_pay, cents['ostatok'], cents['dolg_percent'])
+                   for (payment_id, date_pay, received), (_, cents) in zip(payments, rows)]
+        checkpoints += checkpoints_from_history(credit_id, start_date, summa_credit, history)
+    return checkpoints
+
+
+def replay_credit(credit_id, dry_run=False):
+    """Перерахунок одного кредиту (в поточному процесі)."""
+    return replay_credits([credit_id], dry_run=dry_run)
+
+
+def default_workers():
+    return os.cpu_count() or 1
@@ -0,0 +1,19 @@
+"""
+Тимчасова база для інструментів, що пишуть у БД (fuzz_credit_engine, bench_credit_engine).
+
+scratch_database() на час блоку створює тестову базу так само, як manage.py test (для SQLite —
+у пам'яті), з усіма міграціями, і перемикає на неї підключення; після блоку база видаляється.
+Тимчасові кредити й платежі не блокують лічильники номерів і рядки підсумків робочої бази.
+"""
+from contextlib import contextmanager
+
+from django.test.utils import setup_databases, teardown_databases
+
+
+@contextmanager
+def scratch_database(aliases=('default',)):
+    old_config = setup_databases(verbosity=0, interactive=False, aliases=set(aliases), serialized_aliases=set())
+    try:
+        yield
+    finally:
+        teardown_databases(old_config, verbosity=0)
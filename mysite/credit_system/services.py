@@ -1,7 +1,13 @@
+from collections import defaultdict
 from decimal import Decimal
 from datetime import date, datetime
 
-from credit_system.models import Credit
+from django.db import transaction
+
+from credit_system.models import DEFAULT_NUMBER3, Credit, CreditNumberSequence, Payment, PlannedInstallment
+
+# Поля кредиту, які змінює розрахунок платежу
+PAYMENT_CREDIT_FIELDS = ['ostatok', 'dolg_percent', 'closed', 'last_pay_date']
 
 def to_cents(x: float) -> int:
     """Перетворення у копійки"""
@@ -87,7 +93,7 @@ def process_payment(credit: Credit, pay, date_pay, delta_days) -> dict:
 
     # Оновлюємо дату останнього платежу
     credit.last_pay_date = date_pay
-    credit.save()
+    credit.save(update_fields=PAYMENT_CREDIT_FIELDS)
 
 
     result = {
@@ -101,4 +107,145 @@ def process_payment(credit: Credit, pay, date_pay, delta_days) -> dict:
         # "log": log,
     }
 
-    return result
\ No newline at end of file
+    return result
+
+
+def post_payment(credit_id, pay, date_pay) -> Payment:
+    """
+    Проводить платіж: в одній транзакції блокує рядок кредиту (select_for_update),
+    рахує розподіл від актуального last_pay_date і створює Payment.
+    Паралельні проведення по одному кредиту виконуються по черзі, по різних — одночасно.
+    """
+    from credit_system.checkpoints import checkpoints_between, save_checkpoints
+
+    with transaction.atomic():
+        credit = Credit.objects.select_for_update().get(pk=credit_id)
+        delta_days = (date_pay - credit.last_pay_date).days
+
+        # Кінці місяців до цього платежу фіксуємо зі станом до нього
+        save_checkpoints(checkpoints_between(
+            credit.pk, to_cents(credit.ostatok), to_cents(credit.dolg_percent),
+            credit.last_pay_date, credit.closed, date_pay,
+        ))
+
+        result = process_payment(credit, pay, date_pay, delta_days)
+
+        # У випадку, коли кредит закривається
+        # і сума платежу більше залишку кредиту - зменшуємо останній платіж:
+        if result['ost_payment'] > 0:
+            pay -= result['ost_payment']
+
+        payment = Payment(
+            credit=credit, pay=pay, date_pay=date_pay, dolg_percent=result["dolg_percent"],
+            ostatok=result["ostatok"], pog_credit=result["pog_credit"],
+            pog_summa_percent=result["pog_summa_percent"], summa_percent=result["summa_percent"],
+            ost_payment=result["ost_payment"],
+        )
+        # Версії сторінок кредиту і клієнта вже збільшив credit.save у process_payment
+        payment._page_cache_bumped = True
+        payment.save(force_insert=True)
+        return payment
+
+
+def percent_cents(ostatok: int, percent: float, delta_days: int) -> int:
+    """Нараховані відсотки в копійках з тим самим округленням, що й у process_payment (round(x, 2))."""
+    daily_percent = percent / 100
+    return to_cents(round(from_cents(ostatok) * daily_percent * delta_days, 2))
+
+
+def allocate_payment_cents(ostatok: int, dolg_percent: int, percent: float, pay: int, delta_days: int) -> dict:
+    """
+    Розподіл платежу так само, як у process_payment, але в цілих копійках і без звернення до БД.
+    ostatok, dolg_percent і pay — у копійках, percent — добова ставка у % (як Credit.percent).
+    Повертає ті самі ключі, що й process_payment, плюс "closed".
+    """
+    if delta_days < 0:
+        raise ValueError("Дата платежу не може бути раніше останньої дати платежу.")
+
+    summa_percent = percent_cents(ostatok, percent, delta_days)
+    total_summa = dolg_percent + summa_percent
+    pog_summa_percent = 0
+    pog_credit = 0
+    ost_payment = 0
+    closed = False
+
+    # Платіж менший, ніж відсотки
+    if pay < total_summa:
+        dolg_percent = total_summa - pay
+    else:
+        # 1. Гасимо борг по відсотках
+        ost_payment = pay - dolg_percent
+        dolg_percent = 0
+
+        # 2. Гасимо нараховані відсотки (як і в process_payment: при рівності погашено 0)
+        if ost_payment <= summa_percent:
+            pog_summa_percent = summa_percent - ost_payment
+            ost_payment = 0
+        else:
+            ost_payment -= summa_percent
+            pog_summa_percent = summa_percent
+
+        # 3. Якщо залишилось — гасимо тіло кредиту
+        if ost_payment > 0:
+            if ost_payment >= ostatok:
+                pog_credit = ostatok
+                ost_payment -= pog_credit
+                ostatok = 0
+                closed = True
+            else:
+                pog_credit = ost_payment
+                ostatok -= pog_credit
+                ost_payment = 0
+
+    return {
+        "summa_percent": summa_percent,
+        "pog_summa_percent": pog_summa_percent,
+        "dolg_percent": dolg_percent,
+        "pog_credit": pog_credit,
+        "ostatok": ostatok,
+        "ost_payment": ost_payment,
+        "closed": closed,
+    }
+
+
+def save_planned_installments(credit: Credit, grafik) -> list:
+    """Зберігає плановий графік кредиту (Grafik з rozrahunok_plan_pay) одним bulk_create."""
+    installments = [
+        PlannedInstallment(
+            credit=credit,
+            number=row["number"],
+            date_pay=row.date_pay,
+            delta_days=row["delta_days"],
+            payment=row["payment"],
+            summa_percent=row["summa_percent"],
+            pog_dolg_by_percents=row["pog_dolg_by_percents"],
+            pog_summa_percent=row["pog_summa_percent"],
+            dolg_percent=row["dolg_percent"],
+            pog_credit=row["pog_credit"],
+            ostatok=row["ostatok"],
+            total_dolg=row["total_dolg"],
+        )
+        for row in grafik
+    ]
+
+    return PlannedInstallment.objects.bulk_create(installments)
+
+
+def assign_credit_numbers(credits) -> list:
+    """
+    Номери для пачки нових кредитів (перед bulk_create): по одному резервуванню на кожну пару
+    (рік, постфікс), номери йдуть у порядку списку. Викликати в транзакції разом зі збереженням.
+    """
+    groups = defaultdict(list)
+    for credit in credits:
+        if credit.number1 is None:
+            groups[(credit.number2 or credit.start_date.year, credit.number3 or DEFAULT_NUMBER3)].append(credit)
+        else:
+            credit.fill_number()
+
+    for (year, number3), group in groups.items():
+        first = CreditNumberSequence.reserve(year, number3, count=len(group))
+        for number1, credit in enumerate(group, start=first):
+            credit.fill_number(number1=number1)
+
+    return credits
@@ -1,3 +1,1177 @@
-from django.test import TestCase
+import csv
+import io
+import json
+import logging
+import os
+import random
+import tempfile
+from unittest import mock
+from datetime import date, timedelta
+from decimal import Decimal
 
-# Create your tests here.
+import numpy as np
+
+from django.core.cache import caches
+from django.core.management import call_command
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management.base import CommandError
+from django.db import DatabaseError, IntegrityError, connection, transaction
+from django.db.migrations.loader import MigrationLoader
+from django.test import SimpleTestCase, TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from credit_system.plan_pay import (
+    rozrahunok_plan_pay, rozrahunok_payment, pidbir_plan_pay_newton, pidbir_plan_pay_bisection,
+    METHOD_BISECTION, get_payment_calendar, payment_calendar_cache_info, from_cents, to_cents, rozrahunok_offer_grid,
+)
+from credit_system.models import (
+    ClientSummary, CustomUser, Credit, CreditNumberSequence, Payment, InterestAccrual, AccrualRun, PortfolioDay,
+    PortfolioTotals,
+)
+from credit_system.batch_plan_pay import batch_rozrahunok_plan_pay
+from credit_system.fuzz import run_fuzz, first_row_divergence
+from credit_system.services import (
+    allocate_payment_cents, post_payment, percent_cents, process_payment, assign_credit_numbers,
+)
+from credit_system.accrual import accrued_percents, run_accrual
+from credit_system.payment_import import import_payments
+from credit_system.replay import replay_credits, replay_credit, replay_allocations, DERIVED_PAYMENT_FIELDS
+from credit_system.checkpoints import credit_state_as_of
+from credit_system.apps import ensure_search_index
+from credit_system.client_search import search_clients, install_search_index
+from credit_system.credit_search import search_credits
+from credit_system.pagination import keyset_page
+from credit_system.query_stats import QueryBudgetMixin
+from credit_system.portfolio import (
+    DAY_FIELDS as PORTFOLIO_DAY_FIELDS, TOTALS_FIELDS as PORTFOLIO_TOTALS_FIELDS, portfolio_days, portfolio_totals,
+    shard as portfolio_shard,
+)
+from credit_system.views import AllClientsView, PAYMENTS_PAGE_SIZE
+
+
+class PlanPaySolverTests(SimpleTestCase):
+    CASES = [
+        (1000, 0.0010, 18, date(2025, 11, 9), 15),
+        (10000, 0.0008, 12, date(2025, 1, 31), 31),
+        (25000, 0.0015, 60, date(2024, 2, 29), 29),
+        (12345.67, 0.0012, 36, date(2025, 12, 30), 30),
+    ]
+
+    def test_newton_matches_bisection(self):
+        for case in self.CASES:
+            with self.subTest(case=case):
+                self.assertEqual(pidbir_plan_pay_newton(*case), pidbir_plan_pay_bisection(*case))
+
+    def test_newton_pay_is_minimal(self):
+        for case in self.CASES:
+            with self.subTest(case=case):
+                pay = pidbir_plan_pay_newton(*case)
+                self.assertLessEqual(rozrahunok_payment(*case, pay), 0)
+                self.assertGreater(rozrahunok_payment(*case, pay - 1), 0)
+
+    def test_methods_give_same_schedule(self):
+        fast = rozrahunok_plan_pay(*self.CASES[0])
+        reference = rozrahunok_plan_pay(*self.CASES[0], method=METHOD_BISECTION)
+        self.assertEqual(fast, reference)
+
+    def test_unknown_method(self):
+        with self.assertRaises(ValueError):
+            rozrahunok_plan_pay(*self.CASES[0], method='secant')
+
+
+class GrafikTests(SimpleTestCase):
+    def test_rows_behave_like_dicts(self):
+        plan_pay, grafik, total_pays_sum, pereplata = rozrahunok_plan_pay(1000, 0.0010, 3, date(2025, 1, 31), 31)
+
+        self.assertEqual(len(grafik), 3)
+        row = grafik[-1]
+        self.assertEqual(row["number"], 3)
+        self.assertEqual(row["date_of_pay"], "30.04.2025")
+        self.assertEqual(row.date_pay, date(2025, 4, 30))
+        self.assertEqual(row["ostatok"], 0.0)
+        self.assertEqual(row.cents("payment"), int(round(row["payment"] * 100)))
+        with self.assertRaises(KeyError):
+            row["missing"]
+
+        rows = grafik.to_list()
+        self.assertEqual(list(rows[0]), list(grafik[0].keys()))
+        self.assertEqual(sum(r["payment"] for r in rows), sum(r["payment"] for r in grafik))
+
+
+class PaymentCalendarTests(SimpleTestCase):
+    def test_pay_day_clamped_to_month_end(self):
+        pay_calendar = get_payment_calendar(date(2025, 1, 31), 3, 31)
+        self.assertEqual(pay_calendar.dates, (date(2025, 2, 28), date(2025, 3, 31), date(2025, 4, 30)))
+        self.assertEqual(pay_calendar.delta_days, (28, 31, 30))
+
+    def test_calendar_is_shared(self):
+        first = get_payment_calendar(date(2025, 5, 1), 12, 10)
+        hits = payment_calendar_cache_info().hits
+        self.assertIs(get_payment_calendar("2025-05-01", 12, 10), first)
+        self.assertEqual(payment_calendar_cache_info().hits, hits + 1)
+
+    def test_long_calendars_not_cached(self):
+        size = payment_calendar_cache_info().currsize
+        long_calendar = get_payment_calendar(date(2025, 5, 1), 1200, 10)
+        self.assertEqual(len(long_calendar.dates), 1200)
+        self.assertIsNot(get_payment_calendar(date(2025, 5, 1), 1200, 10), long_calendar)
+        self.assertEqual(payment_calendar_cache_info().currsize, size)
+
+
+class BatchPlanPayTests(SimpleTestCase):
+    def test_batch_matches_scalar(self):
+        cases = PlanPaySolverTests.CASES + [(5000, 0.0015, 1, date(2025, 1, 30), 31)]
+        batch = batch_rozrahunok_plan_pay(*zip(*cases))
+
+        for i, case in enumerate(cases):
+            with self.subTest(case=case):
+                plan_pay, grafik, total_pays_sum, pereplata = rozrahunok_plan_pay(*case)
+                self.assertEqual(from_cents(int(batch.plan_pay[i])), plan_pay)
+                self.assertEqual(from_cents(int(batch.total_pays_sum[i])), total_pays_sum)
+                self.assertEqual(batch.grafik(i), grafik)
+
+    def test_high_daily_rate_matches_scalar(self):
+        # Переплачений залишок при таких ставках виходить за int64 — не має збивати підбір
+        cases = [(10000, 0.0082396, 183, date(2026, 6, 27), 24), (70545, 0.0175069, 206, date(2020, 9, 15), 9)]
+        batch = batch_rozrahunok_plan_pay(*zip(*cases), with_grafik=False)
+
+        for i, case in enumerate(cases):
+            with self.subTest(case=case):
+                self.assertEqual(from_cents(int(batch.plan_pay[i])), rozrahunok_plan_pay(*case)[0])
+
+
+class OfferGridTests(TestCase):
+    def test_grid_matches_single_quotes(self):
+        offers = rozrahunok_offer_grid(15000, date(2026, 1, 31), 31, range(1, 25), [0.0008, 0.0015])
+
+        self.assertEqual(len(offers), 48)
+        for offer in offers:
+            plan_pay, grafik, total_pays_sum, pereplata = rozrahunok_plan_pay(
+                15000, offer['daily_percent'], offer['srok'], date(2026, 1, 31), 31)
+            self.assertEqual((offer['plan_pay'], offer['total_pays_sum'], offer['pereplata']),
+                             (plan_pay, total_pays_sum, pereplata))
+
+    def test_endpoint_for_manager_only(self):
+        params = {'credit_sum': 20000, 'start_date': '2026-03-01', 'day_of_pay': 15, 'max_srok': 6}
+        client = CustomUser.objects.create_user('client', password='x', role='client')
+        manager = CustomUser.objects.create_user('manager', password='x', role='manager')
+
+        self.client.force_login(client)
+        self.assertEqual(self.client.get(reverse('offer_grid'), params).status_code, 403)
+
+        self.client.force_login(manager)
+        response = self.client.get(reverse('offer_grid'), params)
+        self.assertEqual(response.status_code, 200)
+        data = response.json()
+        self.assertEqual(len(data['offers']), 6 * len(data['percents']))
+        self.assertEqual({offer['percent'] for offer in data['offers']}, set(data['percents']))
+
+
+class PlannedInstallmentTests(TestCase):
+    def setUp(self):
+        self.client_user = CustomUser.objects.create_user('client', password='x', role='client')
+        self.manager = CustomUser.objects.create_user('manager', password='x', role='manager')
+
+    def test_term_is_capped(self):
+        self.client.force_login(self.manager)
+        response = self.client.post(reverse('add_new_credit', args=[self.client_user.pk]), {
+            'credit_sum': 12000, 'percent': '0.1', 'srok_months': 361,
+            'start_date': date.today().isoformat(), 'day_of_pay': 31, 'create_credit': '1',
+        })
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('srok_months', response.context['form'].errors)
+        self.assertFalse(Credit.objects.exists())
+
+    def test_schedule_saved_on_credit_creation(self):
+        start_date = date.today()
+        self.client.force_login(self.manager)
+        response = self.client.post(reverse('add_new_credit', args=[self.client_user.pk]), {
+            'credit_sum': 12000, 'percent': '0.1', 'srok_months': 12,
+            'start_date': start_date.isoformat(), 'day_of_pay': 31, 'create_credit': '1',
+        })
+
+        credit = Credit.objects.get()
+        self.assertRedirects(response, reverse('credit_detail', args=[credit.pk]))
+        plan_pay, grafik, total_pays_sum, pereplata = rozrahunok_plan_pay(12000, 0.001, 12, start_date, 31)
+
+        installments = list(credit.planned_installments.order_by('number'))
+        self.assertEqual(len(installments), 12)
+        self.assertEqual(installments[0].date_pay, get_payment_calendar(start_date, 12, 31).dates[0])
+        self.assertEqual([float(i.payment) for i in installments], [row['payment'] for row in grafik])
+        self.assertEqual(float(installments[-1].ostatok), 0)
+
+        response = self.client.get(reverse('credit_detail', args=[credit.pk]))
+        self.assertEqual(list(response.context['planned_installments']), installments)
+
+        # Чужий клієнт не бачить графіка
+        CustomUser.objects.create_user('other', password='x', role='client')
+        self.client.login(username='other', password='x')
+        response = self.client.get(reverse('credit_detail', args=[credit.pk]))
+        self.assertNotContains(response, 'Плановий графік')
+
+        self.client.force_login(self.client_user)
+        response = self.client.get(reverse('user_credits_list'))
+        listed = response.context['credits'][0]
+        self.assertEqual((listed.next_pay_date, listed.next_payment), (installments[0].date_pay, installments[0].payment))
+        self.assertContains(response, f"до {installments[0].date_pay:%d.%m.%Y}")
+
+
+class BenchmarkCommandTests(TestCase):
+    def test_baseline_and_regression(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            baseline_path = os.path.join(tmp, 'baseline.json')
+            call_command('bench_credit_engine', iterations=3, filter='payment_short',
+                         save_baseline=baseline_path, stdout=open(os.devnull, 'w'))
+
+            with open(baseline_path, encoding='utf-8') as f:
+                baseline = json.load(f)
+            self.assertEqual(set(baseline), {'rozrahunok_payment_short'})
+            self.assertEqual(set(baseline['rozrahunok_payment_short']), {'ops_per_sec', 'p50_ms', 'p99_ms', 'iterations'})
+
+            # Базовий рівень у 1000 разів швидший — має бути регресія
+            baseline['rozrahunok_payment_short']['ops_per_sec'] *= 1000
+            with open(baseline_path, 'w', encoding='utf-8') as f:
+                json.dump(baseline, f)
+            with self.assertRaises(CommandError):
+                call_command('bench_credit_engine', iterations=3, filter='payment_short',
+                             baseline=baseline_path, stdout=open(os.devnull, 'w'))
+
+
+class FuzzHarnessTests(TestCase):
+    def test_fast_engines_match_reference(self):
+        results = run_fuzz(seed=11, credits=40)
+        self.assertEqual(set(results), {'newton', 'iter_grafik', 'batch', 'allocate_payment_cents'})
+        for engine, result in results.items():
+            with self.subTest(engine=engine):
+                self.assertEqual(result['divergences'], 0, result['first_divergence'])
+                self.assertGreater(result['rows'], 0)
+        self.assertFalse(Credit.objects.exists())
+
+    def test_allocate_payment_cents_overpayment(self):
+        # Платіж більший за залишок: кредит закрито, переплата повертається в ost_payment
+        result = allocate_payment_cents(ostatok=100_00, dolg_percent=50, percent=0.1, pay=200_00, delta_days=10)
+        self.assertEqual(result['summa_percent'], 100)
+        self.assertEqual(result['pog_credit'], 100_00)
+        self.assertEqual(result['ost_payment'], 200_00 - 50 - 100 - 100_00)
+        self.assertEqual((result['ostatok'], result['closed']), (0, True))
+
+        # Платіж менший за відсотки: усе йде в борг по %
+        result = allocate_payment_cents(ostatok=100_00, dolg_percent=0, percent=0.1, pay=30, delta_days=10)
+        self.assertEqual((result['dolg_percent'], result['ostatok'], result['closed']), (70, 100_00, False))
+
+    def test_first_row_divergence(self):
+        rows = rozrahunok_plan_pay(*PlanPaySolverTests.CASES[0])[1].to_list()
+        changed = [dict(row) for row in rows]
+        changed[4]['ostatok'] += 0.01
+        divergence = first_row_divergence('test', None, rows, changed)
+        self.assertEqual((divergence['row'], divergence['field']), (5, 'ostatok'))
+        self.assertIsNone(first_row_divergence('test', None, rows, rows))
+
+
+class PostPaymentTests(TestCase):
+    def setUp(self):
+        self.client_user = CustomUser.objects.create_user('client', password='x', role='client')
+        self.manager = CustomUser.objects.create_user('manager', password='x', role='manager')
+        self.credit = Credit.objects.create(
+            user=self.client_user, summa_credit=10000, percent=0.1, start_date=date(2025, 1, 10),
+            srok_months=12, day_of_pay=10, ostatok=10000, plan_pay=1000,
+        )
+
+    def test_payment_posted_and_only_state_fields_written(self):
+        with CaptureQueriesContext(connection) as queries:
+            payment = post_payment(self.credit.pk, 1000, date(2025, 2, 10))
+
+        update = next(q['sql'] for q in queries if q['sql'].startswith('UPDATE'))
+        self.assertNotIn('summa_credit', update)
+        self.assertIn('ostatok', update)
+
+        self.credit.refresh_from_db()
+        self.assertEqual(self.credit.last_pay_date, date(2025, 2, 10))
+        self.assertEqual(float(payment.summa_percent), 310)
+        self.assertEqual(self.credit.ostatok, 10000 - 690)
+
+    def test_back_dated_payment_rejected(self):
+        post_payment(self.credit.pk, 1000, date(2025, 2, 10))
+        with self.assertRaises(ValueError):
+            post_payment(self.credit.pk, 1000, date(2025, 2, 1))
+        self.assertEqual(self.credit.payments.count(), 1)
+
+    def test_view_posts_payment(self):
+        self.client.force_login(self.manager)
+        response = self.client.post(reverse('add_payment', args=[self.credit.pk]), {
+            'pay': 20000, 'date_pay': '2025-02-10', 'last_pay_date': '2025-01-10',
+        })
+        self.assertRedirects(response, reverse('credit_detail', args=[self.credit.pk]))
+
+        payment = self.credit.payments.get()
+        self.credit.refresh_from_db()
+        self.assertTrue(self.credit.closed)
+        # Переплата на останньому платежі зменшує сам платіж
+        self.assertEqual(float(payment.pay), 10000 + 310)
+
+
+class PaymentImportTests(TestCase):
+    PAYMENT_FIELDS = ('date_pay', 'pay', 'summa_percent', 'pog_summa_percent', 'dolg_percent', 'pog_credit',
+                      'ostatok', 'ost_payment')
+
+    def setUp(self):
+        self.client_user = CustomUser.objects.create_user('client', password='x', role='client')
+        self.manager = CustomUser.objects.create_user('manager', password='x', role='manager')
+        self.credit, self.twin = [
+            Credit.objects.create(
+                user=self.client_user, summa_credit=5000, percent=0.12, start_date=date(2025, 1, 31),
+                srok_months=6, day_of_pay=31, ostatok=5000, plan_pay=1000,
+            )
+            for _ in range(2)
+        ]
+
+    def test_import_matches_post_payment(self):
+        rows = [('2025-03-31', '1000'), ('2025-02-28', '150,25'), ('2025-04-30', '9000')]
+        lines = ['credit_number,date_pay,pay\n'] + [f'{self.credit.number},{d},"{p}"\n' for d, p in rows]
+
+        report = import_payments(lines)
+        self.assertEqual((report.imported, report.credits, report.errors), (3, 1, []))
+
+        for date_pay, pay in sorted(rows):
+            post_payment(self.twin.pk, float(pay.replace(',', '.')), date.fromisoformat(date_pay))
+
+        imported = list(self.credit.payments.order_by('date_pay').values_list(*self.PAYMENT_FIELDS))
+        posted = list(self.twin.payments.order_by('date_pay').values_list(*self.PAYMENT_FIELDS))
+        self.assertEqual(imported, posted)
+
+        self.credit.refresh_from_db()
+        self.twin.refresh_from_db()
+        for field in ('ostatok', 'dolg_percent', 'closed', 'last_pay_date'):
+            self.assertEqual(getattr(self.credit, field), getattr(self.twin, field))
+        self.assertTrue(self.credit.closed)
+
+    def test_row_errors_do_not_abort_import(self):
+        lines = [
+            'credit_id;date_pay;pay\n',
+            f'{self.credit.pk};2025-02-28;500\n',
+            f'{self.credit.pk};31.13.2025;500\n',
+            f'{self.credit.pk};2025-03-31;-5\n',
+            f'999999;2025-03-31;500\n',
+            f'{self.twin.pk};2025-01-01;500\n',
+        ]
+        report = import_payments(lines)
+        self.assertEqual(report.imported, 1)
+        self.assertEqual([line for line, message in report.sorted_errors], [3, 4, 5, 6])
+        self.assertEqual(self.credit.payments.count(), 1)
+        self.assertFalse(self.twin.payments.exists())
+
+    def test_non_finite_and_oversized_amounts_are_row_errors(self):
+        lines = ['credit_id,date_pay,pay\n'] + [
+            f'{self.credit.pk},2025-02-28,{pay}\n' for pay in ('nan', 'inf', '-Infinity', '1e999999999', '100000000')
+        ] + [f'{self.credit.pk},2025-02-28,500\n']
+        report = import_payments(lines)
+        self.assertEqual(report.imported, 1)
+        self.assertEqual([line for line, message in report.sorted_errors], [2, 3, 4, 5, 6])
+
+    def test_failed_chunk_reports_each_row_once(self):
+        lines = [
+            'credit_id,date_pay,pay\n',
+            f'{self.twin.pk},2025-02-28,500\n',
+            f'{self.twin.pk},2025-01-01,500\n',
+        ]
+        with mock.patch.object(Payment.objects, 'bulk_create', side_effect=DatabaseError('disk full')):
+            report = import_payments(lines)
+        self.assertEqual(report.imported, 0)
+        self.assertEqual([line for line, message in report.sorted_errors], [2, 3])
+        self.assertTrue(all('disk full' in message for line, message in report.errors))
+
+    def test_upload_page(self):
+        statement = SimpleUploadedFile('statement.csv', f'credit_id,date_pay,pay\n{self.credit.pk},2025-02-28,500\n'.encode())
+
+        self.client.force_login(self.client_user)
+        self.assertEqual(self.client.get(reverse('import_payments')).status_code, 403)
+
+        self.client.force_login(self.manager)
+        response = self.client.post(reverse('import_payments'), {'statement': statement})
+        self.assertEqual(response.context['report'].imported, 1)
+        self.assertEqual(self.credit.payments.count(), 1)
+
+    def test_upload_with_line_breaks_inside_quoted_fields(self):
+        # Виписка з Excel: рядки через CRLF, у примітці — переноси рядка всередині лапок
+        statement = SimpleUploadedFile('statement.csv', (
+            'credit_id;date_pay;pay;note\r\n'
+            f'{self.credit.pk};2025-02-28;500;"Оплата\r\nчерез\rкасу"\r\n'
+            f'{self.twin.pk};2025-02-28;700;\r\n'
+        ).encode('utf-8-sig'))
+
+        received = []
+
+        def read_statement(lines):
+            received.extend(lines)
+            return import_payments(received)
+
+        self.client.force_login(self.manager)
+        with mock.patch('credit_system.views.import_payments', side_effect=read_statement):
+            response = self.client.post(reverse('import_payments'), {'statement': statement})
+        self.assertEqual(response.context['report'].errors, [])
+        self.assertEqual(response.context['report'].imported, 2)
+        self.assertEqual(self.twin.payments.get().pay, 700)
+        # Файл читається без перекодування переносів — примітку csv бачить такою, як її записав Excel
+        self.assertEqual(next(csv.reader(received[1:], delimiter=';'))[3], 'Оплата\r\nчерез\rкасу')
+
+
+class LedgerReplayTests(TestCase):
+    FIELDS = ('ostatok', 'dolg_percent', 'closed', 'last_pay_date')
+
+    def setUp(self):
+        self.client_user = CustomUser.objects.create_user('client', password='x', role='client')
+        self.credits = []
+        for summa in (3000, 8000, 12000):
+            credit = Credit.objects.create(
+                user=self.client_user, summa_credit=summa, percent=0.15, start_date=date(2025, 1, 30),
+                srok_months=6, day_of_pay=30, ostatok=summa, plan_pay=summa / 5,
+            )
+            for date_pay, pay in ((date(2025, 2, 28), 100), (date(2025, 3, 30), summa / 4), (date(2025, 5, 2), 5000)):
+                post_payment(credit.pk, pay, date_pay)
+            self.credits.append(credit)
+
+    def snapshot(self):
+        credits = list(Credit.objects.order_by('pk').values_list(*self.FIELDS))
+        payments = list(Payment.objects.order_by('pk').values_list(*DERIVED_PAYMENT_FIELDS))
+        return credits, payments
+
+    def test_replay_restores_state(self):
+        expected = self.snapshot()
+        self.assertEqual(replay_credits([c.pk for c in self.credits])['changed_payments'], 0)
+
+        Credit.objects.update(ostatok=1, dolg_percent=2, closed=True)
+        Payment.objects.filter(credit=self.credits[0]).update(summa_percent=0, pog_credit=0)
+
+        stats = replay_credits([c.pk for c in self.credits], workers=2, chunk_size=2)
+        self.assertEqual((stats['credits'], stats['changed_credits'], stats['changed_payments']), (3, 3, 3))
+        self.assertEqual(self.snapshot(), expected)
+
+    def test_deleted_and_back_dated_payments(self):
+        credit = self.credits[1]
+        payments = list(credit.payments.order_by('date_pay'))
+
+        # Видалення першого платежу
+        payments[0].delete()
+        replay_credit(credit.pk)
+        credit.refresh_from_db()
+        self.assertEqual(credit.last_pay_date, date(2025, 5, 2))
+
+        # Ті ж платежі, проведені з нуля на новому кредиті, дають той самий стан
+        twin = Credit.objects.create(
+            user=self.client_user, summa_credit=8000, percent=0.15, start_date=date(2025, 1, 30),
+            srok_months=6, day_of_pay=30, ostatok=8000, plan_pay=1600,
+        )
+        for payment in payments[1:]:
+            post_payment(twin.pk, float(payment.pay + payment.ost_payment), payment.date_pay)
+        twin.refresh_from_db()
+        self.assertEqual([getattr(credit, f) for f in self.FIELDS], [getattr(twin, f) for f in self.FIELDS])
+
+        # Платіж перенесено на пізнішу дату
+        Payment.objects.filter(pk=payments[1].pk).update(date_pay=date(2025, 6, 1))
+        replay_credit(credit.pk)
+        credit.refresh_from_db()
+        self.assertEqual(credit.last_pay_date, date(2025, 6, 1))
+        self.assertEqual(list(credit.payments.order_by('date_pay').values_list('pk', flat=True)),
+                         [payments[2].pk, payments[1].pk])
+
+
+class InterestAccrualTests(TestCase):
+    def setUp(self):
+        self.client_user = CustomUser.objects.create_user('client', password='x', role='client')
+        self.credits = [
+            Credit.objects.create(
+                user=self.client_user, summa_credit=summa, percent=0.12, start_date=date(2025, 1, 31),
+                srok_months=12, day_of_pay=31, ostatok=summa, plan_pay=summa / 10,
+            )
+            for summa in (1000, 2500.55, 40000)
+        ]
+        post_payment(self.credits[1].pk, 100, date(2025, 2, 28))
+        Credit.objects.filter(pk=self.credits[2].pk).update(closed=True)
+
+    def test_vectorized_percents_match_process_payment_rounding(self):
+        rng = random.Random(7)
+        ostatok = np.array([rng.randint(1, 50_000_000) for _ in range(5000)])
+        percent = np.array([rng.choice((0.08, 0.1, 0.12, 0.15, 0.33)) for _ in range(5000)])
+        days = np.array([rng.randint(0, 400) for _ in range(5000)])
+        expected = [percent_cents(int(o), float(p), int(d)) for o, p, d in zip(ostatok, percent, days)]
+        self.assertEqual(accrued_percents(ostatok, percent, days).tolist(), expected)
+
+    def test_accrual_snapshots_for_open_credits(self):
+        call_command('accrue_interest', date='2025-03-31', stdout=open(os.devnull, 'w'))
+
+        accruals = {a.credit_id: a for a in InterestAccrual.objects.filter(accrual_date=date(2025, 3, 31))}
+        self.assertEqual(set(accruals), {self.credits[0].pk, self.credits[1].pk})
+        self.assertEqual((accruals[self.credits[0].pk].days, float(accruals[self.credits[0].pk].summa_percent)), (59, 70.8))
+
+        # Те саме нарахування, що й при платежі на цю дату
+        credit = Credit.objects.get(pk=self.credits[1].pk)
+        result = process_payment(credit, 0.01, date(2025, 3, 31), 31)
+        self.assertEqual(float(accruals[credit.pk].summa_percent), result['summa_percent'])
+
+    def test_detail_page_hides_snapshot_older_than_last_payment(self):
+        manager = CustomUser.objects.create_user('manager', password='x', role='manager')
+        self.client.force_login(manager)
+        run_accrual(date(2025, 3, 31))
+        url = reverse('credit_detail', args=[self.credits[0].pk])
+        self.assertEqual(self.client.get(url).context['accrual'].accrual_date, date(2025, 3, 31))
+
+        # Платіж тим самим днем після нічного знімка — знімок уже застарів
+        post_payment(self.credits[0].pk, 100, date(2025, 3, 31))
+        self.assertIsNone(self.client.get(url).context['accrual'])
+        run_accrual(date(2025, 3, 31), restart=True)
+        self.assertEqual(self.client.get(url).context['accrual'].days, 0)
+
+        post_payment(self.credits[0].pk, 100, date(2025, 4, 10))
+        self.assertIsNone(self.client.get(url).context['accrual'])
+
+    def test_interrupted_run_resumes(self):
+        # Перший кредит уже оброблено перерваним запуском
+        AccrualRun.objects.create(accrual_date=date(2025, 3, 31), last_credit_id=self.credits[0].pk, credits=1)
+        run = run_accrual(date(2025, 3, 31), chunk_size=1)
+        self.assertEqual(run.credits, 2)
+        self.assertIsNotNone(run.finished_at)
+        self.assertEqual(list(InterestAccrual.objects.values_list('credit_id', flat=True)), [self.credits[1].pk])
+
+        # Повторний запуск з початку оновлює знімки, а не дублює їх
+        run_accrual(date(2025, 3, 31), restart=True)
+        run_accrual(date(2025, 3, 31), restart=True)
+        self.assertEqual(InterestAccrual.objects.count(), 2)
+
+
+class BalanceCheckpointTests(TestCase):
+    PAYMENTS = [(date(2025, 2, 14), 900), (date(2025, 2, 28), 50), (date(2025, 6, 15), 1200), (date(2025, 7, 31), 900)]
+
+    def setUp(self):
+        self.client_user = CustomUser.objects.create_user('client', password='x', role='client')
+        self.credit = Credit.objects.create(
+            user=self.client_user, summa_credit=6000, percent=0.1, start_date=date(2025, 1, 20),
+            srok_months=8, day_of_pay=15, ostatok=6000, plan_pay=900,
+        )
+        for date_pay, pay in self.PAYMENTS:
+            post_payment(self.credit.pk, pay, date_pay)
+
+    def reference_state(self, as_of):
+        """Стан з нуля: усі платежі до as_of через той самий розподіл."""
+        payments = [(i, d, to_cents(p)) for i, (d, p) in enumerate(self.PAYMENTS) if d <= as_of]
+        rows, state = replay_allocations(self.credit.summa_credit, self.credit.percent, self.credit.start_date, payments)
+        return from_cents(state['ostatok']), from_cents(state['dolg_percent']), state['last_pay_date']
+
+    def test_checkpoints_written_on_posting(self):
+        self.assertEqual(
+            list(self.credit.checkpoints.order_by('checkpoint_date').values_list('checkpoint_date', 'last_pay_date')),
+            [(date(2025, 1, 31), date(2025, 1, 20)), (date(2025, 2, 28), date(2025, 2, 28)),
+             (date(2025, 3, 31), date(2025, 2, 28)), (date(2025, 4, 30), date(2025, 2, 28)),
+             (date(2025, 5, 31), date(2025, 2, 28)), (date(2025, 6, 30), date(2025, 6, 15))],
+        )
+
+    def test_state_as_of_matches_full_replay(self):
+        for as_of in (date(2025, 1, 20), date(2025, 2, 14), date(2025, 2, 20), date(2025, 4, 1),
+                      date(2025, 6, 30), date(2025, 7, 31), date(2025, 9, 1)):
+            with self.subTest(as_of=as_of):
+                with self.assertNumQueries(2):
+                    state = credit_state_as_of(self.credit, as_of)
+                self.assertEqual((state['ostatok'], state['dolg_percent'], state['last_pay_date']),
+                                 self.reference_state(as_of))
+
+        state = credit_state_as_of(self.credit, date(2025, 4, 10))
+        self.assertEqual(state['checkpoint_date'], date(2025, 3, 31))
+        self.assertEqual(state['summa_percent'], from_cents(percent_cents(to_cents(state['ostatok']), 0.1, 41)))
+
+    def test_replay_rebuilds_checkpoints(self):
+        self.credit.payments.get(date_pay=date(2025, 2, 28)).delete()
+        replay_credit(self.credit.pk)
+        self.assertEqual(self.credit.checkpoints.get(checkpoint_date=date(2025, 4, 30)).last_pay_date,
+                         date(2025, 2, 14))
+        self.PAYMENTS = [p for p in self.PAYMENTS if p[0] != date(2025, 2, 28)]
+        state = credit_state_as_of(self.credit, date(2025, 5, 1))
+        self.assertEqual((state['ostatok'], state['dolg_percent'], state['last_pay_date']),
+                         self.reference_state(date(2025, 5, 1)))
+
+
+class CreditNumberSequenceTests(TestCase):
+    def setUp(self):
+        self.client_user = CustomUser.objects.create_user('client', password='x', role='client')
+
+    def new_credit(self, start_date, **kwargs):
+        return Credit(user=self.client_user, summa_credit=1000, percent=0.1, start_date=start_date,
+                      srok_months=6, ostatok=1000, plan_pay=200, **kwargs)
+
+    def test_numbers_per_year_and_postfix(self):
+        numbers = []
+        for start_date, number3 in [(date(2025, 1, 5), ''), (date(2025, 3, 1), ''), (date(2026, 1, 2), ''),
+                                    (date(2025, 4, 1), 'Kyiv')]:
+            credit = self.new_credit(start_date, number3=number3)
+            credit.save()
+            numbers.append(credit.number)
+
+        self.assertEqual(numbers, ['0001/2025-Credit', '0002/2025-Credit', '0001/2026-Credit', '0001/2025-Kyiv'])
+        self.assertEqual(CreditNumberSequence.objects.get(year=2025, number3='Credit').last_number, 2)
+
+    def test_number_allocation_does_not_scan_credits(self):
+        self.new_credit(date(2025, 1, 5)).save()
+        credit = self.new_credit(date(2025, 2, 5))
+        with CaptureQueriesContext(connection) as queries:
+            credit.save()
+        self.assertFalse([q for q in queries if 'MAX(' in q['sql'].upper()])
+        self.assertEqual(credit.number1, 2)
+
+    def test_failed_insert_rolls_back_counter(self):
+        self.new_credit(date(2025, 1, 5)).save()
+        with self.assertRaises(IntegrityError):
+            self.new_credit(date(2025, 2, 5), number1=1).save()
+        self.assertEqual(CreditNumberSequence.objects.get(year=2025).last_number, 1)
+
+    def test_bulk_reservation(self):
+        self.new_credit(date(2025, 1, 5)).save()
+        credits = [self.new_credit(date(2025, 2, 1)) for _ in range(3)] + [self.new_credit(date(2026, 2, 1))]
+        with transaction.atomic():
+            Credit.objects.bulk_create(assign_credit_numbers(credits))
+
+        self.assertEqual([c.number for c in credits],
+                         ['0002/2025-Credit', '0003/2025-Credit', '0004/2025-Credit', '0001/2026-Credit'])
+        self.assertEqual(credits[0].last_pay_date, date(2025, 2, 1))
+        self.assertEqual(CreditNumberSequence.reserve(2025), 5)
+        with self.assertRaises(ValueError):
+            CreditNumberSequence.reserve(2025, count=0)
+
+
+class ClientSearchTests(TestCase):
+    def setUp(self):
+        self.manager = CustomUser.objects.create_user('manager', password='x', role='manager')
+        self.ivanenko = CustomUser.objects.create_user(
+            'ivanenko', role='client', last_name='Іваненко', first_name='Петро', middle_name='Ігорович',
+            IPN='3012345678', phone_number='+38 (067) 123-45-67', address='м. Київ, вул. Лук’янівська 5',
+            passport_series='НК', passport_number='123456',
+        )
+        self.petrenko = CustomUser.objects.create_user(
+            'petrenko', role='client', last_name='Петренко', first_name='Олена', IPN='3098765432',
+            passport_number='987654321', address_residential='Львів',
+        )
+
+    def search(self, query):
+        return set(search_clients(CustomUser.objects.filter(role='client'), query).values_list('username', flat=True))
+
+    def test_full_text_search(self):
+        self.assertEqual(self.search('іваненко'), {'ivanenko'})
+        self.assertEqual(self.search('ПЕТР'), {'ivanenko', 'petrenko'})
+        self.assertEqual(self.search('Петро Київ'), {'ivanenko'})
+        self.assertEqual(self.search("лук'янівська"), {'ivanenko'})
+        self.assertEqual(self.search('0671234567'), {'ivanenko'})
+        self.assertEqual(self.search('м.'), {'ivanenko'})
+        self.assertEqual(self.search('"'), set())
+
+    def test_exact_lookups(self):
+        for query, expected in [('3012345678', {'ivanenko'}), ('нк 123456', {'ivanenko'}), ('3012345679', set())]:
+            with self.subTest(query=query):
+                with CaptureQueriesContext(connection) as queries:
+                    self.assertEqual(self.search(query), expected)
+                self.assertNotIn('LIKE', queries[0]['sql'])
+
+    def test_nine_digits_search_id_card_and_text(self):
+        self.assertEqual(self.search('987654321'), {'petrenko'})
+        # 9 цифр телефону чи ІПН знаходяться так само, як і номер ID-картки
+        self.assertEqual(self.search('671234567'), {'ivanenko'})
+        self.assertEqual(self.search('012345678'), {'ivanenko'})
+
+    def test_index_follows_saves_and_deletes(self):
+        self.petrenko.last_name = 'Коваль'
+        self.petrenko.save(update_fields=['last_name'])
+        self.assertEqual(self.search('коваль'), {'petrenko'})
+        self.assertEqual(self.search('петренко'), set())
+
+        self.ivanenko.delete()
+        self.assertEqual(self.search('петр'), set())
+
+        # Повторне встановлення нічого не ламає
+        install_search_index(connection)
+        self.assertEqual(self.search('коваль'), {'petrenko'})
+
+    def test_post_migrate_skips_index_before_search_column(self):
+        # Стан моделей до 0022_client_search (відкат міграцій): search_text ще немає
+        state = MigrationLoader(connection).project_state(('credit_system', '0021_credit_number_sequence'))
+        with mock.patch('credit_system.client_search.install_search_index') as install:
+            ensure_search_index(using=connection.alias, apps=state.apps)
+        install.assert_not_called()
+
+    def test_view_uses_search(self):
+        self.client.force_login(self.manager)
+        response = self.client.get(reverse('all_clients_list'), {'q': 'Львів'})
+        self.assertEqual([client.username for client in response.context['clients']], ['petrenko'])
+
+
+class CreditSearchTests(TestCase):
+    def setUp(self):
+        self.manager = CustomUser.objects.create_user('manager', password='x', role='manager')
+        self.client_user = CustomUser.objects.create_user('client', role='client', last_name='Іваненко',
+                                                          IPN='3012345678')
+        self.credits = {}
+        for start_date, number3 in [(date(2024, 5, 1), ''), (date(2025, 1, 5), ''), (date(2025, 2, 5), ''),
+                                    (date(2025, 3, 5), 'Kyiv')]:
+            credit = Credit.objects.create(
+                user=self.client_user, summa_credit=1000, percent=0.1, start_date=start_date, srok_months=6,
+                ostatok=1000, plan_pay=200, number3=number3,
+            )
+            self.credits[credit.number] = credit
+
+    def search(self, query):
+        return sorted(search_credits(Credit.objects.all(), query).values_list('number', flat=True))
+
+    def test_structured_number_lookups(self):
+        for query, expected in [
+            ('0002/2025', ['0002/2025-Credit']),
+            ('2/25', ['0002/2025-Credit']),
+            (' №0001 / 2025 ', ['0001/2025-Credit', '0001/2025-Kyiv']),
+            ('0001/2025-kyiv', ['0001/2025-Kyiv']),
+            ('3012345678', sorted(self.credits)),
+            ('0003/2025', []),
+        ]:
+            with self.subTest(query=query):
+                with CaptureQueriesContext(connection) as queries:
+                    self.assertEqual(self.search(query), expected)
+                self.assertNotIn('LIKE', queries[0]['sql'].split('"number3"')[0])
+
+    def test_bare_number_also_searches_substrings(self):
+        self.assertEqual(self.search('0001'), ['0001/2024-Credit', '0001/2025-Credit', '0001/2025-Kyiv'])
+        self.assertEqual(self.search('2025'), sorted(number for number in self.credits if '/2025-' in number))
+        self.assertEqual(self.search('30123'), sorted(self.credits))
+
+    def test_free_text_falls_back_to_substring_search(self):
+        self.assertEqual(self.search('Kyiv'), ['0001/2025-Kyiv'])
+        self.assertEqual(len(self.search('Іванен')), 4)
+
+    def test_view_uses_number_search(self):
+        self.client.force_login(self.manager)
+        response = self.client.get(reverse('all_credits_list'), {'q': '2/2025'})
+        self.assertEqual([credit.number for credit in response.context['credits']], ['0002/2025-Credit'])
+
+
+class KeysetPaginationTests(TestCase):
+    ORDERING = ('closed', '-start_date', 'id')
+
+    def setUp(self):
+        self.manager = CustomUser.objects.create_user('manager', password='x', role='manager')
+        self.client_user = CustomUser.objects.create_user('client', password='x', role='client', last_name='Іваненко')
+        other = CustomUser.objects.create_user('other', role='client', last_name='Петренко')
+        rng = random.Random(7)
+        # Багато однакових дат і статусів — перевіряємо розв'язання нічиїх по id
+        for i in range(23):
+            Credit.objects.create(
+                user=self.client_user if i % 3 else other, summa_credit=1000, percent=0.1,
+                start_date=date(2025, rng.randint(1, 3), rng.choice([1, 15])), srok_months=6,
+                ostatok=1000, plan_pay=200, closed=rng.random() < 0.3,
+            )
+        self.expected = list(Credit.objects.order_by(*self.ORDERING).values_list('pk', flat=True))
+
+    def walk(self, queryset, page_size):
+        pages, cursor = [], None
+        while True:
+            page = keyset_page(queryset, self.ORDERING, page_size, cursor)
+            pages.append(page)
+            if not page.has_next():
+                return pages
+            cursor = page.next_cursor
+
+    def test_forward_and_backward_walks_cover_ordering(self):
+        pages = self.walk(Credit.objects.all(), 5)
+        self.assertEqual([credit.pk for page in pages for credit in page], self.expected)
+        self.assertFalse(pages[0].has_previous())
+
+        backward, page = [], pages[-1]
+        while page.has_previous():
+            page = keyset_page(Credit.objects.all(), self.ORDERING, 5, page.previous_cursor)
+            backward.append([credit.pk for credit in page])
+        self.assertEqual(backward[::-1], [[credit.pk for credit in page] for page in pages[:-1]])
+
+    def test_views_page_with_search_in_constant_queries(self):
+        self.client.force_login(self.manager)
+        url, params, seen = reverse('all_credits_list'), {'q': 'Іваненко'}, []
+        expected = list(Credit.objects.filter(user=self.client_user).order_by(*self.ORDERING)
+                        .values_list('pk', flat=True))
+        with self.settings(DEBUG=True):
+            while True:
+                with CaptureQueriesContext(connection) as queries:
+                    response = self.client.get(url, params)
+                seen += [credit.pk for credit in response.context['credits']]
+                self.assertLessEqual(len(queries), 5)
+                page = response.context['page_obj']
+                if not page.has_next():
+                    break
+                self.assertIn('q=', response.context['page_query'])
+                params = {'q': 'Іваненко', 'cursor': page.next_cursor}
+        self.assertEqual(seen, expected)
+
+        self.client.force_login(self.client_user)
+        response = self.client.get(reverse('user_credits_list'))
+        self.assertEqual([credit.pk for credit in response.context['credits']], expected)
+        self.assertFalse(response.context['is_paginated'])
+
+    def test_clients_list_and_bad_cursor(self):
+        self.client.force_login(self.manager)
+        response = self.client.get(reverse('all_clients_list'))
+        self.assertEqual([client.username for client in response.context['clients']], ['other', 'client'])
+        self.assertEqual(self.client.get(reverse('all_clients_list'), {'cursor': 'zzz'}).status_code, 404)
+
+
+class PageCacheTests(TestCase):
+    def setUp(self):
+        caches['pages'].clear()
+        self.manager = CustomUser.objects.create_user('manager', password='x', role='manager')
+        self.client_user = CustomUser.objects.create_user('client', password='x', role='client')
+        self.credit = Credit.objects.create(
+            user=self.client_user, summa_credit=10000, percent=0.1, start_date=date(2025, 1, 10),
+            srok_months=12, day_of_pay=10, ostatok=10000, plan_pay=1000,
+        )
+        post_payment(self.credit.pk, 1000, date(2025, 2, 10))
+        self.client.force_login(self.manager)
+
+    def get_credit_page(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse('credit_detail', args=[self.credit.pk]))
+        payment_queries = [q for q in queries if 'FROM "credit_system_payment"' in q['sql']]
+        return response.content.decode(), payment_queries
+
+    def test_credit_tables_cached_until_payment_changes(self):
+        content, payment_queries = self.get_credit_page()
+        self.assertIn('10.02.2025', content)
+        self.assertTrue(payment_queries)
+
+        content, payment_queries = self.get_credit_page()
+        self.assertIn('10.02.2025', content)
+        self.assertEqual(payment_queries, [])
+
+        payment = post_payment(self.credit.pk, 1000, date(2025, 3, 10))
+        content, payment_queries = self.get_credit_page()
+        self.assertIn('10.03.2025', content)
+
+        # Як в адмін-панелі: видалення платежу і перерахунок кредиту
+        payment.delete()
+        replay_credit(self.credit.pk)
+        content, payment_queries = self.get_credit_page()
+        self.assertNotIn('10.03.2025', content)
+
+        import_payments(['credit_id,date_pay,pay\n', f'{self.credit.pk},2025-04-10,500\n'])
+        content, payment_queries = self.get_credit_page()
+        self.assertIn('10.04.2025', content)
+
+    def test_client_table_follows_credit_changes(self):
+        url = reverse('client_detail', args=[self.client_user.pk])
+        self.assertContains(self.client.get(url), '9310.0 грн')
+
+        self.credit.ostatok = 5000
+        self.credit.save()
+        self.assertContains(self.client.get(url), '5000.0 грн')
+
+    def test_client_table_drops_deleted_credit_without_payments(self):
+        credit = Credit.objects.create(
+            user=self.client_user, summa_credit=3000, percent=0.1, start_date=date(2025, 5, 1), srok_months=3,
+            day_of_pay=1, ostatok=3000, plan_pay=1000,
+        )
+        url = reverse('client_detail', args=[self.client_user.pk])
+        self.assertContains(self.client.get(url), credit.number)
+
+        credit.delete()
+        self.assertNotContains(self.client.get(url), credit.number)
+
+    def test_posting_payment_bumps_versions_once(self):
+        version = Credit.objects.get(pk=self.credit.pk).cache_version
+        with CaptureQueriesContext(connection) as queries:
+            post_payment(self.credit.pk, 1000, date(2025, 3, 10))
+        self.assertEqual(Credit.objects.get(pk=self.credit.pk).cache_version, version + 1)
+        # Один UPDATE версії кредиту і один — клієнта
+        self.assertEqual(len([q for q in queries if q['sql'].startswith('UPDATE') and 'cache_version' in q['sql']]), 2)
+
+    def test_stale_full_save_does_not_roll_back_version(self):
+        stale = Credit.objects.get(pk=self.credit.pk)
+        post_payment(self.credit.pk, 1000, date(2025, 3, 10))
+        version = Credit.objects.get(pk=self.credit.pk).cache_version
+
+        stale.purpose = 'Ремонт'
+        stale.save()
+        self.assertEqual(stale.cache_version, version + 1)
+
+    def test_other_client_does_not_get_cached_payments(self):
+        self.get_credit_page()
+        CustomUser.objects.create_user('other', password='x', role='client')
+        self.client.login(username='other', password='x')
+        response = self.client.get(reverse('credit_detail', args=[self.credit.pk]))
+        self.assertNotContains(response, '690.00 грн')
+
+
+class PaymentHistoryPageTests(TestCase):
+    def setUp(self):
+        caches['pages'].clear()
+        self.manager = CustomUser.objects.create_user('manager', password='x', role='manager')
+        self.client_user = CustomUser.objects.create_user('client', password='x', role='client')
+        self.client.force_login(self.manager)
+
+    def make_credit(self, payments):
+        credit = Credit.objects.create(
+            user=self.client_user, summa_credit=100000, percent=0.01, start_date=date(2020, 1, 1),
+            srok_months=60, day_of_pay=1, ostatok=100000, plan_pay=2000,
+        )
+        for i in range(payments):
+            # Два платежі на одну дату — курсор має розрізняти їх по id
+            post_payment(credit.pk, 100 + i, date(2020, 2, 1) + timedelta(days=i // 2))
+        return credit
+
+    def get(self, credit, **params):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse('credit_detail', args=[credit.pk]), params)
+        return response, len(queries)
+
+    def test_pages_and_totals(self):
+        credit = self.make_credit(PAYMENTS_PAGE_SIZE + 7)
+        payments = list(credit.payments.order_by('date_pay', 'id'))
+
+        response, first_queries = self.get(credit)
+        page = response.context['payments_page']
+        self.assertEqual(list(page), payments[:PAYMENTS_PAGE_SIZE])
+        totals = response.context['payment_totals']
+        self.assertEqual(totals['count'], len(payments))
+        self.assertEqual(totals['pog_credit'], sum(p.pog_credit for p in payments))
+        self.assertEqual(totals['pay'], sum(p.pay for p in payments))
+
+        response, _ = self.get(credit, next='client_detail', cursor=page.next_cursor)
+        self.assertEqual(list(response.context['payments_page']), payments[PAYMENTS_PAGE_SIZE:])
+        self.assertContains(response, '?next=client_detail&cursor=')
+
+        # Кількість запитів не залежить від довжини історії
+        small, small_queries = self.get(self.make_credit(3))
+        self.assertEqual(first_queries, small_queries)
+
+
+class ClientSummaryTests(TestCase):
+    def setUp(self):
+        self.manager = CustomUser.objects.create_user('manager', password='x', role='manager')
+        self.client_user = CustomUser.objects.create_user('client', password='x', role='client')
+        self.credit = self.make_credit(self.client_user, 10000)
+
+    def make_credit(self, user, summa):
+        return Credit.objects.create(
+            user=user, summa_credit=summa, percent=0.1, start_date=date(2025, 1, 10),
+            srok_months=12, day_of_pay=10, ostatok=summa, plan_pay=1000,
+        )
+
+    def summary(self, user=None):
+        return ClientSummary.objects.filter(user=user or self.client_user).values_list(
+            'credits', 'open_credits', 'total_ostatok').get()
+
+    def test_credit_and_payment_paths_update_summary(self):
+        second = self.make_credit(self.client_user, 5000)
+        self.assertEqual(self.summary(), (2, 2, Decimal('15000.00')))
+
+        post_payment(self.credit.pk, 1000, date(2025, 2, 10))
+        self.assertEqual(self.summary(), (2, 2, Decimal('14310.00')))
+
+        # Закриття переплатою
+        post_payment(second.pk, 20000, date(2025, 2, 10))
+        self.assertEqual(self.summary(), (2, 1, Decimal('9310.00')))
+
+        import_payments(['credit_id,date_pay,pay\n', f'{self.credit.pk},2025-03-10,1000\n'])
+        expected = Decimal(str(round(Credit.objects.get(pk=self.credit.pk).ostatok, 2)))
+        self.assertEqual(self.summary(), (2, 1, expected + 0))
+
+        Payment.objects.filter(credit=self.credit, date_pay=date(2025, 3, 10)).delete()
+        replay_credit(self.credit.pk)
+        self.assertEqual(self.summary(), (2, 1, Decimal('9310.00')))
+
+        second.delete()
+        self.assertEqual(self.summary(), (1, 1, Decimal('9310.00')))
+
+    def test_rebuild_matches_incremental(self):
+        post_payment(self.credit.pk, 1000, date(2025, 2, 10))
+        incremental = self.summary()
+
+        ClientSummary.objects.update(credits=0, open_credits=0, total_ostatok=0)
+        call_command('rebuild_client_summaries', stdout=open(os.devnull, 'w'))
+        self.assertEqual(self.summary(), incremental)
+        self.assertEqual(self.summary(self.manager), (0, 0, Decimal('0.00')))
+
+    def test_clients_list_sorted_by_exposure(self):
+        richer = CustomUser.objects.create_user('richer', password='x', role='client')
+        self.make_credit(richer, 50000)
+        closed = CustomUser.objects.create_user('closed', password='x', role='client')
+        post_payment(self.make_credit(closed, 100).pk, 1000, date(2025, 2, 10))
+
+        self.client.force_login(self.manager)
+        response = self.client.get(reverse('all_clients_list'), {'sort': 'exposure'})
+        self.assertEqual(list(response.context['clients']), [richer, self.client_user, closed])
+        self.assertContains(response, '50000.00 грн')
+
+        response = self.client.get(reverse('all_clients_list'), {'sort': 'exposure', 'exposure': 'open'})
+        self.assertEqual(list(response.context['clients']), [richer, self.client_user])
+
+        # Курсор по залишку (Decimal) веде на наступну сторінку
+        queryset = CustomUser.objects.filter(summary__isnull=False).select_related('summary')
+        ordering = AllClientsView.exposure_ordering
+        page = keyset_page(queryset, ordering, 1)
+        page = keyset_page(queryset, ordering, 1, page.next_cursor)
+        self.assertEqual(list(page), [self.client_user])
+        self.assertEqual(list(keyset_page(queryset, ordering, 1, page.previous_cursor)), [richer])
+
+
+class PortfolioDashboardTests(TestCase):
+    def setUp(self):
+        self.manager = CustomUser.objects.create_user('manager', password='x', role='manager')
+        self.client_user = CustomUser.objects.create_user('client', password='x', role='client')
+
+    def make_credit(self, summa=10000, start_date=date(2025, 1, 10)):
+        return Credit.objects.create(
+            user=self.client_user, summa_credit=summa, percent=0.1, start_date=start_date,
+            srok_months=12, day_of_pay=10, ostatok=summa, plan_pay=1000,
+        )
+
+    def snapshot(self):
+        totals = portfolio_totals()
+        days = portfolio_days(PortfolioDay.objects.all())
+        return (tuple(getattr(totals, field) for field in PORTFOLIO_TOTALS_FIELDS),
+                [(day, *(getattr(row, field) for field in PORTFOLIO_DAY_FIELDS))
+                 for day, row in days.items() if row.payments or row.credits_issued or row.credits_closed])
+
+    def assertMatchesRebuild(self):
+        incremental = self.snapshot()
+        call_command('rebuild_portfolio', stdout=open(os.devnull, 'w'))
+        self.assertEqual(incremental, self.snapshot())
+        return incremental
+
+    def test_incremental_matches_rebuild(self):
+        credit, second = self.make_credit(), self.make_credit(5000, date(2025, 1, 20))
+        post_payment(credit.pk, 1000, date(2025, 2, 10))
+        post_payment(second.pk, 20000, date(2025, 2, 10))
+        totals, days = self.assertMatchesRebuild()
+        self.assertEqual(totals, (2, 1, Decimal('9310.00'), Decimal('0.00')))
+        self.assertEqual(days[-1], (date(2025, 2, 10), 2, Decimal('6105.00'), 0, 1))
+
+        import_payments(['credit_id,date_pay,pay\n', f'{credit.pk},2025-03-10,100\n'])
+        self.assertNotEqual(self.assertMatchesRebuild()[0][3], 0)
+
+        # Як в адмін-панелі: зміна суми і видалення платежу, перерахунок кредиту
+        payment = credit.payments.get(date_pay=date(2025, 2, 10))
+        payment.pay = 2000
+        payment.save()
+        replay_credit(credit.pk)
+        self.assertMatchesRebuild()
+        credit.payments.get(date_pay=date(2025, 3, 10)).delete()
+        replay_credit(credit.pk)
+        self.assertMatchesRebuild()
+
+        second.delete()
+        self.assertEqual(self.assertMatchesRebuild()[0][:2], (1, 1))
+
+    def test_payments_on_different_credits_touch_different_rows(self):
+        credit, second = self.make_credit(), self.make_credit(5000)
+        self.assertNotEqual(portfolio_shard(credit.pk), portfolio_shard(second.pk))
+        post_payment(credit.pk, 1000, date(2025, 2, 10))
+        post_payment(second.pk, 20000, date(2025, 2, 10))
+
+        self.assertEqual(set(PortfolioTotals.objects.values_list('pk', flat=True)),
+                         {portfolio_shard(credit.pk), portfolio_shard(second.pk)})
+        self.assertEqual(set(PortfolioDay.objects.filter(day=date(2025, 2, 10)).values_list('shard', 'payments')),
+                         {(portfolio_shard(credit.pk), 1), (portfolio_shard(second.pk), 1)})
+
+    def test_changing_loaded_payment_does_not_reread_it(self):
+        credit = self.make_credit()
+        with CaptureQueriesContext(connection) as queries:
+            post_payment(credit.pk, 1000, date(2025, 2, 10))
+        self.assertEqual(len([q for q in queries if q['sql'].startswith('SELECT')]), 1)
+
+        payment = credit.payments.get()
+        payment.pay = 900
+        with CaptureQueriesContext(connection) as queries:
+            payment.save()
+        self.assertFalse([q for q in queries if q['sql'].startswith('SELECT')])
+        self.assertMatchesRebuild()
+
+    def test_dashboard_on_index(self):
+        today = date.today()
+        credit = self.make_credit(start_date=today - timedelta(days=31))
+        post_payment(credit.pk, 20000, today)
+
+        self.client.force_login(self.manager)
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse('index'))
+        dashboard = response.context['dashboard']
+        self.assertEqual((dashboard['today'].payments, dashboard['month_closed']), (1, 1))
+        self.assertContains(response, 'Закрито кредитів')
+        self.assertFalse([q for q in queries if 'credit_system_credit"' in q['sql']
+                          or 'credit_system_payment"' in q['sql']])
+
+        self.client.force_login(self.client_user)
+        self.assertNotIn('dashboard', self.client.get(reverse('index')).context)
+
+
+class QueryBudgetTests(QueryBudgetMixin, TestCase):
+    # Бюджети не залежать від кількості рядків на сторінці: N+1 одразу їх перевищить
+    query_budgets = {
+        'index': 5,
+        'all_credits_list': 4,
+        'all_clients_list': 4,
+        'user_credits_list': 4,
+        'credit_detail': 9,
+        'client_detail': 5,
+        'admin:credit_system_credit_changelist': 6,
+        'admin:credit_system_payment_changelist': 6,
+    }
+
+    def setUp(self):
+        caches['pages'].clear()
+        self.admin = CustomUser.objects.create_superuser('admin', password='x', role='admin')
+        self.client_user = CustomUser.objects.create_user('client', password='x', role='client')
+        for client_number in range(6):
+            user = CustomUser.objects.create_user(f'client{client_number}', password='x', role='client')
+            for _ in range(2):
+                credit = Credit.objects.create(
+                    user=user, summa_credit=10000, percent=0.1, start_date=date(2025, 1, 10),
+                    srok_months=12, day_of_pay=10, ostatok=10000, plan_pay=1000,
+                )
+                for month in (2, 3, 4):
+                    post_payment(credit.pk, 1000, date(2025, month, 10))
+        self.credit = Credit.objects.create(
+            user=self.client_user, summa_credit=10000, percent=0.1, start_date=date(2025, 1, 10),
+            srok_months=12, day_of_pay=10, ostatok=10000, plan_pay=1000,
+        )
+
+    def test_views_within_budget(self):
+        self.client.force_login(self.admin)
+        for url in [
+            reverse('index'),
+            reverse('all_credits_list'),
+            reverse('all_clients_list') + '?sort=exposure',
+            reverse('credit_detail', args=[self.credit.pk]),
+            reverse('client_detail', args=[self.client_user.pk]),
+            reverse('admin:credit_system_credit_changelist'),
+            reverse('admin:credit_system_payment_changelist'),
+        ]:
+            with self.subTest(url=url):
+                self.assertQueryBudget(self.client.get(url))
+
+        self.client.force_login(self.client_user)
+        self.assertQueryBudget(self.client.get(reverse('user_credits_list')))
+
+    def test_debug_headers_and_production_log(self):
+        self.client.force_login(self.admin)
+        with self.settings(DEBUG=True):
+            response = self.client.get(reverse('all_credits_list'))
+        self.assertEqual(response['X-Query-Count'], str(response.query_stats.count))
+        self.assertIn('ms: SELECT', response['X-Query-Slowest'])
+
+        with self.assertLogs('credit_system.queries', 'INFO') as logs:
+            response = self.client.get(reverse('all_credits_list'))
+        record = json.loads(logs.records[-1].getMessage())
+        self.assertEqual((record['view'], record['queries']), ('all_credits_list', response.query_stats.count))
+        self.assertNotIn('X-Query-Count', response)
+
+        with self.settings(QUERY_STATS_WARN_QUERIES=1), self.assertLogs('credit_system.queries', 'WARNING'):
+            self.client.get(reverse('all_credits_list'))
+
+    def test_production_log_is_written_by_configured_handler(self):
+        # Без assertLogs: рядок має дійти до обробника з settings.LOGGING, а не лише до lastResort
+        handler = next(h for h in logging.getLogger('credit_system.queries').handlers if h.name == 'queries')
+        self.client.force_login(self.admin)
+        with mock.patch.object(handler, 'stream', io.StringIO()) as stream:
+            response = self.client.get(reverse('all_credits_list'))
+        line = stream.getvalue().strip()
+        self.assertIn('INFO credit_system.queries', line)
+        record = json.loads(line[line.index('{'):])
+        self.assertEqual((record['view'], record['queries']), ('all_credits_list', response.query_stats.count))
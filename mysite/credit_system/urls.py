@@ -15,7 +15,9 @@ urlpatterns = [
     path('client/<int:pk>/', views.ClientDetailView.as_view(), name='client_detail'),
     path('client/new/', AddClientView.as_view(), name='add_new_client'),
     path('clients/<int:client_id>/new-credit/', views.AddCreditView.as_view(), name='add_new_credit'),
+    path('credit/offer-grid/', views.OfferGridView.as_view(), name='offer_grid'),
     path('credit/<int:credit_id>/add-payment/', AddPaymentView.as_view(), name='add_payment'),
+    path('payments/import/', views.ImportPaymentsView.as_view(), name='import_payments'),
     path('login/', auth_views.LoginView.as_view(template_name='credit_system/registration/login.html'), name='login'),
     path('logout/', auth_views.LogoutView.as_view(next_page='index'), name='logout'),
 
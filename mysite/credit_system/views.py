@@ -1,16 +1,32 @@
 from django.contrib import messages
 from django.contrib.auth.mixins import LoginRequiredMixin
 from django.core.exceptions import PermissionDenied
-from django.db import IntegrityError
-from django.db.models import Q
+from datetime import date
+from io import TextIOWrapper
+from urllib.parse import urlencode
+
+from django.db import IntegrityError, transaction
+from django.db.models import Count, OuterRef, Subquery, Sum
 from django.shortcuts import render, get_object_or_404, redirect
-from django.http import HttpResponse, request, Http404
+from django.http import HttpResponse, request, Http404, JsonResponse
 from django.views import View
+from django.utils.functional import SimpleLazyObject
 from django.views.generic import ListView, DetailView
-from credit_system.forms import AddPaymentForm, ClientDetailForm, AddCreditForm, ClientCreationForm
-from credit_system.models import Credit, Payment, CustomUser
-from credit_system.plan_pay import rozrahunok_plan_pay
-from credit_system.services import process_payment
+from credit_system.forms import AddPaymentForm, ClientDetailForm, AddCreditForm, ClientCreationForm, OfferGridForm, \
+    ImportPaymentsForm
+from credit_system.models import Credit, Payment, CustomUser, PlannedInstallment
+from credit_system.plan_pay import rozrahunok_plan_pay, rozrahunok_offer_grid
+from credit_system.services import post_payment, save_planned_installments
+from credit_system.payment_import import import_payments
+from credit_system.client_search import search_clients
+from credit_system.credit_search import search_credits
+from credit_system.pagination import KeysetPaginationMixin, keyset_page
+from credit_system.portfolio import dashboard as portfolio_dashboard
+
+# Скільки рядків планового графіка показувати на сторінці нового кредиту (решта — у калькуляторі)
+GRAFIK_PREVIEW_ROWS = 60
+# Скільки платежів показувати на сторінці кредиту (далі — курсор по даті)
+PAYMENTS_PAGE_SIZE = 50
 
 
 # Головна сторінка
@@ -19,25 +35,38 @@ def index(request):
         'page_title': 'Ласкаво просимо!',
         'content_message': 'Оберіть потрібну опцію в меню'
     }
+    user = request.user
+    if user.is_authenticated and (user.is_superuser or user.is_manager):
+        # Панель менеджера: готові підсумки (див. portfolio), без проходу по кредитах і платежах
+        context['dashboard'] = portfolio_dashboard()
     return render(request, 'credit_system/index.html', context)
 
 # Для клієнтів показуємо список їх кредитів
-class UserCreditsView(LoginRequiredMixin, ListView):
+class UserCreditsView(LoginRequiredMixin, KeysetPaginationMixin, ListView):
     model = Credit
     template_name = 'credit_system/my_credits.html'
     context_object_name = 'credits'
+    keyset_ordering = ('closed', '-start_date', 'id')
 
     def get_queryset(self):
         if self.request.user.is_authenticated:
-            return Credit.objects.filter(user=self.request.user).order_by('closed', '-start_date')
+            # Найближчий плановий платіж кожного кредиту — підзапитом з LIMIT 1 по індексу (credit, date_pay),
+            # а не всі майбутні рядки графіка
+            upcoming = (PlannedInstallment.objects.filter(credit=OuterRef('pk'), date_pay__gte=date.today())
+                        .order_by('date_pay'))
+            return (Credit.objects.filter(user=self.request.user)
+                    .annotate(next_pay_date=Subquery(upcoming.values('date_pay')[:1]),
+                              next_payment=Subquery(upcoming.values('payment')[:1]))
+                    .order_by(*self.keyset_ordering))
 
         # Якщо з якоїсь причини не автентифікований, повертаємо пустий список
         return Credit.objects.none()
 
-class AllCreditsView(LoginRequiredMixin, ListView):
+class AllCreditsView(LoginRequiredMixin, KeysetPaginationMixin, ListView):
     model = Credit
     template_name = 'credit_system/all_credits.html'
     context_object_name = 'credits'
+    keyset_ordering = ('closed', '-start_date', 'id')
 
     def get_queryset(self):
         user = self.request.user
@@ -50,21 +79,13 @@ class AllCreditsView(LoginRequiredMixin, ListView):
             # Для клієнта: повертаємо лише його кредити
             queryset = base_queryset.filter(user=user)
 
-        # Пошук по номеру кредиту, ІПН, прізвищу, імені, по-батькові
+        # Пошук по номеру кредиту, ІПН, прізвищу, імені, по-батькові;
+        # номер і ІПН шукаються по індексу (див. credit_search)
         query = self.request.GET.get('q')
-        if query:
-            query_cleaned = query.strip()
-
-            lookup = (
-                    Q(number__icontains=query_cleaned) |
-                    Q(user__IPN__icontains=query_cleaned) |
-                    Q(user__last_name__icontains=query_cleaned) |
-                    Q(user__first_name__icontains=query_cleaned) |
-                    Q(user__middle_name__icontains=query_cleaned)
-            )
-            queryset = queryset.filter(lookup)
+        if query and query.strip():
+            queryset = search_credits(queryset, query)
 
-        return queryset.order_by('closed', '-start_date')
+        return queryset.order_by(*self.keyset_ordering)
 
     # Додаємо запит у контекст, щоб поле пошуку зберігало значення
     def get_context_data(self, **kwargs):
@@ -72,10 +93,20 @@ class AllCreditsView(LoginRequiredMixin, ListView):
         context['query'] = self.request.GET.get('q', '')
         return context
 
-class AllClientsView(LoginRequiredMixin, ListView):
+class AllClientsView(LoginRequiredMixin, KeysetPaginationMixin, ListView):
     model = CustomUser
     template_name = 'credit_system/all_clients.html'
     context_object_name = 'clients'
+    keyset_ordering = ('-date_joined', 'id')
+    # ?sort=exposure — за загальним залишком; обидва ключі з підсумку, тож сторінка йде
+    # індексом client_summary_exposure_idx без сортування
+    exposure_ordering = ('-summary__total_ostatok', 'summary__user_id')
+
+    def sort_by_exposure(self):
+        return self.request.GET.get('sort') == 'exposure'
+
+    def get_keyset_ordering(self):
+        return self.exposure_ordering if self.sort_by_exposure() else self.keyset_ordering
 
     def get_queryset(self):
         user = self.request.user
@@ -84,36 +115,30 @@ class AllClientsView(LoginRequiredMixin, ListView):
         if not (user.is_superuser or user.is_manager):
             raise Http404("У вас немає дозволу на перегляд списку клієнтів.")
 
-        # Базовий набір записів: лише клієнти
-        queryset = CustomUser.objects.filter(role='client')
+        # Базовий набір записів: лише клієнти; підсумок портфеля — тим самим запитом
+        queryset = CustomUser.objects.filter(role='client').select_related('summary')
+
+        if self.sort_by_exposure():
+            # Внутрішнє з'єднання: клієнти без жодного кредиту підсумку не мають і в цьому порядку не показуються
+            queryset = queryset.filter(summary__isnull=False)
+        if self.request.GET.get('exposure') == 'open':
+            queryset = queryset.filter(summary__open_credits__gt=0)
 
         # Пошук на сторінці:
         query = self.request.GET.get('q')
 
-        if query:
-            query_cleaned = query.strip()
-
-            # Формуємо складний OR-запит за всіма ключовими полями
-            lookup = (
-                    Q(last_name__icontains=query_cleaned) |
-                    Q(first_name__icontains=query_cleaned) |
-                    Q(middle_name__icontains=query_cleaned) |
-                    Q(IPN__icontains=query_cleaned) |
-                    Q(phone_number__icontains=query_cleaned) |
-                    Q(address__icontains=query_cleaned) |
-                    Q(address_registration__icontains=query_cleaned) |
-                    Q(address_residential__icontains=query_cleaned) |
-                    Q(passport_number__icontains=query_cleaned)
-            )
-            # Фільтруємо базовий набір записів за умовами пошуку
-            queryset = queryset.filter(lookup)
+        if query and query.strip():
+            # ІПН і паспорт — точний пошук по індексу, решта — повнотекстовий індекс (див. client_search)
+            queryset = search_clients(queryset, query)
 
-        return queryset.order_by('-date_joined')
+        return queryset.order_by(*self.get_keyset_ordering())
 
     # Додаємо запит у контекст, щоб поле пошуку зберігало значення
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
         context['query'] = self.request.GET.get('q', '')
+        context['sort'] = self.request.GET.get('sort', '')
+        context['exposure'] = self.request.GET.get('exposure', '')
         return context
 
 # Деталі кредиту
@@ -134,6 +159,9 @@ class CreditDetailView(LoginRequiredMixin, DetailView):
         # Забороняємо користувачу бачити чужі платежі
         if not (self.request.user.is_superuser or self.request.user.is_manager):
             queryset = queryset.filter(credit__user=self.request.user)
+        # Входить у ключ кешу таблиць, щоб чужий клієнт не отримав закешовані платежі
+        context['payments_visible'] = (self.request.user.is_superuser or self.request.user.is_manager
+                                       or current_credit.user_id == self.request.user.pk)
 
         return_to = self.request.GET.get('next')
 
@@ -142,8 +170,30 @@ class CreditDetailView(LoginRequiredMixin, DetailView):
         else:
             context['return_to_client_detail'] = False
 
-        # Додаємо список платежів до контексту
-        context['payments'] = queryset
+        # Сторінка платежів (seek по (date_pay, id) за індексом (credit, date_pay)) і підсумки одним
+        # aggregate(). Обидва ліниві: при влучанні в кеш шаблону таблиць платежі не читаються
+        cursor = self.request.GET.get('cursor')
+        context['payments_cursor'] = cursor or ''
+        context['payments_page'] = SimpleLazyObject(
+            lambda: keyset_page(queryset, ('date_pay', 'id'), PAYMENTS_PAGE_SIZE, cursor))
+        context['payment_totals'] = SimpleLazyObject(lambda: queryset.aggregate(
+            count=Count('id'), pay=Sum('pay'), summa_percent=Sum('summa_percent'),
+            pog_summa_percent=Sum('pog_summa_percent'), pog_credit=Sum('pog_credit'),
+        ))
+        params = self.request.GET.copy()
+        params.pop('cursor', None)
+        context['page_query'] = params.urlencode()
+
+        # Плановий графік, збережений при створенні кредиту
+        context['planned_installments'] = current_credit.planned_installments.order_by('number')
+
+        # Останній знімок нічного нарахування відсотків — лише порахований від останнього платежу:
+        # знімок до платежу (або того ж дня, але до нього) показував би борг, якого вже немає
+        accrual = current_credit.accruals.filter(
+            accrual_date__gte=current_credit.last_pay_date).order_by('-accrual_date').first()
+        if accrual and accrual.days != (accrual.accrual_date - current_credit.last_pay_date).days:
+            accrual = None
+        context['accrual'] = accrual
 
         return context
 
@@ -206,23 +256,14 @@ class AddPaymentView(LoginRequiredMixin, View):
             pay = form.cleaned_data['pay']
             date_pay = form.cleaned_data['date_pay']
 
-            delta_days = (date_pay - last_pay_date).days
-
             try:
-                result = process_payment(credit, pay, date_pay, delta_days)
+                # Розрахунок і збереження — атомарно, з блокуванням кредиту
+                post_payment(credit.pk, pay, date_pay)
             except ValueError as e:
                 messages.error(request, str(e))
                 # Якщо помилка, повертаємо користувача на ту ж сторінку з формою
                 return render(request, self.template_name, {'form': form, 'credit': credit})
 
-            # У випадку, коли кредит закривається
-            # і сума платежу більше залишку кредиту - зменшуємо останній платіж:
-            if result['ost_payment'] > 0:
-                pay -= result['ost_payment']
-
-            # Зберігаємо сам платіж
-            Payment.objects.create(credit=credit, pay=pay, date_pay=date_pay, dolg_percent=result["dolg_percent"], ostatok=result["ostatok"], pog_credit=result["pog_credit"], pog_summa_percent=result["pog_summa_percent"], summa_percent=result["summa_percent"], ost_payment=result["ost_payment"])
-
             return redirect('credit_detail', pk=credit.id)
 
         # Якщо з якихось причин дійшло до цього місця (помилки з даними) - повертаємо форму знову
@@ -282,6 +323,12 @@ class AddCreditView(LoginRequiredMixin, View):
             context.update({
                 'plan_pay': plan_pay,
                 'grafik': grafik,
+                'grafik_page': grafik[:GRAFIK_PREVIEW_ROWS],
+                'grafik_has_more': len(grafik) > GRAFIK_PREVIEW_ROWS,
+                'schedule_query': urlencode({
+                    'credit_sum': credit_sum, 'percent': cleaned_data['percent'], 'srok': srok_months,
+                    'start_date': start_date.isoformat(), 'day_of_pay': day_of_pay,
+                }),
                 'total_pays_sum': total_pays_sum,
                 'pereplata': pereplata,
             })
@@ -302,7 +349,10 @@ class AddCreditView(LoginRequiredMixin, View):
                     plan_pay=plan_pay,
                 )
 
-                new_credit.save()
+                # Кредит і його плановий графік зберігаються разом
+                with transaction.atomic():
+                    new_credit.save()
+                    save_planned_installments(new_credit, grafik)
 
                 messages.success(request, f'Кредит №{new_credit.number} для клієнта {client} успішно створено!')
                 return redirect('credit_detail', pk=new_credit.pk)
@@ -314,6 +364,42 @@ class AddCreditView(LoginRequiredMixin, View):
         return render(request, self.template_name, context)
 
 
+# Сітка пропозицій: плановий платіж, сума виплат і переплата для кожного терміну × ставки (JSON)
+class OfferGridView(LoginRequiredMixin, View):
+    form_class = OfferGridForm
+
+    def dispatch(self, request, *args, **kwargs):
+        if not (request.user.is_superuser or request.user.is_manager):
+            raise PermissionDenied
+        return super().dispatch(request, *args, **kwargs)
+
+    def get(self, request):
+        form = self.form_class(request.GET)
+        if not form.is_valid():
+            return JsonResponse({'errors': form.errors}, status=400)
+
+        cleaned_data = form.cleaned_data
+        percents = [float(value) for value, label in AddCreditForm.PERCENT_CHOICES]
+        percent_by_rate = {percent / 100: percent for percent in percents}
+
+        offers = rozrahunok_offer_grid(
+            cleaned_data['credit_sum'], cleaned_data['start_date'], cleaned_data['day_of_pay'],
+            range(cleaned_data['min_srok'], cleaned_data['max_srok'] + 1),
+            list(percent_by_rate),
+        )
+        # Ставку повертаємо у % за добу, як у формі
+        for offer in offers:
+            offer['percent'] = percent_by_rate[offer.pop('daily_percent')]
+
+        return JsonResponse({
+            'credit_sum': cleaned_data['credit_sum'],
+            'start_date': cleaned_data['start_date'].isoformat(),
+            'day_of_pay': cleaned_data['day_of_pay'],
+            'percents': percents,
+            'offers': offers,
+        })
+
+
 class AddClientView(LoginRequiredMixin, View):
     template_name = 'credit_system/add_new_client.html'
     form_class = ClientCreationForm
@@ -349,4 +435,33 @@ class AddClientView(LoginRequiredMixin, View):
             'form': form,
             'page_title': 'Створення нового клієнта',
         }
-        return render(request, self.template_name, context)
\ No newline at end of file
+        return render(request, self.template_name, context)
+
+
+class ImportPaymentsView(LoginRequiredMixin, View):
+    """Масовий імпорт платежів з банківської виписки (CSV) — лише для менеджерів."""
+    template_name = 'credit_system/import_payments.html'
+    form_class = ImportPaymentsForm
+
+    def dispatch(self, request, *args, **kwargs):
+        if not (request.user.is_superuser or request.user.is_manager):
+            raise PermissionDenied
+        return super().dispatch(request, *args, **kwargs)
+
+    def get(self, request):
+        return render(request, self.template_name, {'form': self.form_class()})
+
+    def post(self, request):
+        form = self.form_class(request.POST, request.FILES)
+        if not form.is_valid():
+            return render(request, self.template_name, {'form': form})
+
+        try:
+            # newline='' — переноси рядків у полях у лапках (виписки з Excel) розбирає сам csv
+            statement = TextIOWrapper(form.cleaned_data['statement'].file, encoding='utf-8-sig', newline='')
+            report = import_payments(statement)
+        except UnicodeDecodeError:
+            form.add_error('statement', "Файл має бути у кодуванні UTF-8.")
+            return render(request, self.template_name, {'form': form})
+
+        return render(request, self.template_name, {'form': self.form_class(), 'report': report})
@@ -42,6 +42,8 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    # Кількість і час SQL-запитів (див. credit_system/query_stats.py) — першим, щоб бачити всі запити
+    'credit_system.query_stats.QueryStatsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -82,6 +84,38 @@ DATABASES = {
 }
 
 
+# Cache
+# https://docs.djangoproject.com/en/5.2/topics/cache/
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'default',
+    },
+    # Готові розрахунки кредитного калькулятора (credit_calculator/quote_cache.py)
+    'calculator_quotes': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'calculator-quotes',
+        'TIMEOUT': 60 * 60 * 24,
+        'OPTIONS': {'MAX_ENTRIES': 5000},
+    },
+    # Лічильники статистики кешу калькулятора — окремо від розрахунків, щоб їх не витісняли
+    'calculator_stats': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'calculator-stats',
+        'TIMEOUT': None,
+    },
+    # Відрендерені фрагменти сторінок кредиту і клієнта (credit_system/page_cache.py).
+    # Ключі містять версію об'єкта, тож записи не застарівають; у продакшні з кількома процесами —
+    # спільний бекенд (Redis/Memcached), щоб фрагменти не рендерились у кожному процесі окремо
+    'pages': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'pages',
+        'OPTIONS': {'MAX_ENTRIES': 10000},
+    },
+}
+
+
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
 
@@ -125,5 +159,25 @@ DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
 AUTH_USER_MODEL = 'credit_system.CustomUser'
 
+# Облік SQL-запитів (credit_system/query_stats.py): понад ці пороги запит логується як WARNING
+QUERY_STATS_WARN_QUERIES = 50
+QUERY_STATS_WARN_MS = 500
+
+# Структурований лог запитів ('credit_system.queries', рядок JSON на HTTP-запит поза DEBUG) — у stderr,
+# звідки його забирає сервер застосунку (gunicorn, systemd, docker)
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'formatters': {
+        'queries': {'format': '{asctime} {levelname} {name} {message}', 'style': '{'},
+    },
+    'handlers': {
+        'queries': {'class': 'logging.StreamHandler', 'formatter': 'queries'},
+    },
+    'loggers': {
+        'credit_system.queries': {'handlers': ['queries'], 'level': 'INFO', 'propagate': False},
+    },
+}
+
 LOGIN_URL = '/login/'
 LOGIN_REDIRECT_URL = '/'
\ No newline at end of file